@@ -0,0 +1 @@
+# Benchmarks for the Sanic API (run from the api/ directory, e.g. `python -m benchmarks.db_lookup`)
@@ -0,0 +1,106 @@
+"""
+Measure requests per second through the full middleware stack with the
+access log off, written synchronously on the event loop (as the middleware
+used to), and queued to the background writer in text, JSON lines and
+sampled JSON lines.
+
+Requests are driven through the app's ASGI interface in-process, so the
+numbers cover routing, middleware, handlers and logging but not sockets.
+Log lines go to a temporary file.
+
+Run from the api/ directory:
+    python -m benchmarks.access_log [requests]
+"""
+
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+from main import app
+from modules.access_log import get_access_log
+
+DEFAULT_REQUESTS = 20_000
+PATHS = ["/api/users", "/api/todos", "/api/todos/1", "/api/health"]
+
+async def lifespan_startup() -> None:
+    """Run the app's startup listeners, as an ASGI server would."""
+    messages: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    await messages.put({"type": "lifespan.startup"})
+    started = asyncio.Event()
+
+    async def send(message: Dict[str, Any]) -> None:
+        started.set()
+
+    asyncio.get_running_loop().create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, messages.get, send))
+    await started.wait()
+
+async def get(path: str) -> None:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        pass
+
+    await app(scope, receive, send)
+
+async def run(requests: int) -> float:
+    """Send the requests one after another and return requests per second."""
+    start = time.perf_counter()
+    for i in range(requests):
+        await get(PATHS[i % len(PATHS)])
+    return requests / (time.perf_counter() - start)
+
+def sync_logger(stream: Any) -> logging.Logger:
+    """A logger writing straight to stream, as the middleware did before the access log."""
+    logger = logging.getLogger("benchmarks.sync_access")
+    logger.handlers = [logging.StreamHandler(stream)]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+async def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    await lifespan_startup()
+    access_log = get_access_log()
+    record = access_log.record
+    print(f"{requests} GET requests through the middleware stack")
+    print(f"{'access log':<26} {'req/sec':>9} {'lines':>7}")
+    for name, log_format, sample_rate in [("off", "off", 1.0), ("sync text (previous)", "sync", 1.0),
+                                          ("queued text", "text", 1.0), ("queued JSON lines", "json", 1.0),
+                                          ("queued JSON, 10% sampled", "json", 0.1)]:
+        with tempfile.TemporaryFile("w+") as stream:
+            access_log.stop()
+            access_log.stream = stream
+            access_log.sample_rate = sample_rate
+            if log_format == "sync":
+                logger = sync_logger(stream)
+
+                def log_both(method: str, path: str, status: int, duration_ns: int, ip: str) -> None:
+                    logger.info(f"[{method}] {path} - {ip}")
+                    logger.info(f"[{method}] {path} - {status} - {duration_ns / 1e6:.2f}ms")
+
+                access_log.record = log_both
+            else:
+                access_log.record = record
+                access_log.log_format = log_format
+            await run(requests // 10)
+            access_log.stop()
+            stream.seek(0)
+            stream.truncate()
+            throughput = await run(requests)
+            access_log.stop()
+            stream.flush()
+            stream.seek(0)
+            lines = sum(1 for _ in stream)
+        print(f"{name:<26} {throughput:>9.0f} {lines:>7}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+Measure admission control under overload.
+
+A server (main.app in its own process, as in load_test.py) is first driven
+closed-loop to find its capacity. Then requests arrive open-loop, at a fixed
+rate of --overload times that capacity, whether or not earlier ones have been
+answered, with ADMISSION=off and then on. Latency runs from each request's
+scheduled arrival, so time spent waiting for a free connection counts too.
+
+Without admission control the backlog, and with it every request's latency,
+grows for as long as the overload lasts. With it, excess requests get a fast
+503 and the admitted ones keep a bounded p99. Reads and writes are reported
+separately to show ADMISSION_PRIORITY at work.
+
+A refused request still costs the server its HTTP parsing, routing and
+middleware, roughly a third of a cheap read. If the generator shares the
+server's CPU, it can take enough of it at high overload that even refusing
+everything cannot keep up; the server is niced so the generator at least
+keeps its schedule.
+
+Run from the api/ directory:
+    python -m benchmarks.admission [--overload 2] [--seconds 5] [--connections 256] [--rows 10000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+from benchmarks.load_test import (
+    API_DIR, Connection, build_request, free_port, generate_load, parse_mix, percentile, wait_until_ready,
+)
+
+DEFAULT_MIX = "get=60,list=20,create=10,update=10"
+SHED_STATUSES = (429, 503)
+SERVER_NICENESS = 10
+
+async def open_loop(port: int, rows: int, rate: float, seconds: float, connections: int,
+                    mix: Dict[str, float], seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    operations, weights = list(mix), list(mix.values())
+    pool: "asyncio.Queue[Connection]" = asyncio.Queue()
+    for _ in range(connections):
+        # Connected up front: a burst of connects overflows the listen backlog,
+        # and the SYN retries (1s, 3s, ...) would swamp the measured latencies
+        connection = Connection(port)
+        await connection.request("GET", "/api/health")
+        pool.put_nowait(connection)
+    admitted: Dict[str, List[int]] = {"read": [], "write": []}
+    shed = {"read": 0, "write": 0}
+    errors = 0
+
+    async def send(scheduled_ns: int, method: str, path: str, body: bytes) -> None:
+        nonlocal errors
+        connection = await pool.get()
+        try:
+            status = await connection.request(method, path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            connection.close()
+            status = 599
+        finally:
+            pool.put_nowait(connection)
+        kind = "read" if method == "GET" else "write"
+        if status in SHED_STATUSES:
+            shed[kind] += 1
+        else:
+            admitted[kind].append(time.perf_counter_ns() - scheduled_ns)
+            errors += status >= 500
+
+    tasks = []
+    total = int(rate * seconds)
+    start_ns = time.perf_counter_ns()
+    for i in range(total):
+        scheduled_ns = start_ns + int(i * 1e9 / rate)
+        delay = (scheduled_ns - time.perf_counter_ns()) / 1e9
+        if delay > 0:
+            await asyncio.sleep(delay)
+        method, path, body = build_request(rng.choices(operations, weights)[0], rng, rows)
+        tasks.append(asyncio.create_task(send(scheduled_ns, method, path, body)))
+    await asyncio.gather(*tasks)
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+    while not pool.empty():
+        pool.get_nowait().close()
+
+    result: Dict[str, Any] = {"offered": total, "elapsed_s": elapsed, "errors": errors}
+    for kind in ("read", "write"):
+        values = sorted(admitted[kind])
+        result[kind] = {"admitted": len(values), "shed": shed[kind],
+                        "p50_ms": percentile(values, 0.5), "p99_ms": percentile(values, 0.99)}
+    everything = sorted(admitted["read"] + admitted["write"])
+    result["p50_ms"] = percentile(everything, 0.5)
+    result["p99_ms"] = percentile(everything, 0.99)
+    result["goodput_rps"] = len(everything) / elapsed
+    return result
+
+def start_server(rows: int, admission: str) -> "tuple[int, subprocess.Popen]":
+    port = free_port()
+    env = {**os.environ, "ADMISSION": admission, "ACCESS_LOG": "off"}
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.load_test", "--serve", "main",
+                                "--port", str(port), "--rows", str(rows)],
+                               cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               # On a shared CPU the generator must keep its schedule, or it measures itself
+                               preexec_fn=lambda: os.nice(SERVER_NICENESS))
+    return port, process
+
+async def run(args: argparse.Namespace) -> None:
+    port, process = start_server(args.rows, "off")
+    try:
+        await wait_until_ready(port, process, 60)
+        capacity = (await generate_load(port, args.rows, 5_000, 32, args.mix, args.seed))["throughput_rps"]
+    finally:
+        process.terminate()
+        process.wait()
+    rate = capacity * args.overload
+    print(f"Capacity {capacity:.0f} req/s (closed loop, 32 connections); offering {rate:.0f} req/s "
+          f"for {args.seconds:g}s over up to {args.connections} connections")
+    print(f"{'admission':<10} {'goodput':>8} {'p50 ms':>8} {'p99 ms':>9} {'read p99':>9} {'write p99':>10} "
+          f"{'reads shed':>11} {'writes shed':>12} {'5xx':>5}")
+    for admission in ("off", "on"):
+        port, process = start_server(args.rows, admission)
+        try:
+            await wait_until_ready(port, process, 60)
+            result = await open_loop(port, args.rows, rate, args.seconds, args.connections, args.mix, args.seed)
+        finally:
+            process.terminate()
+            process.wait()
+        read, write = result["read"], result["write"]
+        read_shed = read["shed"] / max(1, read["shed"] + read["admitted"])
+        write_shed = write["shed"] / max(1, write["shed"] + write["admitted"])
+        print(f"{admission:<10} {result['goodput_rps']:>8.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>9.2f} "
+              f"{read['p99_ms']:>9.2f} {write['p99_ms']:>10.2f} {read_shed:>11.1%} {write_shed:>12.1%} "
+              f"{result['errors']:>5}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare latency under overload with admission control off and on.")
+    parser.add_argument("--overload", type=float, default=2.0, help="offered load as a multiple of capacity")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--connections", type=int, default=256)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Check the cold start of the Vercel entry points against their budgets.
+
+Each run starts a new interpreter and imports main.py or index.py, the way
+a fresh serverless instance does before its first request. The median of
+the runs is compared with COLD_START_BUDGET_MAIN_MS / COLD_START_BUDGET_INDEX_MS
+(see modules/coldstart.py); when an entry point is over budget its import
+and init breakdown is printed and the script exits with status 1, so it can
+gate a CI job.
+
+Run from the api/ directory:
+    python -m benchmarks.cold_start [runs]
+"""
+
+import statistics
+import sys
+from modules.coldstart import COLD_START_BUDGETS_MS, ENTRY_POINTS, cold_start_ms, profile
+
+DEFAULT_RUNS = 5
+
+def main() -> int:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RUNS
+    over_budget = []
+    print(f"Cold start, median of {runs} runs (interpreter start included)")
+    print(f"{'entry point':<12} {'median ms':>10} {'min ms':>8} {'budget ms':>10}")
+    for entry in ENTRY_POINTS:
+        timings = [cold_start_ms(entry) for _ in range(runs)]
+        median = statistics.median(timings)
+        budget = COLD_START_BUDGETS_MS[entry]
+        print(f"{entry + '.py':<12} {median:>10.1f} {min(timings):>8.1f} {budget:>10.0f}"
+              f"{'  OVER BUDGET' if median > budget else ''}")
+        if median > budget:
+            over_budget.append(entry)
+
+    for entry in over_budget:
+        report = profile(entry, top=10)
+        print(f"\n{entry}.py: imports {report['import_ms']:.1f}ms, init {report['init_ms']:.1f}ms (with -X importtime)")
+        for name, ms in report['phases'].items():
+            print(f"  init {name:<27} {ms:>8.2f}ms")
+        for timing in report['slowest_modules']:
+            print(f"  import {timing['module']:<25} {timing['self_ms']:>8.2f}ms self")
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Report the CPU versus bytes tradeoff of response compression.
+
+First, /api/todos list bodies of several sizes are compressed with each
+available encoding at several levels. That shows the size ratio and the
+compression cost per body. Then GET /api/todos?limit=1000 is sent through
+the app's ASGI interface in three ways: without Accept-Encoding, with gzip
+compressing every response, and with gzip reusing the compressed body
+stored in the response cache.
+
+Run from the api/ directory:
+    python -m benchmarks.compression [requests]
+"""
+
+import asyncio
+import sys
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Tuple
+from sanic.response import json_dumps
+from main import app
+from modules.compression import get_compressor
+from modules.database import get_engine
+from modules.response_cache import get_response_cache
+from benchmarks.access_log import lifespan_startup
+
+DEFAULT_REQUESTS = 2_000
+BODY_ROWS = (100, 1_000, 10_000)
+LEVELS = {'gzip': (1, 3, 6, 9), 'deflate': (1, 6, 9), 'zstd': (1, 3, 9, 19)}
+
+def codecs() -> List[Tuple[str, int, Callable[[bytes], bytes]]]:
+    found = []
+    for level in LEVELS['gzip']:
+        found.append(('gzip', level, lambda data, level=level: zlib.compress(data, level, wbits=31)))
+    for level in LEVELS['deflate']:
+        found.append(('deflate', level, lambda data, level=level: zlib.compress(data, level)))
+    try:
+        import zstandard
+    except ImportError:
+        return found
+    for level in LEVELS['zstd']:
+        found.append(('zstd', level, zstandard.ZstdCompressor(level=level).compress))
+    return found
+
+def time_call(function: Callable[[], Any], min_seconds: float = 0.2) -> float:
+    """Mean seconds per call over at least min_seconds."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+async def get(path: str, headers: List[Tuple[bytes, bytes]]) -> int:
+    """Send one GET through the app and return the number of body bytes sent."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench")] + headers, "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    sent = 0
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal sent
+        sent += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sent
+
+async def serve(requests: int, accept_encoding: bytes) -> Tuple[float, float]:
+    """Requests per second and mean bytes sent for the list page."""
+    headers = [(b"accept-encoding", accept_encoding)] if accept_encoding else []
+    path = "/api/todos?limit=1000"
+    await get(path, headers)
+    sent = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        sent += await get(path, headers)
+    return requests / (time.perf_counter() - start), sent / requests
+
+async def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    await lifespan_startup()
+    engine = get_engine()
+    engine.insert_many('todos', [{
+        "title": f"Todo {i}",
+        "description": "Benchmark todo with a description of typical length",
+        "completed": i % 3 == 0,
+        "user_id": i % 3 + 1
+    } for i in range(max(BODY_ROWS))])
+    records = engine.view_all('todos')
+
+    print(f"{'body':>11} {'encoding':<8} {'level':>5} {'bytes':>9} {'ratio':>6} {'us/body':>9} {'MB/s':>7}")
+    for rows in BODY_ROWS:
+        body = json_dumps(records[:rows]).encode()
+        print(f"{rows:>6} rows {'identity':<8} {'':>5} {len(body):>9}")
+        for encoding, level, compress in codecs():
+            seconds = time_call(lambda: compress(body))
+            size = len(compress(body))
+            print(f"{'':>11} {encoding:<8} {level:>5} {size:>9} {len(body) / size:>5.1f}x "
+                  f"{seconds * 1e6:>9.1f} {len(body) / seconds / 1e6:>7.1f}")
+
+    cache = get_response_cache()
+    compressor = get_compressor()
+    print(f"\nGET /api/todos?limit=1000, {requests} requests, level {compressor.codecs['gzip'].keywords['level']}")
+    print(f"{'response':<32} {'req/sec':>9} {'bytes sent':>11}")
+    for name, accept_encoding, reuse in [("identity", b"", True),
+                                         ("gzip, compressed per request", b"gzip", False),
+                                         ("gzip, reused from the cache", b"gzip", True)]:
+        # Without reuse the body is still cached, but its compressed copies are never found
+        get_encoded = cache.get_encoded
+        if not reuse:
+            cache.get_encoded = lambda key, encoding: None
+        cache.clear()
+        throughput, sent = await serve(requests, accept_encoding)
+        cache.get_encoded = get_encoded
+        print(f"{name:<32} {throughput:>9.0f} {sent:>11.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Measure the polling path of GET /api/todos: a full response versus a
+revalidation answered with 304 Not Modified.
+
+Handlers are called directly with a constructed Request, so the numbers
+cover database reads, JSON encoding and the cache, not the HTTP server.
+
+Run from the api/ directory:
+    python -m benchmarks.conditional_get [rows]
+"""
+
+import asyncio
+import sys
+import time
+from typing import Dict, Optional, Tuple
+from sanic.compat import Header
+from sanic.request import Request
+from main import app
+from modules.database import get_engine
+from modules.response_cache import get_response_cache
+from modules.todos import get_todos
+
+DEFAULT_ROWS = 10_000
+POLLS = 2_000
+
+def make_request(url: str, headers: Optional[Dict[str, str]] = None) -> Request:
+    return Request(url.encode(), Header(headers or {}), "1.1", "GET", None, app)
+
+async def poll(url: str, etag: Optional[str]) -> Tuple[float, int]:
+    """Poll url POLLS times; return (polls per second, bytes per poll)."""
+    headers = {"If-None-Match": etag} if etag else None
+    size = 0
+    start = time.perf_counter()
+    for _ in range(POLLS):
+        response = await get_todos(make_request(url, headers))
+        size = len(response.body or b"")
+    return POLLS / (time.perf_counter() - start), size
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    get_engine().insert_many('todos', [{
+        "title": f"Todo {i}",
+        "description": "Benchmark todo",
+        "completed": False,
+        "user_id": i % 3 + 1
+    } for i in range(rows)])
+    cache = get_response_cache()
+    url = "/api/todos"
+    etag = asyncio.run(get_todos(make_request(url))).headers["etag"]
+
+    print(f"GET {url} with {rows} todos, {POLLS} polls")
+    print(f"{'request':<26} {'polls/sec':>10} {'bytes':>10}")
+    for label, max_bytes, tag in [
+        ("200, cache off", 0, None),
+        ("200, cache on", cache.max_bytes, None),
+        ("304, cache off", 0, etag),
+    ]:
+        cache.max_bytes = max_bytes
+        cache.max_entry_bytes = max_bytes // 4
+        throughput, size = asyncio.run(poll(url, tag))
+        print(f"{label:<26} {throughput:>10.0f} {size:>10}")
+
+if __name__ == "__main__":
+    main()
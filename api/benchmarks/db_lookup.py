@@ -0,0 +1,73 @@
+"""
+Benchmark primary-key lookups, inserts, updates and deletes on MockDatabase,
+with the indexes, text index and counters init_db declares, so writes pay
+for keeping all of them current.
+
+Run from the api/ directory:
+    python -m benchmarks.db_lookup
+"""
+
+import time
+from typing import Dict, List
+from modules.database import MockDatabase, create_schema
+
+TABLE_SIZES = [10, 1_000, 100_000, 1_000_000]
+OPERATIONS = 10_000
+
+def build_db(rows: int) -> MockDatabase:
+    """Create a database with the given number of todos."""
+    db = MockDatabase()
+    create_schema(db)
+    for i in range(rows):
+        db.insert('todos', {
+            "title": f"Todo {i}",
+            "description": "Benchmark todo",
+            "completed": False,
+            "user_id": 1
+        })
+    return db
+
+def time_per_op(rows: int) -> Dict[str, float]:
+    """Measure the average cost in microseconds of each primary-key operation."""
+    db = build_db(rows)
+    # Spread probes over the whole table so a scan would hit its worst case
+    ids: List[int] = [(i * 7919) % rows + 1 for i in range(OPERATIONS)]
+    results = {}
+
+    start = time.perf_counter()
+    for record_id in ids:
+        db.find_by_id('todos', record_id)
+    results['find_by_id'] = (time.perf_counter() - start) / OPERATIONS * 1e6
+
+    start = time.perf_counter()
+    for i in range(OPERATIONS):
+        db.insert('todos', {"title": f"New {i}", "description": "Benchmark todo", "completed": False, "user_id": 1})
+    results['insert'] = (time.perf_counter() - start) / OPERATIONS * 1e6
+
+    start = time.perf_counter()
+    for record_id in ids:
+        db.update_by_id('todos', record_id, {"completed": True})
+    results['update_by_id'] = (time.perf_counter() - start) / OPERATIONS * 1e6
+
+    start = time.perf_counter()
+    for record_id in ids:
+        db.update_by_id('todos', record_id, {"title": f"Renamed {record_id}"})
+    results['update_title'] = (time.perf_counter() - start) / OPERATIONS * 1e6
+
+    start = time.perf_counter()
+    for record_id in ids:
+        db.delete_by_id('todos', record_id)
+    results['delete_by_id'] = (time.perf_counter() - start) / OPERATIONS * 1e6
+
+    return results
+
+def main() -> None:
+    print(f"{'rows':>10} {'find_by_id':>12} {'insert':>10} {'update_by_id':>14} {'update_title':>14} "
+          f"{'delete_by_id':>14}  (us/op)")
+    for rows in TABLE_SIZES:
+        results = time_per_op(rows)
+        print(f"{rows:>10} {results['find_by_id']:>12.3f} {results['insert']:>10.3f} "
+              f"{results['update_by_id']:>14.3f} {results['update_title']:>14.3f} {results['delete_by_id']:>14.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare throughput of the in-memory and SQLite storage engines through the
+AsyncDatabase facade used by the handlers.
+
+Run from the api/ directory:
+    python -m benchmarks.engine_throughput [rows]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from modules.database import AsyncDatabase, MockDatabase, StorageBackend
+from modules.sqlite_backend import SQLiteDatabase
+
+DEFAULT_ROWS = 10_000
+OPERATIONS = 20_000
+CONCURRENCY = 32
+
+def seed(engine: StorageBackend, rows: int) -> None:
+    """Load rows todos spread over 100 users."""
+    engine.create_index('users', 'email', unique=True)
+    engine.create_index('todos', 'user_id')
+    engine.insert_many('users', [{"name": f"User {i}", "email": f"user{i}@example.com"} for i in range(100)])
+    engine.insert_many('todos', [{
+        "title": f"Todo {i}",
+        "description": "Benchmark todo",
+        "completed": False,
+        "user_id": i % 100 + 1
+    } for i in range(rows)])
+
+async def run_mix(db: AsyncDatabase, rows: int) -> float:
+    """Run a 80% read / 10% insert / 10% update mix and return ops per second."""
+    rng = random.Random(42)
+    per_worker = OPERATIONS // CONCURRENCY
+
+    async def worker() -> None:
+        for _ in range(per_worker):
+            roll = rng.random()
+            todo_id = rng.randint(1, rows)
+            if roll < 0.7:
+                await db.view_by_id('todos', todo_id)
+            elif roll < 0.8:
+                await db.view_by_field('todos', 'user_id', todo_id % 100 + 1)
+            elif roll < 0.9:
+                await db.insert('todos', {"title": "New", "description": "d", "completed": False, "user_id": 1})
+            else:
+                await db.update_by_id('todos', todo_id, {"completed": True})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return per_worker * CONCURRENCY / (time.perf_counter() - start)
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    print(f"{rows} todos, {OPERATIONS} ops, concurrency {CONCURRENCY}")
+    print(f"{'engine':<10} {'ops/sec':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, engine in [
+            ('memory', MockDatabase()),
+            ('sqlite', SQLiteDatabase(os.path.join(tmp, 'bench.db'))),
+        ]:
+            seed(engine, rows)
+            throughput = asyncio.run(run_mix(AsyncDatabase(engine), rows))
+            print(f"{name:<10} {throughput:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measure the serverless handler in api/index.py per request, by route, with
+its tables grown to the given number of rows.
+
+Requests are dispatched in-process on a handler instance without a socket,
+so the numbers cover URL parsing, routing, lookups and JSON encoding.
+
+Run from the api/ directory:
+    python -m benchmarks.index_handler [rows]
+"""
+
+import io
+import sys
+import time
+from email.message import Message
+import index
+
+DEFAULT_ROWS = 10_000
+CALLS = 20_000
+
+class BenchHandler(index.handler):
+    def __init__(self):
+        # Skip socket setup; each call() fills in one request
+        self.request_version = "HTTP/1.1"
+        self.client_address = ("127.0.0.1", 0)
+        self.headers = Message()
+
+    def log_message(self, format, *args):
+        pass
+
+    def call(self, method: str, path: str) -> None:
+        self.command = method
+        self.path = path
+        self.requestline = f"{method} {path} HTTP/1.1"
+        self.wfile = io.BytesIO()
+        self._handle_request()
+
+def seed(rows: int) -> None:
+    # Handlers from before the id indexes have no add_record
+    add = getattr(index, 'add_record', lambda table, record: index._db[table].append(record))
+    users, todos = index._db['users'], index._db['todos']
+    while len(users) < rows:
+        add("users", {'id': index.get_next_id('users'), 'name': 'Bench',
+                                   'email': f"bench{len(users)}@example.com", 'created_at': '2024-01-01T00:00:00'})
+    while len(todos) < rows:
+        add("todos", {'id': index.get_next_id('todos'), 'title': 'Bench', 'description': 'Bench',
+                                   'completed': False, 'user_id': 1, 'created_at': '2024-01-01T00:00:00'})
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    seed(rows)
+    handler = BenchHandler()
+    cases = [
+        ("GET /api/health", "/api/health"),
+        ("GET /api/users/{id} (last)", f"/api/users/{rows}"),
+        ("GET /api/python/todos/{id}", f"/api/python/todos/{rows // 2}"),
+        ("GET /api/todos?limit=10", "/api/todos?limit=10"),
+        ("GET /api/nothing (404)", "/api/nothing"),
+    ]
+    print(f"{rows} rows per table, {CALLS} calls each")
+    print(f"{'request':<30} {'us/request':>11}")
+    for name, path in cases:
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            handler.call("GET", path)
+        print(f"{name:<30} {(time.perf_counter() - start) / CALLS * 1e6:>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Load test both API entry points over real sockets.
+
+Each run boots a server in its own process with a fixed number of todos:
+main.app (Sanic, one process) or index.handler (behind http.server, one
+request at a time, as on a Vercel instance). An asyncio load generator
+in this process then sends a weighted mix of reads and writes over
+keep-alive connections. Each run reports throughput, p50/p99 latency per
+operation and overall, and the server's RSS.
+
+Results are written as JSON. Given a baseline from an earlier run
+(--baseline), every (target, rows) pair is compared against it, and the
+script exits with status 1 when throughput drops, or p99 latency or RSS
+grows, by more than --threshold. It also exits with status 1 when a server
+answered any request, warm-up included, with a 503: the load stays within
+what one process handles, so admission control must never shed it. Everything runs on 127.0.0.1, without
+network access or extra packages (RSS is read from /proc, so Linux only).
+
+Operations:
+    get     GET /api/todos/<random id>
+    list    GET /api/todos?limit=20&cursor=<random id>
+    create  POST /api/todos
+    update  PUT /api/todos/<random id>
+
+Run from the api/ directory:
+    python -m benchmarks.load_test [--targets main,index] [--rows 1k,100k,1M]
+        [--requests 20000] [--concurrency 32] [--mix get=70,list=10,create=10,update=10]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from modules.pagination import encode_cursor
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = ('main', 'index')
+OPERATIONS = ('get', 'list', 'create', 'update')
+DEFAULT_MIX = "get=70,list=10,create=10,update=10"
+SEED_USERS = 100
+# Time allowed for a server to seed its data and start listening
+STARTUP_TIMEOUT_S = 60
+STARTUP_TIMEOUT_S_PER_100K_ROWS = 30
+
+# ---------------------------------------------------------------------------
+# Servers (run in a child process)
+# ---------------------------------------------------------------------------
+
+def seed_todos(rows: int, start: int):
+    """Todo bodies for ids start..rows; zero-padded titles keep the title index append-only."""
+    for i in range(start, rows + 1):
+        yield {"title": f"Todo {i:07d}", "description": "Load test todo", "completed": i % 3 == 0,
+               "user_id": i % SEED_USERS + 1}
+
+def serve_main(port: int, rows: int) -> None:
+    from main import app
+    from modules.database import get_engine
+    engine = get_engine()
+    if engine is None:
+        raise SystemExit("The load test seeds the engine in-process; unset DB_SHARED_SOCKET")
+    engine.insert_many('users', ({"name": f"User {i}", "email": f"user{i}@example.com"}
+                                 for i in range(engine.count('users') + 1, SEED_USERS + 1)))
+    engine.insert_many('todos', seed_todos(rows, engine.count('todos') + 1))
+    app.run(host="127.0.0.1", port=port, single_process=True, motd=False, access_log=False)
+
+def serve_index(port: int, rows: int) -> None:
+    from http.server import HTTPServer
+    import index
+    for i in range(len(index._db['users']) + 1, SEED_USERS + 1):
+        index.add_record('users', {'id': index.get_next_id('users'), 'name': f"User {i}",
+                                   'email': f"user{i}@example.com", 'created_at': '2024-01-01T00:00:00'})
+    for todo in seed_todos(rows, len(index._db['todos']) + 1):
+        index.add_record('todos', {'id': index.get_next_id('todos'), **todo, 'created_at': '2024-01-01T00:00:00'})
+
+    class Server(HTTPServer):
+        # Room for every load generator connection in the accept queue
+        request_queue_size = 1024
+
+    Server(("127.0.0.1", port), index.handler).serve_forever()
+
+# ---------------------------------------------------------------------------
+# Load generator
+# ---------------------------------------------------------------------------
+
+class Connection:
+    """Minimal HTTP/1.1 client connection that reconnects whenever the server closes it."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> int:
+        """Send one request and read the whole response; returns the status code."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        version, status = lines[0].split(" ", 2)[:2]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = headers.get("connection") != "close" and (version == "HTTP/1.1" or headers.get("connection") == "keep-alive")
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            # No framing: the body runs until the server closes the connection
+            await self.reader.read()
+            keep_alive = False
+        if not keep_alive:
+            self.close()
+        return int(status)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("The mix needs at least one operation with a positive weight")
+    return mix
+
+def parse_rows(spec: str) -> List[int]:
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    sizes = []
+    for part in spec.lower().split(","):
+        part = part.strip()
+        sizes.append(int(float(part[:-1]) * multipliers[part[-1]]) if part[-1] in multipliers else int(part))
+    return sizes
+
+def build_request(operation: str, rng: random.Random, rows: int) -> Tuple[str, str, bytes]:
+    todo_id = rng.randint(1, rows)
+    if operation == "get":
+        return "GET", f"/api/todos/{todo_id}", b""
+    if operation == "list":
+        return "GET", f"/api/todos?limit=20&cursor={encode_cursor(todo_id - 1)}", b""
+    if operation == "create":
+        body = {"title": f"Created {todo_id}", "description": "Load test write", "user_id": rng.randint(1, SEED_USERS)}
+        return "POST", "/api/todos", json.dumps(body).encode()
+    return "PUT", f"/api/todos/{todo_id}", json.dumps({"completed": rng.random() < 0.5}).encode()
+
+def percentile(sorted_values: List[int], q: float) -> float:
+    """q-quantile of sorted nanosecond durations, in milliseconds (nearest rank)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)] / 1e6
+
+async def generate_load(port: int, rows: int, requests: int, concurrency: int,
+                        mix: Dict[str, float], seed: int) -> Dict[str, Any]:
+    operations, weights = list(mix), list(mix.values())
+    durations: Dict[str, List[int]] = {operation: [] for operation in operations}
+    errors: Dict[str, int] = {operation: 0 for operation in operations}
+    shed = 0
+    warmup = min(requests // 10, 1000)
+    remaining = warmup + requests
+    started = 0
+    start = 0.0
+
+    async def worker(worker_id: int) -> None:
+        nonlocal remaining, started, start, shed
+        rng = random.Random(seed * 1000 + worker_id)
+        connection = Connection(port)
+        while remaining > 0:
+            remaining -= 1
+            started += 1
+            if started == warmup + 1:
+                start = time.perf_counter()
+            measured = started > warmup
+            operation = rng.choices(operations, weights)[0]
+            method, path, body = build_request(operation, rng, rows)
+            begin = time.perf_counter_ns()
+            try:
+                status = await connection.request(method, path, body)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                connection.close()
+                status = 599
+            if status == 503:
+                shed += 1
+            if measured:
+                durations[operation].append(time.perf_counter_ns() - begin)
+                if status >= 400:
+                    errors[operation] += 1
+        connection.close()
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    all_durations = sorted(d for values in durations.values() for d in values)
+    by_operation = {}
+    for operation, values in durations.items():
+        values.sort()
+        by_operation[operation] = {"count": len(values), "errors": errors[operation],
+                                   "p50_ms": round(percentile(values, 0.5), 3),
+                                   "p99_ms": round(percentile(values, 0.99), 3)}
+    return {
+        "requests": len(all_durations),
+        "errors": sum(errors.values()),
+        "shed": shed,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(all_durations) / elapsed, 1),
+        "p50_ms": round(percentile(all_durations, 0.5), 3),
+        "p99_ms": round(percentile(all_durations, 0.99), 3),
+        "operations": by_operation,
+    }
+
+# ---------------------------------------------------------------------------
+# Runs
+# ---------------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process."""
+    values = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                name, kb = line.split()[:2]
+                values[name[:-1]] = round(int(kb) / 1024, 1)
+    return {"rss_mb": values.get("VmRSS", 0.0), "peak_rss_mb": values.get("VmHWM", 0.0)}
+
+async def wait_until_ready(port: int, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before listening")
+        connection = Connection(port)
+        try:
+            if await connection.request("GET", "/api/health") == 200:
+                return
+        except (OSError, asyncio.IncompleteReadError):
+            await asyncio.sleep(0.1)
+        finally:
+            connection.close()
+    raise RuntimeError(f"Server did not answer /api/health within {timeout:.0f}s")
+
+async def run_one(target: str, rows: int, args: argparse.Namespace) -> Dict[str, Any]:
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.load_test", "--serve", target,
+                                "--port", str(port), "--rows", str(rows)],
+                               cwd=API_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        boot_start = time.perf_counter()
+        await wait_until_ready(port, process, STARTUP_TIMEOUT_S + STARTUP_TIMEOUT_S_PER_100K_ROWS * rows / 100_000)
+        startup_s = time.perf_counter() - boot_start
+        seeded = memory_mb(process.pid)
+        result = await generate_load(port, rows, args.requests, args.concurrency, args.mix, args.seed)
+        memory = memory_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+    return {"target": target, "rows": rows, "startup_s": round(startup_s, 2),
+            "seeded_rss_mb": seeded["rss_mb"], **memory, **result}
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe every metric that regressed beyond the threshold relative to the baseline."""
+    previous = {(run["target"], run["rows"]): run for run in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst baseline (threshold {threshold:.0%}):")
+    print(f"{'target':<7} {'rows':>9} {'req/s':>8} {'p50':>8} {'p99':>8} {'rss':>8}")
+    for run in results:
+        base = previous.get((run["target"], run["rows"]))
+        if base is None:
+            print(f"{run['target']:<7} {run['rows']:>9} (not in baseline)")
+            continue
+        changes = {key: (run[key] - base[key]) / base[key] if base[key] else 0.0
+                   for key in ("throughput_rps", "p50_ms", "p99_ms", "rss_mb")}
+        print(f"{run['target']:<7} {run['rows']:>9} {changes['throughput_rps']:>+8.1%} {changes['p50_ms']:>+8.1%} "
+              f"{changes['p99_ms']:>+8.1%} {changes['rss_mb']:>+8.1%}")
+        label = f"{run['target']} {run['rows']} rows"
+        if changes["throughput_rps"] < -threshold:
+            regressions.append(f"{label}: throughput {base['throughput_rps']} -> {run['throughput_rps']} req/s")
+        for key in ("p99_ms", "rss_mb"):
+            if changes[key] > threshold:
+                regressions.append(f"{label}: {key} {base[key]} -> {run[key]}")
+    return regressions
+
+async def run_all(args: argparse.Namespace) -> int:
+    results = []
+    print(f"{args.requests} requests per run, concurrency {args.concurrency}, "
+          f"mix {','.join(f'{name}={weight:g}' for name, weight in args.mix.items())}")
+    print(f"{'target':<7} {'rows':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'rss MB':>8} {'startup s':>10}")
+    for rows in args.rows:
+        for target in args.targets:
+            run = await run_one(target, rows, args)
+            results.append(run)
+            print(f"{target:<7} {rows:>9} {run['throughput_rps']:>9.0f} {run['p50_ms']:>8.2f} {run['p99_ms']:>8.2f} "
+                  f"{run['errors']:>7} {run['rss_mb']:>8.1f} {run['startup_s']:>10.2f}")
+
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "mix": args.mix, "seed": args.seed},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    regressions = [f"{run['target']} {run['rows']} rows: {run['shed']} requests shed with 503"
+                   for run in results if run["shed"]]
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions += compare(results, json.load(baseline), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the Sanic app and the serverless handler.")
+    parser.add_argument("--targets", type=lambda spec: spec.split(","), default=list(TARGETS))
+    parser.add_argument("--rows", type=parse_rows, default=parse_rows("1k,100k,1M"))
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="largest tolerated relative regression (default 0.1)")
+    parser.add_argument("--serve", choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        (serve_main if args.serve == 'main' else serve_index)(args.port, args.rows[0])
+        return 0
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+    return asyncio.run(run_all(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
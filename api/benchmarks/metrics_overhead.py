@@ -0,0 +1,59 @@
+"""
+Measure what recording metrics costs: requests per second through the full
+middleware stack with metrics off and on, and the cost of each recording
+call on its own. The access log is off so only metrics differ.
+
+Run from the api/ directory:
+    python -m benchmarks.metrics_overhead [requests]
+"""
+
+import asyncio
+import sys
+import time
+from benchmarks.access_log import lifespan_startup, run
+from modules.access_log import get_access_log
+from modules.metrics import Histogram, Metrics, get_metrics
+
+DEFAULT_REQUESTS = 20_000
+CALLS = 1_000_000
+
+def per_call_ns(fn, *args) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(CALLS):
+        fn(*args)
+    return (time.perf_counter_ns() - start) / CALLS
+
+async def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    await lifespan_startup()
+    get_access_log().log_format = 'off'
+    metrics = get_metrics()
+    
+    print(f"{requests} GET requests through the middleware stack")
+    print(f"{'metrics':<8} {'req/sec':>9}")
+    results = {}
+    for _ in range(2):
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            await run(requests // 10)
+            results[enabled] = max(results.get(enabled, 0), await run(requests))
+    for enabled in (False, True):
+        print(f"{'on' if enabled else 'off':<8} {results[enabled]:>9.0f}")
+    print(f"overhead: {(1 / results[True] - 1 / results[False]) * 1e9:.0f} ns per request")
+    
+    standalone = Metrics()
+    print(f"\nper call ({CALLS} calls)")
+    print(f"  Histogram.record      {per_call_ns(Histogram().record, 123_456):>6.0f} ns")
+    print(f"  request_started       {per_call_ns(standalone.request_started, 'GET', '/api/todos'):>6.0f} ns")
+    print(f"  request_finished      {per_call_ns(standalone.request_finished, 'GET', '/api/todos', 200, 123_456):>6.0f} ns")
+    print(f"  db_operation          {per_call_ns(standalone.db_operation, 'view_all', 'todos', 12_345, 100):>6.0f} ns")
+    
+    for _ in range(100):
+        for route in ("/api/users", "/api/todos", "/api/todos/<todo_id:int>"):
+            standalone.request_finished('GET', route, 200, 123_456)
+    start = time.perf_counter()
+    body = standalone.render()
+    print(f"  render                {(time.perf_counter() - start) * 1000:>6.2f} ms ({len(body)} bytes)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Measure what the profiler costs: requests per second through the full
+middleware stack with PROFILER=off, with PROFILER=on (slow request watchdog
+and per-request breakdown), and with PROFILER=on while a profile is being
+sampled at several intervals, then the cost of the per-request hooks on
+their own. The profiler's middleware is only installed when PROFILER=on at
+startup, so each setting runs in its own process. The access log is off so
+only the profiler differs.
+
+Run from the api/ directory:
+    python -m benchmarks.profiler_overhead [requests]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Dict
+
+DEFAULT_REQUESTS = 20_000
+ROUNDS = 3
+CALLS = 200_000
+# (label, PROFILER, sampling interval in ms or None when not sampling)
+SETTINGS = [
+    ("off", "off", None),
+    ("on, idle", "on", None),
+    ("on, sampling every 10ms", "on", 10),
+    ("on, sampling every 1ms", "on", 1),
+]
+
+async def child(requests: int, interval_ms: str) -> None:
+    from benchmarks.access_log import lifespan_startup, run
+    from modules.profiler import get_profiler
+    await lifespan_startup()
+    profiler = get_profiler()
+    sampling = None
+    if interval_ms:
+        profiler.interval = float(interval_ms) / 1000
+        sampling = asyncio.get_running_loop().run_in_executor(None, profiler.sample, 3600)
+    await run(requests // 10)
+    best = max([await run(requests) for _ in range(2)])
+    print(f"{best:.0f}")
+    if sampling is not None:
+        # Let the process exit without waiting for the sampler
+        os._exit(0)
+
+def per_call_ns(fn, *args) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(CALLS):
+        fn(*args)
+    return (time.perf_counter_ns() - start) / CALLS
+
+def hook_costs() -> None:
+    """Cost of the per-request hooks on their own, with a constructed request."""
+    from sanic.compat import Header
+    from sanic.request import Request
+    from main import app
+    from modules.profiler import Profiler, record_db_time
+    profiler = Profiler(enabled=True)
+    request = Request(b"/api/todos", Header(), "1.1", "GET", None, app)
+
+    def one_request() -> None:
+        profiler.request_started(request, time.perf_counter_ns())
+        record_db_time(12_345)
+        profiler.handler_finished(request)
+        profiler.request_finished(request, 200, "/api/todos")
+
+    print(f"\nper request ({CALLS} calls)")
+    print(f"  hooks of one request     {per_call_ns(one_request):>6.0f} ns")
+    print(f"  record_db_time           {per_call_ns(record_db_time, 12_345):>6.0f} ns")
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    print(f"{requests} GET requests through the middleware stack, best of {ROUNDS} rounds")
+    print(f"{'profiler':<26} {'req/sec':>9} {'overhead':>9}")
+    best: Dict[str, float] = {}
+    # Rounds interleave the settings so drift in machine speed hits them all alike
+    for _ in range(ROUNDS):
+        for label, enabled, interval_ms in SETTINGS:
+            env = {**os.environ, "PROFILER": enabled, "ACCESS_LOG": "off"}
+            output = subprocess.run([sys.executable, "-m", "benchmarks.profiler_overhead", "--child", str(requests),
+                                     str(interval_ms or "")], env=env, capture_output=True, text=True, check=True)
+            best[label] = max(best.get(label, 0.0), float(output.stdout.split()[-1]))
+    baseline = best[SETTINGS[0][0]]
+    for label, _, _ in SETTINGS:
+        print(f"{label:<26} {best[label]:>9.0f} {1 - best[label] / baseline:>9.1%}")
+    hook_costs()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        asyncio.run(child(int(sys.argv[2]), sys.argv[3] if len(sys.argv) > 3 else ""))
+    else:
+        main()
@@ -0,0 +1,78 @@
+"""
+Compare filtered todo lists served by the query planner with the previous
+approach of loading every todo and filtering in Python.
+
+Run from the api/ directory:
+    python -m benchmarks.query_planner [rows]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+from modules.database import MockDatabase
+from modules.query import parse_where
+
+DEFAULT_ROWS = 200_000
+USERS = 1_000
+REPEAT = 20
+
+WORDS = ["Write", "Review", "Fix", "Deploy", "Plan", "Test", "Refactor", "Document"]
+
+def seed(rows: int) -> MockDatabase:
+    db = MockDatabase()
+    db.create_index('todos', 'user_id')
+    db.create_index('todos', 'completed', kind='bitmap')
+    db.create_index('todos', 'created_at', kind='sorted')
+    db.create_index('todos', 'title', kind='sorted')
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    db.load_records('todos', ({
+        "id": i,
+        "title": f"{rng.choice(WORDS)} item {i}",
+        "description": "Benchmark todo",
+        "completed": rng.random() < 0.1,
+        "user_id": rng.randint(1, USERS),
+        "created_at": (start + timedelta(seconds=i * 60)).isoformat()
+    } for i in range(1, rows + 1)))
+    return db
+
+def python_filter(db: MockDatabase, where: Dict[str, Any], limit: int) -> List[Any]:
+    """What GET /api/todos did before: load everything, then filter."""
+    conditions = parse_where(where)
+    todos = [todo for todo in db.view_all('todos') if all(condition.matches(todo) for condition in conditions)]
+    return todos[:limit]
+
+def timed(fn: Callable[[], List[Any]]) -> float:
+    """Mean milliseconds per call."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    db = seed(rows)
+    middle = datetime(2024, 1, 1) + timedelta(seconds=rows * 30)
+    cases = {
+        "user_id + completed": {"user_id": 7, "completed": False},
+        "completed=true, first page": {"completed": True},
+        "title prefix": {"title__prefix": "Deploy item 1"},
+        "created_at, one hour": {"created_at__gte": middle.isoformat(),
+                                 "created_at__lt": (middle + timedelta(hours=1)).isoformat()},
+    }
+    print(f"{rows} todos, mean of {REPEAT} runs, limit 101")
+    print(f"{'filter':<28} {'python ms':>10} {'query ms':>9} {'speedup':>8}  plan")
+    for name, where in cases.items():
+        expected = python_filter(db, where, 101)
+        assert [todo['id'] for todo in db.query('todos', where, limit=101)] == [todo['id'] for todo in expected]
+        before = timed(lambda: python_filter(db, where, 101))
+        after = timed(lambda: db.query('todos', where, limit=101))
+        access = db.explain('todos', where, limit=101)['access']
+        plan = f"{access['type']} ({access['kind']}) on {access['index']}" if 'index' in access else access['type']
+        print(f"{name:<28} {before:>10.2f} {after:>9.3f} {before / after:>7.0f}x  {plan}")
+
+if __name__ == "__main__":
+    main()
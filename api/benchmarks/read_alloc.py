@@ -0,0 +1,50 @@
+"""
+Compare allocations of the copying read path (find_all) with the
+zero-copy view path (view_all) when serving a list endpoint.
+
+Run from the api/ directory:
+    python -m benchmarks.read_alloc
+"""
+
+import tracemalloc
+from typing import Callable, Tuple
+from sanic.response import json
+from modules.database import MockDatabase
+
+ROWS = 100_000
+
+def measure(fn: Callable[[], object]) -> Tuple[int, int]:
+    """Return (allocated blocks, peak bytes) while running fn."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return blocks, peak
+
+def main() -> None:
+    db = MockDatabase()
+    for i in range(ROWS):
+        db.insert('todos', {
+            "title": f"Todo {i}",
+            "description": "Benchmark todo",
+            "completed": i % 2 == 0,
+            "user_id": i % 100
+        })
+
+    print(f"GET /api/todos with {ROWS} rows")
+    print(f"{'read path':<28} {'blocks':>10} {'peak bytes':>14}")
+    for name, fn in [
+        ("find_all (copies)", lambda: db.find_all('todos')),
+        ("view_all (views)", lambda: db.view_all('todos')),
+        ("json(find_all)", lambda: json(db.find_all('todos'))),
+        ("json(view_all)", lambda: json(db.view_all('todos'))),
+    ]:
+        blocks, peak = measure(fn)
+        print(f"{name:<28} {blocks:>10} {peak:>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measure GET handler throughput with and without the response cache under a
+95% read / 5% write mix.
+
+Handlers are called directly with a constructed Request, so the numbers
+cover database reads, JSON encoding and the cache, not the HTTP server.
+
+Run from the api/ directory:
+    python -m benchmarks.response_cache [rows]
+"""
+
+import asyncio
+import random
+import sys
+import time
+from sanic.compat import Header
+from sanic.request import Request
+from main import app
+from modules.database import get_engine
+from modules.response_cache import get_response_cache
+from modules.todos import get_todo, get_todos, get_user_todos, update_todo
+
+DEFAULT_ROWS = 10_000
+REQUESTS = 20_000
+USERS = 100
+
+def make_request(url: str, method: str = "GET") -> Request:
+    return Request(url.encode(), Header(), "1.1", method, None, app)
+
+def seed(rows: int) -> None:
+    engine = get_engine()
+    engine.insert_many('users', [{"name": f"User {i}", "email": f"bench{i}@example.com"} for i in range(USERS)])
+    engine.insert_many('todos', [{
+        "title": f"Todo {i}",
+        "description": "Benchmark todo",
+        "completed": False,
+        "user_id": i % USERS + 1
+    } for i in range(rows)])
+
+async def run_mix(rows: int, write_ratio: float) -> float:
+    """Run the mix and return requests per second."""
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        roll = rng.random()
+        todo_id = rng.randint(1, rows)
+        if roll < write_ratio:
+            request = make_request(f"/api/todos/{todo_id}", "PUT")
+            request.body = b'{"completed":true}' if rng.random() < 0.5 else b'{"completed":false}'
+            await update_todo(request, todo_id)
+        elif roll < 0.5:
+            await get_todos(make_request("/api/todos?limit=100"))
+        elif roll < 0.8:
+            await get_user_todos(make_request(f"/api/users/{todo_id % 10 + 1}/todos"), todo_id % 10 + 1)
+        else:
+            # Hot records, as with a list view opening its first items
+            hot_id = todo_id % 50 + 1
+            await get_todo(make_request(f"/api/todos/{hot_id}"), hot_id)
+    return REQUESTS / (time.perf_counter() - start)
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    seed(rows)
+    cache = get_response_cache()
+    max_bytes = cache.max_bytes
+    print(f"{rows} todos, {REQUESTS} requests: 50% first page, 30% user todos, 20% hot todo")
+    print(f"{'writes':>7} {'cache':>6} {'req/sec':>10} {'hit ratio':>10}")
+    for write_ratio in (0.0, 0.01, 0.05):
+        for enabled in (False, True):
+            cache.max_bytes = max_bytes if enabled else 0
+            cache.max_entry_bytes = cache.max_bytes // 4
+            cache.clear()
+            cache.hits = cache.misses = 0
+            throughput = asyncio.run(run_mix(rows, write_ratio))
+            ratio = f"{cache.stats()['hit_ratio']:.1%}" if enabled else "-"
+            print(f"{write_ratio:>7.0%} {'on' if enabled else 'off':>6} {throughput:>10.0f} {ratio:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Compare full-text search through the inverted index with what clients did
+before: load every todo and filter it themselves (here a plain substring
+test per todo, the cheapest such filter). Then measure what keeping the
+index current adds to each write.
+
+Titles and descriptions are drawn from a made-up vocabulary with a Zipf
+distribution, so queries range from a handful of matches to a large share
+of the table.
+
+Run from the api/ directory:
+    python -m benchmarks.search [rows]
+"""
+
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+from modules.database import TODO_TEXT_FIELDS, MockDatabase
+
+DEFAULT_ROWS = 1_000_000
+USERS = 1_000
+VOCABULARY = 20_000
+WRITES = 2_000
+LIMIT = 20
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "do", "gi", "be", "fu", "ha", "jo"]
+VERBS = ["Write", "Review", "Fix", "Deploy", "Plan", "Test", "Refactor", "Document"]
+
+def make_words(rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < VOCABULARY:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    ordered = sorted(words)
+    rng.shuffle(ordered)
+    return ordered
+
+def seed(rows: int) -> "tuple[MockDatabase, List[str], float]":
+    rng = random.Random(42)
+    words = make_words(rng)
+    # Zipf: the word of rank r is drawn with weight 1/r
+    weights = [1 / rank for rank in range(1, VOCABULARY + 1)]
+    draws = iter(rng.choices(words, weights, k=rows * 8))
+    db = MockDatabase()
+    db.create_index('todos', 'user_id')
+    db.load_records('todos', ({
+        "id": i,
+        "title": f"{VERBS[i % len(VERBS)]} {next(draws)} {next(draws)}",
+        "description": " ".join(next(draws) for _ in range(6)),
+        "completed": False,
+        "user_id": rng.randint(1, USERS),
+        "created_at": "2024-01-01T00:00:00"
+    } for i in range(1, rows + 1)))
+    db.create_text_index('todos', TODO_TEXT_FIELDS)
+    # Over existing records the index is built on a thread
+    start = time.perf_counter()
+    db.wait_for_text_index('todos')
+    return db, words, time.perf_counter() - start
+
+def scan(db: MockDatabase, text: str, where: Dict[str, Any]) -> List[Any]:
+    """Every todo whose title or description contains each query word."""
+    words = text.lower().split()
+    user_id = where.get('user_id')
+    matches = []
+    for todo in db.view_all('todos'):
+        if user_id is not None and todo['user_id'] != user_id:
+            continue
+        haystack = f"{todo['title']} {todo['description']}".lower()
+        if all(word in haystack for word in words):
+            matches.append(todo)
+    return matches
+
+def timed(fn: Callable[[], Any], repeat: int) -> float:
+    """Mean milliseconds per call."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def per_write_us(db: MockDatabase, rng: random.Random, words: List[str]) -> Dict[str, float]:
+    """Microseconds per insert, title update and delete."""
+    new_ids: List[int] = []
+    timings = {}
+    start = time.perf_counter()
+    for _ in range(WRITES):
+        new_ids.append(db.insert('todos', {"title": f"Plan {rng.choice(words)} {rng.choice(words)}",
+                                           "description": " ".join(rng.choices(words, k=6)),
+                                           "completed": False, "user_id": 1})['id'])
+    timings["insert"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for record_id in new_ids:
+        db.update_by_id('todos', record_id, {"title": f"Fix {rng.choice(words)} {rng.choice(words)}"})
+    timings["update title"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for record_id in new_ids:
+        db.update_by_id('todos', record_id, {"completed": True})
+    timings["update completed"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for record_id in new_ids:
+        db.delete_by_id('todos', record_id)
+    timings["delete"] = time.perf_counter() - start
+    return {name: seconds / WRITES * 1e6 for name, seconds in timings.items()}
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    db, words, build_s = seed(rows)
+    print(f"{rows} todos; text index built in the background in {build_s:.1f}s")
+    cases: List[tuple] = [
+        ("rare word", words[15_000], {}),
+        ("uncommon word", words[1_000], {}),
+        ("common word", words[10], {}),
+        ("most common word", words[0], {}),
+        ("prefix", words[3][:4], {}),
+        ("two words", f"{words[10]} {words[200]}", {}),
+        ("common word, one user", words[10], {"user_id": 7}),
+    ]
+    print(f"{'query':<24} {'matches':>8} {'index ms':>9} {'scan ms':>9} {'speedup':>8}")
+    for name, text, where in cases:
+        matches = len(db.search('todos', text, where, limit=rows))
+        indexed = timed(lambda: db.search('todos', text, where, limit=LIMIT), 20)
+        scanned = timed(lambda: scan(db, text, where), 1)
+        print(f"{name:<24} {matches:>8} {indexed:>9.2f} {scanned:>9.1f} {scanned / indexed:>7.0f}x")
+
+    rng = random.Random(7)
+    with_index = per_write_us(db, rng, words)
+    text_index = db._text_indexes.pop('todos')
+    without_index = per_write_us(db, rng, words)
+    db._text_indexes['todos'] = text_index
+    print(f"\nper write ({WRITES} each) {'with index us':>14} {'without us':>11}")
+    for name in with_index:
+        print(f"{name:<22} {with_index[name]:>14.1f} {without_index[name]:>11.1f}")
+
+if __name__ == "__main__":
+    main()
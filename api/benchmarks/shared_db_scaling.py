@@ -0,0 +1,115 @@
+"""
+Measure throughput of the shared database (one owner process serving worker
+processes over a Unix socket) as the number of worker processes grows.
+
+Each worker process runs the same read/write mix as engine_throughput through
+RemoteDatabase; the result is total operations over wall time. The in-process
+AsyncDatabase over MockDatabase is shown as the single-process baseline.
+
+Run from the api/ directory:
+    python -m benchmarks.shared_db_scaling [rows]
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Tuple
+from modules.database import AsyncDatabase, MockDatabase
+from modules.shared_db import RemoteDatabase, start_database_server
+from benchmarks.engine_throughput import CONCURRENCY, DEFAULT_ROWS, OPERATIONS, seed
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+async def run_mix(db: Any, rows: int, rng_seed: int = 42) -> float:
+    """
+    Run the engine_throughput mix and return ops per second.
+
+    New todos go to random users here, so the per-user lists read by
+    view_by_field do not grow with the number of worker processes.
+    """
+    rng = random.Random(rng_seed)
+    per_worker = OPERATIONS // CONCURRENCY
+
+    async def worker() -> None:
+        for _ in range(per_worker):
+            roll = rng.random()
+            todo_id = rng.randint(1, rows)
+            if roll < 0.7:
+                await db.view_by_id('todos', todo_id)
+            elif roll < 0.8:
+                await db.view_by_field('todos', 'user_id', todo_id % 100 + 1)
+            elif roll < 0.9:
+                await db.insert('todos', {"title": "New", "description": "d", "completed": False,
+                                          "user_id": rng.randint(1, 100)})
+            else:
+                await db.update_by_id('todos', todo_id, {"completed": True})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return per_worker * CONCURRENCY / (time.perf_counter() - start)
+
+async def seed_remote(db: RemoteDatabase, rows: int) -> None:
+    """Load rows todos into the owner process (indexes come from init_db)."""
+    await db.insert_many('users', [{"name": f"User {i}", "email": f"user{i}@example.com"} for i in range(100)])
+    for start in range(0, rows, 10_000):
+        await db.insert_many('todos', [{
+            "title": f"Todo {i}",
+            "description": "Benchmark todo",
+            "completed": False,
+            "user_id": i % 100 + 1
+        } for i in range(start, min(start + 10_000, rows))])
+
+def worker(socket_path: str, rows: int, number: int, barrier: multiprocessing.Barrier,
+           results: multiprocessing.Queue) -> None:
+    async def run() -> Tuple[float, float]:
+        db = RemoteDatabase(socket_path)
+        await db.count('todos')  # Connect before the clock starts
+        barrier.wait()
+        start = time.perf_counter()
+        await run_mix(db, rows, number)
+        return start, time.perf_counter()
+
+    results.put(asyncio.run(run()))
+
+def measure(socket_path: str, rows: int, workers: int) -> float:
+    """Run the mix in workers processes at once and return total ops per second."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(socket_path, rows, number, barrier, results))
+                 for number in range(workers)]
+    for process in processes:
+        process.start()
+    spans = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = max(end for _, end in spans) - min(start for start, _ in spans)
+    return OPERATIONS * workers / elapsed
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    print(f"{rows} todos, {OPERATIONS} ops per worker, {os.cpu_count()} CPUs")
+    print(f"{'setup':<22} {'ops/sec':>12}")
+
+    engine = MockDatabase()
+    seed(engine, rows)
+    print(f"{'in-process':<22} {asyncio.run(run_mix(AsyncDatabase(engine), rows)):>12.0f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "db.sock")
+        owner = start_database_server(socket_path)
+        try:
+            asyncio.run(seed_remote(RemoteDatabase(socket_path), rows))
+            for workers in WORKER_COUNTS:
+                label = f"shared, {workers} worker{'s' if workers > 1 else ''}"
+                print(f"{label:<22} {measure(socket_path, rows, workers):>12.0f}")
+        finally:
+            owner.terminate()
+            owner.join()
+
+if __name__ == "__main__":
+    main()
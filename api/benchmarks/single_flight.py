@@ -0,0 +1,103 @@
+"""
+Measure request coalescing on bursts of identical concurrent GETs.
+
+Each round writes one todo, which makes every cached list stale, then sends
+a burst of identical GET /api/todos?limit=1000 requests through the app's
+ASGI interface at once: the herd that follows an invalidation. It runs on
+the SQLite engine, whose calls go to a thread pool and so overlap; the
+in-memory engine answers inline, so its requests never wait on each other.
+With coalescing on, one request per burst runs the handler; with it off,
+every request in the burst does.
+
+Run from the api/ directory:
+    python -m benchmarks.single_flight [concurrency]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+DATA_DIR = tempfile.mkdtemp(prefix="single-flight-bench-")
+os.environ['DB_ENGINE'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(DATA_DIR, 'bench.db')
+os.environ.setdefault('ACCESS_LOG', 'off')
+
+from main import app
+from modules.database import get_engine
+from modules.response_cache import get_single_flight
+from benchmarks.access_log import lifespan_startup
+
+DEFAULT_CONCURRENCY = 32
+ROUNDS = 50
+ROWS = 10_000
+PATH = "/api/todos"
+QUERY = "limit=1000"
+
+async def call(method: str, path: str, query: str = "", body: bytes = b"") -> int:
+    """Send one request through the app and return its status."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+async def rounds(concurrency: int) -> List[float]:
+    """Seconds each burst took to be fully answered."""
+    timings = []
+    for i in range(ROUNDS):
+        await call("PUT", "/api/todos/1", body=b'{"completed":true}' if i % 2 else b'{"completed":false}')
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(call("GET", PATH, QUERY) for _ in range(concurrency)))
+        timings.append(time.perf_counter() - start)
+        assert set(statuses) == {200}, statuses
+    return timings
+
+async def main() -> None:
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CONCURRENCY
+    await lifespan_startup()
+    get_engine().insert_many('todos', [{
+        "title": f"Todo {i}",
+        "description": "Benchmark todo",
+        "completed": False,
+        "user_id": i % 3 + 1
+    } for i in range(ROWS)])
+    single_flight = get_single_flight()
+    await rounds(concurrency)
+
+    print(f"{ROUNDS} bursts of {concurrency} concurrent GET {PATH}?{QUERY}, SQLite, each after a write")
+    print(f"{'coalescing':<11} {'handler calls':>14} {'median burst ms':>16} {'p90 burst ms':>13} {'req/sec':>9}")
+    run = single_flight.run
+    for name, enabled in [("off", False), ("on", True)]:
+        if not enabled:
+            # Every request computes its own response
+            single_flight.run = lambda key, compute: _alone(compute)
+        flights = single_flight.flights
+        timings = await rounds(concurrency)
+        single_flight.run = run
+        handler_calls = single_flight.flights - flights if enabled else ROUNDS * concurrency
+        timings.sort()
+        print(f"{name:<11} {handler_calls:>14} {statistics.median(timings) * 1000:>16.2f} "
+              f"{timings[int(len(timings) * 0.9)] * 1000:>13.2f} {ROUNDS * concurrency / sum(timings):>9.0f}")
+
+async def _alone(compute):
+    return await compute(), False
+
+if __name__ == "__main__":
+    asyncio.run(main())
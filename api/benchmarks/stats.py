@@ -0,0 +1,95 @@
+"""
+Compare todo statistics read from the incrementally kept counters with the
+previous approach of loading every todo and counting, at growing table
+sizes. Each size then runs a random mix of writes (inserts, completed
+flips, reassignments to another user, deletes) and checks the counters
+against a full scan, and reports what keeping them adds to each write.
+
+Run from the api/ directory:
+    python -m benchmarks.stats [rows ...]
+"""
+
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+from modules.database import MockDatabase
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+USERS = 1_000
+WRITES = 20_000
+REPEAT = 1_000
+
+def seed(rows: int) -> MockDatabase:
+    rng = random.Random(42)
+    db = MockDatabase()
+    db.create_index('todos', 'user_id')
+    db.load_records('todos', ({
+        "id": i,
+        "title": f"Todo {i}",
+        "description": "Benchmark todo",
+        "completed": rng.random() < 0.3,
+        "user_id": rng.randint(1, USERS),
+        "created_at": "2024-01-01T00:00:00"
+    } for i in range(1, rows + 1)))
+    db.create_stats('todos', 'user_id', 'completed')
+    return db
+
+def count_everything(db: MockDatabase, user_id: Any = None) -> Dict[str, int]:
+    """What dashboards did before: fetch every todo and count."""
+    todos = completed = 0
+    for todo in db.view_all('todos'):
+        if user_id is None or todo['user_id'] == user_id:
+            todos += 1
+            completed += bool(todo['completed'])
+    return {"todos": todos, "completed": completed}
+
+def timed(fn: Callable[[], Any], repeat: int) -> float:
+    """Mean microseconds per call."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def write_mix(db: MockDatabase, rng: random.Random) -> float:
+    """Run WRITES random writes; returns microseconds per write."""
+    ids: List[int] = [todo['id'] for todo in db.view_all('todos')]
+    start = time.perf_counter()
+    for _ in range(WRITES):
+        op = rng.random()
+        if op < 0.25:
+            ids.append(db.insert('todos', {"title": "New", "description": "", "completed": False,
+                                           "user_id": rng.randint(1, USERS)})['id'])
+        elif op < 0.6:
+            db.update_by_id('todos', rng.choice(ids), {"completed": rng.random() < 0.5})
+        elif op < 0.8:
+            db.update_by_id('todos', rng.choice(ids), {"user_id": rng.randint(1, USERS)})
+        else:
+            position = rng.randrange(len(ids))
+            ids[position], ids[-1] = ids[-1], ids[position]
+            db.delete_by_id('todos', ids.pop())
+    return (time.perf_counter() - start) / WRITES * 1e6
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_ROWS
+    print(f"{'rows':>9} {'user counters us':>17} {'user scan ms':>13} {'all counters us':>16} {'all scan ms':>12} "
+          f"{'write us':>9} {'no stats us':>12} {'check':>9}")
+    for rows in sizes:
+        db = seed(rows)
+        user_counters = timed(lambda: db.stats('todos', 7), REPEAT)
+        all_counters = timed(lambda: db.stats('todos', overall=True), REPEAT)
+        user_scan = timed(lambda: count_everything(db, 7), 3) / 1000
+        all_scan = timed(lambda: count_everything(db), 3) / 1000
+        with_stats = write_mix(db, random.Random(1))
+        problems = db.verify_stats('todos')
+        stats = db._stats.pop('todos')
+        without_stats = write_mix(db, random.Random(2))
+        db._stats['todos'] = stats
+        print(f"{rows:>9} {user_counters:>17.2f} {user_scan:>13.1f} {all_counters:>16.2f} {all_scan:>12.1f} "
+              f"{with_stats:>9.2f} {without_stats:>12.2f} {'ok' if not problems else 'MISMATCH':>9}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+
+if __name__ == "__main__":
+    main()
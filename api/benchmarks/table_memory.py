@@ -0,0 +1,44 @@
+"""
+Compare memory per row of the dict and compact table storage layouts.
+
+Run from the api/ directory:
+    python -m benchmarks.table_memory [rows]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from modules.database import MockDatabase
+
+DEFAULT_ROWS = 1_000_000
+
+def measure(storage: str, rows: int) -> None:
+    """Insert rows todos and report traced bytes per row and a full GC pass."""
+    gc.collect()
+    tracemalloc.start()
+    db = MockDatabase(storage=storage)
+    for i in range(rows):
+        db.insert('todos', {
+            "title": f"Todo {i}",
+            "description": "Imported todo",
+            "completed": i % 3 == 0,
+            "user_id": i % 1000 + 1
+        })
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    gc.collect()
+    gc_ms = (time.perf_counter() - start) * 1000
+    print(f"{storage:<10} {current / rows:>14.1f} {gc_ms:>14.1f}")
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    print(f"{rows} todos")
+    print(f"{'storage':<10} {'bytes/row':>14} {'full gc (ms)':>14}")
+    for storage in ('dict', 'compact'):
+        measure(storage, rows)
+
+if __name__ == "__main__":
+    main()
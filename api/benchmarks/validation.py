@@ -0,0 +1,89 @@
+"""
+Measure request body validation cost per request: the previous path
+(request.json, then Model(**data), then model_dump()) against validating
+the raw bytes with the cached TypeAdapters the handlers use now.
+
+Run from the api/ directory:
+    python -m benchmarks.validation
+"""
+
+import json
+import re
+import time
+from typing import Any, Callable, List, Optional
+from pydantic import BaseModel, field_validator
+from modules.todos import todo_create, todo_create_list, todo_update
+from modules.users import user_create
+
+CALLS = 50_000
+
+# The request models as they were before validation moved to raw bytes
+class PreviousUserCreate(BaseModel):
+    name: str
+    email: str
+    
+    @field_validator('email')
+    @classmethod
+    def validate_email(cls, v):
+        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+        if not re.match(pattern, v):
+            raise ValueError('Invalid email format')
+        return v
+
+class PreviousTodoCreate(BaseModel):
+    title: str
+    description: str
+    user_id: int
+    completed: Optional[bool] = False
+
+class PreviousTodoUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    completed: Optional[bool] = None
+    user_id: Optional[int] = None
+
+def per_call_us(fn: Callable[[], Any], calls: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+def main() -> None:
+    user = json.dumps({"name": "Jane Doe", "email": "jane.doe@example.com"}).encode()
+    todo = json.dumps({"title": "Write docs", "description": "Document the API", "user_id": 3}).encode()
+    update = json.dumps({"completed": True}).encode()
+    bulk = json.dumps([{"title": f"Todo {i}", "description": "Bulk todo", "user_id": 3} for i in range(100)]).encode()
+    
+    def previous_bulk() -> List[dict]:
+        return [PreviousTodoCreate(**item).model_dump() for item in json.loads(bulk)]
+    
+    def current_bulk() -> List[dict]:
+        items = todo_create_list.validate_json(bulk)
+        for item in items:
+            item.setdefault('completed', False)
+        return items
+    
+    def current_todo() -> dict:
+        data = todo_create.validate_json(todo)
+        data.setdefault('completed', False)
+        return data
+    
+    cases = [
+        ("POST /api/users", lambda: PreviousUserCreate(**json.loads(user)).model_dump(),
+         lambda: user_create.validate_json(user), CALLS),
+        ("POST /api/todos", lambda: PreviousTodoCreate(**json.loads(todo)).model_dump(), current_todo, CALLS),
+        ("PUT /api/todos/{id}",
+         lambda: {k: v for k, v in PreviousTodoUpdate(**json.loads(update)).model_dump().items() if v is not None},
+         lambda: {k: v for k, v in todo_update.validate_json(update).items() if v is not None}, CALLS),
+        ("POST /api/todos/bulk (100)", previous_bulk, current_bulk, CALLS // 50),
+    ]
+    print(f"{'body':<28} {'previous us':>12} {'now us':>8} {'speedup':>8}")
+    for name, previous, current, calls in cases:
+        assert previous() == current()
+        before = per_call_us(previous, calls)
+        after = per_call_us(current, calls)
+        print(f"{name:<28} {before:>12.2f} {after:>8.2f} {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
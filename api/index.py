@@ -4,8 +4,12 @@ This file handles all API requests for the Vercel deployment.
 """
 
 from http.server import BaseHTTPRequestHandler
+import base64
+import binascii
 import json
-import os
+import re
+from bisect import bisect_right
+from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 
 # Simple in-memory database for the serverless function
@@ -24,10 +28,96 @@ _db = {
 }
 _counters = {'users': 3, 'todos': 4}
 
+# Indexes over _db, kept in step by add_record
+_by_id = {table: {record['id']: record for record in records} for table, records in _db.items()}
+_emails = {user['email'] for user in _db['users']}
+
 def get_next_id(table):
     _counters[table] += 1
     return _counters[table]
 
+def add_record(table, record):
+    _db[table].append(record)
+    _by_id[table][record['id']] = record
+    if table == 'users':
+        _emails.add(record['email'])
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Keyset pagination (same cursor format as modules/pagination.py)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor parameter")
+
+def paginate_records(records, query_params):
+    """Return one keyset page of an id-ordered list, or the whole list when no paging was asked for."""
+    if 'limit' not in query_params and 'cursor' not in query_params:
+        return records
+    limit = DEFAULT_PAGE_SIZE
+    if 'limit' in query_params:
+        try:
+            limit = int(query_params['limit'][0])
+        except ValueError:
+            raise ValueError("Invalid limit parameter")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    after_id = decode_cursor(query_params['cursor'][0]) if 'cursor' in query_params else 0
+    # Tables are appended in id order, so the page start is a binary search away
+    # (bisect's key argument needs Python 3.10; the project runs on 3.12)
+    start = bisect_right(records, after_id, key=lambda record: record['id'])
+    page = records[start:start + limit]
+    next_cursor = encode_cursor(page[-1]['id']) if start + limit < len(records) else None
+    return {"data": page, "next_cursor": next_cursor}
+
+# Route table: (method, path pattern, handler method, message for an id that is not an integer).
+# Paths may carry an /api and/or /python prefix and a trailing slash.
+ROUTES = [
+    ('GET', '/health', '_health', None),
+    ('GET', '/users', '_list_users', None),
+    ('POST', '/users', '_create_user', None),
+    ('GET', '/users/<user_id:int>', '_get_user', "Invalid user ID"),
+    ('GET', '/todos', '_list_todos', None),
+    ('POST', '/todos', '_create_todo', None),
+    ('GET', '/todos/<todo_id:int>', '_get_todo', "Invalid todo ID"),
+    ('PUT', '/todos/<todo_id:int>', '_update_todo', "Invalid todo ID"),
+]
+
+def compile_routes(routes):
+    """
+    Compile the route table once into [(regex, {method: (handler name, int params, invalid id message)})].
+    
+    <name:int> segments match any segment and are converted afterwards, so a
+    non-numeric id gets a 400 rather than a 404.
+    """
+    compiled = {}
+    for method, pattern, handler_name, invalid_message in routes:
+        int_params = re.findall(r'<(\w+):int>', pattern)
+        regex = re.sub(r'<(\w+):int>', r'(?P<\1>[^/]+)', pattern)
+        compiled.setdefault(regex, {})[method] = (handler_name, int_params, invalid_message)
+    return [(re.compile(r'(?:/api)?(?:/python)?' + regex + r'/?'), methods) for regex, methods in compiled.items()]
+
+_routes = compile_routes(ROUTES)
+
+def match_route(path):
+    """Return (methods, params) for the first route matching path, or (None, None)."""
+    for regex, methods in _routes:
+        match = regex.fullmatch(path)
+        if match:
+            return methods, match.groupdict()
+    return None, None
+
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         self._handle_request()
@@ -53,42 +143,37 @@ class handler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Max-Age', '86400')
         self.end_headers()
     
+    def _debug_info(self, path, query_params):
+        """Request details for troubleshooting; only built for responses that include them."""
+        return {
+            "path": path,
+            "query_params": query_params,
+            "method": self.command,
+            "headers": dict(self.headers)
+        }
+    
     def _handle_request(self):
+        # One handler serves every request on a keep-alive connection
+        self.body_read = False
         try:
             # Parse the URL and extract path
             parsed_url = urlparse(self.path)
             path = parsed_url.path
-            query_params = parse_qs(parsed_url.query)
+            self.query_params = parse_qs(parsed_url.query)
             
-            # Debug info for troubleshooting
-            debug_info = {
-                "path": path,
-                "query_params": query_params,
-                "method": self.command,
-                "headers": dict(self.headers)
-            }
+            entry_point = path in ('/api/index.py', '/api/')
+            if entry_point:
+                # This is the serverless function entry point; the actual
+                # endpoint may come in the path query parameter
+                if 'path' in self.query_params:
+                    path = self.query_params['path'][0]
+                    # ?path=users routes like ?path=/users
+                    if not path.startswith('/'):
+                        path = '/' + path
             
-            # Route to appropriate handler
-            if path == '/api/index.py' or path == '/api/':
-                # This is the serverless function entry point
-                # Check for query parameters that indicate the actual endpoint
-                if 'path' in query_params:
-                    actual_path = query_params['path'][0]
-                else:
-                    actual_path = path
-                
-                if 'health' in actual_path:
-                    self._send_json_response({
-                        "status": "healthy",
-                        "message": "Python Sanic API is running",
-                        "version": "1.0.0",
-                        "debug": debug_info
-                    })
-                elif 'users' in actual_path:
-                    self._handle_users_endpoint(actual_path)
-                elif 'todos' in actual_path:
-                    self._handle_todos_endpoint(actual_path)
-                else:
+            methods, params = match_route(path)
+            if methods is None:
+                if entry_point:
                     self._send_json_response({
                         "message": "Welcome to Sanic + Next.js Template API",
                         "endpoints": {
@@ -96,217 +181,155 @@ class handler(BaseHTTPRequestHandler):
                             "users": "/api/python/users",
                             "todos": "/api/python/todos"
                         },
-                        "debug": debug_info
+                        "debug": self._debug_info(path, self.query_params)
                     })
-            elif path == '/api/health' or path == '/api/python/health':
-                self._send_json_response({
-                    "status": "healthy", 
-                    "message": "Python Sanic API is running",
-                    "version": "1.0.0"
-                })
-            elif '/users' in path:
-                self._handle_users_endpoint(path)
-            elif '/todos' in path:
-                self._handle_todos_endpoint(path)
-            else:
-                self._send_json_response({
-                    "error": f"Not Found: {path}",
-                    "debug": debug_info
-                }, 404)
-                
-        except Exception as e:
-            import traceback
-            self._send_json_response({
-                "error": str(e),
-                "traceback": traceback.format_exc()
-            }, 500)
-    
-    def _handle_users_endpoint(self, path):
-        try:
-            if self.command == 'GET':
-                if path.endswith('/users') or path.endswith('/users/') or 'users' in path and not any(char.isdigit() for char in path.split('users')[-1]):
-                    self._send_json_response(_db['users'])
                 else:
-                    # Extract user ID from path
-                    parts = path.split('/')
-                    user_id_part = None
-                    for i, part in enumerate(parts):
-                        if part == 'users' and i + 1 < len(parts):
-                            user_id_part = parts[i + 1]
-                            break
-                    
-                    if user_id_part:
-                        try:
-                            user_id = int(user_id_part)
-                            user = next((u for u in _db['users'] if u['id'] == user_id), None)
-                            if user:
-                                self._send_json_response(user)
-                            else:
-                                self._send_json_response({"error": "User not found"}, 404)
-                        except ValueError:
-                            self._send_json_response({"error": "Invalid user ID"}, 400)
-                    else:
-                        self._send_json_response({"error": "Invalid path"}, 400)
+                    self._send_json_response({
+                        "error": f"Not Found: {path}",
+                        "debug": self._debug_info(path, self.query_params)
+                    }, 404)
+                return
             
-            elif self.command == 'POST':
-                content_length = int(self.headers.get('Content-Length', 0))
-                if content_length > 0:
-                    body = self.rfile.read(content_length).decode('utf-8')
-                    try:
-                        data = json.loads(body)
-                        
-                        # Simple validation
-                        if not data.get('name') or not data.get('email'):
-                            self._send_json_response({"error": "Name and email are required"}, 400)
-                            return
-                        
-                        # Email format validation
-                        import re
-                        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-                        if not re.match(email_pattern, data['email']):
-                            self._send_json_response({"error": "Invalid email format"}, 400)
-                            return
-                        
-                        # Check if email already exists
-                        if any(u['email'] == data['email'] for u in _db['users']):
-                            self._send_json_response({"error": "Email already exists"}, 400)
-                            return
-                        
-                        from datetime import datetime
-                        new_user = {
-                            'id': get_next_id('users'),
-                            'name': data['name'],
-                            'email': data['email'],
-                            'created_at': datetime.utcnow().isoformat()
-                        }
-                        _db['users'].append(new_user)
-                        self._send_json_response(new_user, 201)
-                    except json.JSONDecodeError:
-                        self._send_json_response({"error": "Invalid JSON"}, 400)
-                    except Exception as e:
-                        self._send_json_response({"error": str(e)}, 400)
-                else:
-                    self._send_json_response({"error": "No data provided"}, 400)
-            else:
+            route = methods.get(self.command)
+            if route is None:
                 self._send_json_response({"error": "Method not allowed"}, 405)
+                return
+            handler_name, int_params, invalid_message = route
+            try:
+                for name in int_params:
+                    params[name] = int(params[name])
+            except ValueError:
+                self._send_json_response({"error": invalid_message}, 400)
+                return
+            getattr(self, handler_name)(**params)
         except Exception as e:
+            if self.body_read:
+                # A body of the wrong shape is the client's error, as it always was
+                self._send_json_response({"error": str(e)}, 400)
+                return
             import traceback
             self._send_json_response({
-                "error": f"Users endpoint error: {str(e)}",
+                "error": str(e),
                 "traceback": traceback.format_exc()
             }, 500)
     
-    def _handle_todos_endpoint(self, path):
+    def _read_json(self):
+        """Read the JSON request body, or send a 400 and return None."""
+        content_length = int(self.headers.get('Content-Length', 0))
+        if content_length <= 0:
+            self._send_json_response({"error": "No data provided"}, 400)
+            return None
         try:
-            if self.command == 'GET':
-                if path.endswith('/todos') or path.endswith('/todos/') or 'todos' in path and not any(char.isdigit() for char in path.split('todos')[-1]):
-                    self._send_json_response(_db['todos'])
-                else:
-                    # Extract todo ID from path
-                    parts = path.split('/')
-                    todo_id_part = None
-                    for i, part in enumerate(parts):
-                        if part == 'todos' and i + 1 < len(parts):
-                            todo_id_part = parts[i + 1]
-                            break
-                    
-                    if todo_id_part:
-                        try:
-                            todo_id = int(todo_id_part)
-                            todo = next((t for t in _db['todos'] if t['id'] == todo_id), None)
-                            if todo:
-                                self._send_json_response(todo)
-                            else:
-                                self._send_json_response({"error": "Todo not found"}, 404)
-                        except ValueError:
-                            self._send_json_response({"error": "Invalid todo ID"}, 400)
-                    else:
-                        self._send_json_response({"error": "Invalid path"}, 400)
-            
-            elif self.command == 'POST':
-                content_length = int(self.headers.get('Content-Length', 0))
-                if content_length > 0:
-                    body = self.rfile.read(content_length).decode('utf-8')
-                    try:
-                        data = json.loads(body)
-                        
-                        # Simple validation
-                        required_fields = ['title', 'description', 'user_id']
-                        for field in required_fields:
-                            if not data.get(field):
-                                self._send_json_response({"error": f"{field} is required"}, 400)
-                                return
-                        
-                        # Check if user exists
-                        user = next((u for u in _db['users'] if u['id'] == data['user_id']), None)
-                        if not user:
-                            self._send_json_response({"error": "User not found"}, 400)
-                            return
-                        
-                        from datetime import datetime
-                        new_todo = {
-                            'id': get_next_id('todos'),
-                            'title': data['title'],
-                            'description': data['description'],
-                            'user_id': data['user_id'],
-                            'completed': data.get('completed', False),
-                            'created_at': datetime.utcnow().isoformat()
-                        }
-                        _db['todos'].append(new_todo)
-                        self._send_json_response(new_todo, 201)
-                    except json.JSONDecodeError:
-                        self._send_json_response({"error": "Invalid JSON"}, 400)
-                    except Exception as e:
-                        self._send_json_response({"error": str(e)}, 400)
-                else:
-                    self._send_json_response({"error": "No data provided"}, 400)
-            
-            elif self.command == 'PUT':
-                # Handle todo updates
-                parts = path.split('/')
-                todo_id_part = None
-                for i, part in enumerate(parts):
-                    if part == 'todos' and i + 1 < len(parts):
-                        todo_id_part = parts[i + 1]
-                        break
-                
-                if todo_id_part:
-                    try:
-                        todo_id = int(todo_id_part)
-                        content_length = int(self.headers.get('Content-Length', 0))
-                        if content_length > 0:
-                            body = self.rfile.read(content_length).decode('utf-8')
-                            try:
-                                data = json.loads(body)
-                                # Find and update todo
-                                for i, todo in enumerate(_db['todos']):
-                                    if todo['id'] == todo_id:
-                                        for key, value in data.items():
-                                            if key != 'id' and value is not None:
-                                                _db['todos'][i][key] = value
-                                        from datetime import datetime
-                                        _db['todos'][i]['updated_at'] = datetime.utcnow().isoformat()
-                                        self._send_json_response(_db['todos'][i])
-                                        return
-                                self._send_json_response({"error": "Todo not found"}, 404)
-                            except json.JSONDecodeError:
-                                self._send_json_response({"error": "Invalid JSON"}, 400)
-                            except Exception as e:
-                                self._send_json_response({"error": str(e)}, 400)
-                        else:
-                            self._send_json_response({"error": "No data provided"}, 400)
-                    except ValueError:
-                        self._send_json_response({"error": "Invalid todo ID"}, 400)
-                else:
-                    self._send_json_response({"error": "Invalid path"}, 400)
-            else:
-                self._send_json_response({"error": "Method not allowed"}, 405)
-        except Exception as e:
-            import traceback
-            self._send_json_response({
-                "error": f"Todos endpoint error: {str(e)}",
-                "traceback": traceback.format_exc()
-            }, 500)
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._send_json_response({"error": "Invalid JSON"}, 400)
+            return None
+        if not isinstance(data, dict):
+            self._send_json_response({"error": "Expected a JSON object"}, 400)
+            return None
+        # Errors from here on come from the body's values (e.g. a number for email)
+        self.body_read = True
+        return data
+    
+    def _health(self):
+        self._send_json_response({
+            "status": "healthy",
+            "message": "Python Sanic API is running",
+            "version": "1.0.0"
+        })
+    
+    def _list_users(self):
+        self._send_list_response(_db['users'])
+    
+    def _get_user(self, user_id):
+        user = _by_id['users'].get(user_id)
+        if user:
+            self._send_json_response(user)
+        else:
+            self._send_json_response({"error": "User not found"}, 404)
+    
+    def _create_user(self):
+        data = self._read_json()
+        if data is None:
+            return
+        
+        # Simple validation
+        if not data.get('name') or not data.get('email'):
+            self._send_json_response({"error": "Name and email are required"}, 400)
+            return
+        if not EMAIL_PATTERN.match(data['email']):
+            self._send_json_response({"error": "Invalid email format"}, 400)
+            return
+        if data['email'] in _emails:
+            self._send_json_response({"error": "Email already exists"}, 400)
+            return
+        
+        new_user = {
+            'id': get_next_id('users'),
+            'name': data['name'],
+            'email': data['email'],
+            'created_at': datetime.utcnow().isoformat()
+        }
+        add_record('users', new_user)
+        self._send_json_response(new_user, 201)
+    
+    def _list_todos(self):
+        self._send_list_response(_db['todos'])
+    
+    def _get_todo(self, todo_id):
+        todo = _by_id['todos'].get(todo_id)
+        if todo:
+            self._send_json_response(todo)
+        else:
+            self._send_json_response({"error": "Todo not found"}, 404)
+    
+    def _create_todo(self):
+        data = self._read_json()
+        if data is None:
+            return
+        
+        # Simple validation
+        for field in ('title', 'description', 'user_id'):
+            if not data.get(field):
+                self._send_json_response({"error": f"{field} is required"}, 400)
+                return
+        
+        # Check if user exists
+        if data['user_id'] not in _by_id['users']:
+            self._send_json_response({"error": "User not found"}, 400)
+            return
+        
+        new_todo = {
+            'id': get_next_id('todos'),
+            'title': data['title'],
+            'description': data['description'],
+            'user_id': data['user_id'],
+            'completed': data.get('completed', False),
+            'created_at': datetime.utcnow().isoformat()
+        }
+        add_record('todos', new_todo)
+        self._send_json_response(new_todo, 201)
+    
+    def _update_todo(self, todo_id):
+        data = self._read_json()
+        if data is None:
+            return
+        
+        todo = _by_id['todos'].get(todo_id)
+        if todo is None:
+            self._send_json_response({"error": "Todo not found"}, 404)
+            return
+        for key, value in data.items():
+            if key != 'id' and value is not None:
+                todo[key] = value
+        todo['updated_at'] = datetime.utcnow().isoformat()
+        self._send_json_response(todo)
+    
+    def _send_list_response(self, records):
+        try:
+            self._send_json_response(paginate_records(records, self.query_params))
+        except ValueError as e:
+            self._send_json_response({"error": str(e)}, 400)
     
     def _send_json_response(self, data, status_code=200):
         self.send_response(status_code)
@@ -3,29 +3,77 @@ Main application entry point for Vercel serverless deployment.
 This file creates the Sanic app and imports all modules to build the complete API.
 """
 
+import gc
+import os
 from sanic import Sanic
-from sanic.response import json
-from modules.database import init_db
+from sanic.response import json, text
+from modules.database import init_db, get_engine
 from modules.users import users_bp
 from modules.todos import todos_bp
 from modules.middleware import setup_middleware
+from modules.response_cache import get_response_cache, get_single_flight
+from modules.metrics import PROMETHEUS_CONTENT_TYPE, get_metrics
+from modules.admission import get_admission
+from modules.profiler import debug_bp, get_profiler
+from modules.coldstart import startup_phase
+from modules.validation import build_validators
 
 def create_app() -> Sanic:
     """Create and configure the Sanic application."""
-    app = Sanic("sanic_nextjs_template")
+    with startup_phase("create Sanic app"):
+        app = Sanic("sanic_nextjs_template")
     
     # Setup middleware (includes CORS)
-    setup_middleware(app)
+    with startup_phase("setup_middleware"):
+        setup_middleware(app)
+    
+    # Build the request body validators in a thread before serving, so the
+    # first write does not stall the event loop importing pydantic
+    @app.before_server_start
+    async def build_body_validators(app, loop):
+        await loop.run_in_executor(None, build_validators)
     
     # Initialize database
-    init_db()
+    with startup_phase("init_db"):
+        init_db()
+    
+    # With several workers, one owner process holds the data for all of them
+    shared_socket = os.environ.get('DB_SHARED_SOCKET')
+    if shared_socket:
+        from modules.shared_db import start_database_server
+        
+        @app.main_process_start
+        async def start_shared_database(app, loop):
+            app.ctx.db_owner = start_database_server(shared_socket)
+        
+        @app.main_process_stop
+        async def stop_shared_database(app, loop):
+            app.ctx.db_owner.terminate()
+            app.ctx.db_owner.join()
+    
+    # Snapshot and flush the write-ahead log when persistence is enabled
+    persistence = getattr(get_engine(), 'persistence', None)
+    if persistence is not None:
+        # The restored data lives as long as the process. Freezing everything
+        # allocated so far (for the whole process, not just the database)
+        # keeps later garbage collections from walking it again.
+        gc.freeze()
+        app.add_task(persistence.snapshot_periodically(float(os.environ.get('DB_SNAPSHOT_INTERVAL', '300'))))
+        
+        @app.after_server_stop
+        async def flush_persistence(app, loop):
+            persistence.flush()
     
     # Register blueprints
-    app.blueprint(users_bp, url_prefix="/api")
-    app.blueprint(todos_bp, url_prefix="/api")
+    with startup_phase("register blueprints"):
+        app.blueprint(users_bp, url_prefix="/api")
+        app.blueprint(todos_bp, url_prefix="/api")
+        # Profiling and slow request endpoints exist only with PROFILER=on
+        if get_profiler().enabled:
+            app.blueprint(debug_bp, url_prefix="/api")
     
     # Health check endpoint
-    @app.get("/api/health")
+    @app.get("/api/health", error_format="json")
     async def health_check(request):
         return json({
             "status": "healthy",
@@ -33,8 +81,18 @@ def create_app() -> Sanic:
             "version": "1.0.0"
         })
     
+    # Response cache and request coalescing statistics (per worker process)
+    @app.get("/api/cache/stats", error_format="json")
+    async def cache_stats(request):
+        return json({**get_response_cache().stats(), "single_flight": get_single_flight().stats()})
+    
+    # Request, database and admission control metrics (per worker process) in Prometheus text format
+    @app.get("/api/metrics", error_format="text")
+    async def metrics_endpoint(request):
+        return text(get_metrics().render() + get_admission().render(), content_type=PROMETHEUS_CONTENT_TYPE)
+    
     # Root endpoint
-    @app.get("/api")
+    @app.get("/api", error_format="json")
     async def root(request):
         return json({
             "message": "Welcome to Sanic + Next.js Template API",
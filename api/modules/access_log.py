@@ -0,0 +1,148 @@
+"""
+Access log written off the event loop.
+
+Handlers only time the request and put a LogRecord on a queue; formatting
+and writing happen on a QueueListener thread, which writes everything that
+has queued up since its last write in one call. Successful fast requests can
+be sampled, while errors and slow requests are always logged.
+
+Configured with ACCESS_LOG ("text", "json" for JSON lines, or "off"),
+ACCESS_LOG_SAMPLE (fraction of successful fast requests to log, default 1),
+ACCESS_LOG_SLOW_MS (default 1000) and ACCESS_LOG_BATCH (most lines per
+write, default 256).
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Optional, TextIO
+
+ACCESS_LOG_FORMATS = ('text', 'json', 'off')
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        method, path, status, duration_ns, ip = record.args
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        return f"{stamp} [{method}] {path} - {status} - {duration_ns / 1e6:.2f}ms - {ip}"
+
+class _JSONLinesFormatter(logging.Formatter):
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def format(self, record: logging.LogRecord) -> str:
+        method, path, status, duration_ns, ip = record.args
+        return json.dumps({
+            "time": record.created,
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration_ns / 1e6, 3),
+            "ip": ip,
+            # Successful fast requests stand for 1 / sample_rate requests each
+            "sample_rate": 1.0 if status >= 400 or record.slow else self.sample_rate,
+        }, separators=(",", ":"))
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class _BatchWriter(logging.StreamHandler):
+    """Stream handler that writes once per burst of queued records."""
+
+    def __init__(self, stream: TextIO, queue: SimpleQueue, max_batch: int):
+        super().__init__(stream)
+        self.queue = queue
+        self.max_batch = max_batch
+        self._pending = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+        if len(self._pending) >= self.max_batch or self.queue.empty():
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self.stream.write("\n".join(self._pending) + "\n")
+            self._pending.clear()
+        super().flush()
+
+class AccessLog:
+    """Sampled access log whose records are formatted and written on a background thread."""
+
+    def __init__(self, log_format: str = 'text', sample_rate: float = 1.0, slow_ms: float = 1000,
+                 max_batch: int = 256, stream: Optional[TextIO] = None):
+        if log_format not in ACCESS_LOG_FORMATS:
+            raise ValueError(f"Unknown access log format: {log_format}")
+        self.log_format = log_format
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.slow_ns = int(slow_ms * 1_000_000)
+        self.max_batch = max_batch
+        self.stream = stream
+        self.logged = 0
+        self.skipped = 0
+        self._logger = logging.getLogger("access")
+        self._logger.propagate = False
+        self._writer: Optional[_BatchWriter] = None
+        self._listener: Optional[QueueListener] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.log_format != 'off'
+
+    def start(self) -> None:
+        """Start the writer thread; records logged before this wait in the queue."""
+        if self._listener is not None or not self.enabled:
+            return
+        queue = SimpleQueue()
+        self._writer = _BatchWriter(self.stream or sys.stderr, queue, self.max_batch)
+        self._writer.setFormatter(_JSONLinesFormatter(self.sample_rate) if self.log_format == 'json' else _TextFormatter())
+        self._logger.handlers = [_DeferredQueueHandler(queue)]
+        self._logger.setLevel(logging.INFO)
+        self._listener = QueueListener(queue, self._writer)
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Write out everything queued and stop the writer thread."""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._writer.flush()
+        self._logger.handlers = []
+        self._listener = self._writer = None
+
+    def record(self, method: str, path: str, status: int, duration_ns: int, ip: str) -> None:
+        """Log one finished request, unless it is a successful fast request left out by sampling."""
+        if not self.enabled:
+            return
+        slow = duration_ns >= self.slow_ns
+        if status < 400 and not slow and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.skipped += 1
+            return
+        if self._listener is None:
+            self.start()
+        self.logged += 1
+        # handle() a prebuilt record, skipping the caller lookup logger.info would do
+        self._logger.handle(self._logger.makeRecord(self._logger.name, logging.INFO, __file__, 0, "%s %s %s %s %s",
+                                                    (method, path, status, duration_ns, ip), None, extra={"slow": slow}))
+
+access_log = AccessLog(
+    log_format=os.environ.get('ACCESS_LOG', 'text'),
+    sample_rate=float(os.environ.get('ACCESS_LOG_SAMPLE', '1')),
+    slow_ms=float(os.environ.get('ACCESS_LOG_SLOW_MS', '1000')),
+    max_batch=int(os.environ.get('ACCESS_LOG_BATCH', '256')),
+)
+
+def get_access_log() -> AccessLog:
+    """Get the process-wide access log."""
+    return access_log
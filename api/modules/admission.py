@@ -0,0 +1,188 @@
+"""
+Admission control: shed load before it piles up on the event loop.
+
+Every request passes admit() first, ahead of every other request middleware.
+Excess load is answered with a 503 and Retry-After right there, so the
+handler never parses the body or touches the database for it. Requests are
+refused when:
+
+- the event loop is lagging by ADMISSION_MAX_LAG_MS (default 100) or more, or
+- ADMISSION_MAX_IN_FLIGHT (default 256) admitted requests are still running.
+
+ADMISSION_PRIORITY picks the class kept under pressure: 'writes' (default)
+or 'reads'. Requests of the other class are refused at half of both limits,
+so they go first. With 'none' every request gets the full limits.
+
+Loop lag is sampled by a task that sleeps LAG_SAMPLE_INTERVAL_S and measures
+how late it wakes. Only time the process spent on the CPU counts, so an
+instance that was frozen between requests (as on Vercel) does not wake up
+shedding. Lag only counts once two samples in a row see it, so a one-off
+stall (such as a slow first request) is not taken for overload; it then
+jumps up at once and decays over a few samples.
+
+ADMISSION_CLIENT_RATE (requests per second, default 0 = unlimited) and
+ADMISSION_CLIENT_BURST (default twice the rate) set a token bucket per
+client IP; clients that exceed it get a 429 with Retry-After.
+
+/api/health, /api/metrics and CORS preflights are always admitted. Set
+ADMISSION=off to admit everything.
+"""
+
+import asyncio
+import math
+import os
+import time
+from itertools import count
+from typing import Dict, List, Optional
+from sanic.request import Request
+from sanic.response import HTTPResponse, json
+
+LAG_SAMPLE_INTERVAL_S = 0.02
+# Share of the previous lag kept at each sample when the new one is lower
+LAG_DECAY = 0.7
+# Share of both limits at which the low-priority class is refused
+LOW_PRIORITY_SHARE = 0.5
+# Admitted requests not released after this long are assumed lost (cancelled handlers)
+STALE_REQUEST_S = 60.0
+MAX_CLIENTS = 10_000
+READ_METHODS = frozenset(("GET", "HEAD"))
+EXEMPT_PATHS = frozenset(("/api/health", "/api/metrics"))
+PRIORITIES = ('writes', 'reads', 'none')
+
+class AdmissionController:
+    """Decides per request whether to handle it now or refuse it."""
+
+    def __init__(self, enabled: bool = True, max_in_flight: int = 256, max_lag_ms: float = 100,
+                 priority: str = 'writes', client_rate: float = 0, client_burst: Optional[float] = None,
+                 retry_after_s: int = 1):
+        if priority not in PRIORITIES:
+            raise ValueError(f"ADMISSION_PRIORITY must be one of {', '.join(PRIORITIES)}, not {priority!r}")
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.max_lag = max_lag_ms / 1000
+        self.priority = priority
+        self.client_rate = client_rate
+        self.client_burst = client_burst if client_burst is not None else 2 * client_rate
+        self.retry_after_s = retry_after_s
+        self.lag = 0.0
+        # Admission time of each running request, oldest first
+        self._admitted: Dict[int, float] = {}
+        self._tokens = count()
+        # Client IP -> [tokens, time of the last refill]
+        self._buckets: Dict[str, List[float]] = {}
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {'lag': 0, 'in_flight': 0, 'client_rate': 0}
+
+    def _low_priority(self, request: Request) -> bool:
+        if self.priority == 'none':
+            return False
+        is_read = request.method in READ_METHODS
+        return is_read if self.priority == 'writes' else not is_read
+
+    @property
+    def in_flight(self) -> int:
+        admitted = self._admitted
+        if len(admitted) >= self.max_in_flight * LOW_PRIORITY_SHARE:
+            # Only worth pruning once it could refuse a request
+            stale_before = time.perf_counter() - STALE_REQUEST_S
+            while admitted:
+                oldest = next(iter(admitted))
+                if admitted[oldest] >= stale_before:
+                    break
+                del admitted[oldest]
+        return len(admitted)
+
+    def _take_token(self, client: str, now: float) -> float:
+        """Take a token from the client's bucket; returns 0, or the seconds until one is available."""
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= MAX_CLIENTS:
+                # Forget clients whose buckets have refilled anyway
+                full_after = self.client_burst / self.client_rate
+                self._buckets = {ip: b for ip, b in self._buckets.items() if now - b[1] < full_after}
+            bucket = self._buckets[client] = [self.client_burst, now]
+        else:
+            bucket[0] = min(self.client_burst, bucket[0] + (now - bucket[1]) * self.client_rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.client_rate
+
+    def _refuse(self, reason: str, status: int, message: str, retry_after: float) -> HTTPResponse:
+        self.rejected[reason] += 1
+        return json({"error": message}, status=status, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    def admit(self, request: Request) -> Optional[HTTPResponse]:
+        """None to handle the request, or the 503/429 response refusing it."""
+        if not self.enabled or request.method == "OPTIONS" or request.path in EXEMPT_PATHS:
+            return None
+        share = LOW_PRIORITY_SHARE if self._low_priority(request) else 1.0
+        if self.lag >= self.max_lag * share:
+            return self._refuse('lag', 503, "Server overloaded", self.retry_after_s)
+        if self.in_flight >= self.max_in_flight * share:
+            return self._refuse('in_flight', 503, "Server overloaded", self.retry_after_s)
+
+        now = time.perf_counter()
+        if self.client_rate > 0:
+            wait = self._take_token(request.ip, now)
+            if wait:
+                return self._refuse('client_rate', 429, "Too many requests", wait)
+        token = next(self._tokens)
+        self._admitted[token] = now
+        request.ctx.admission_token = token
+        self.admitted += 1
+        return None
+
+    def release(self, request: Request) -> None:
+        """Mark an admitted request as finished."""
+        token = getattr(request.ctx, 'admission_token', None)
+        if token is not None:
+            self._admitted.pop(token, None)
+
+    async def monitor_loop_lag(self) -> None:
+        """Sample event loop lag until cancelled."""
+        interval = LAG_SAMPLE_INTERVAL_S
+        self.lag = 0.0
+        previous = 0.0
+        while True:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            await asyncio.sleep(interval)
+            late = time.perf_counter() - wall - interval
+            # A frozen or suspended process is late without having used the CPU
+            sample = max(0.0, min(late, time.process_time() - cpu))
+            # Sustained lag shows in consecutive samples; a single stall does not
+            self.lag = max(min(sample, previous), self.lag * LAG_DECAY)
+            previous = sample
+
+    def render(self) -> str:
+        """Admission metrics in the Prometheus text format, to append to metrics.render()."""
+        lines = ["# HELP admission_event_loop_lag_seconds Smoothed event loop lag seen by admission control.",
+                 "# TYPE admission_event_loop_lag_seconds gauge",
+                 f"admission_event_loop_lag_seconds {self.lag:.9g}",
+                 "# HELP admission_in_flight Admitted requests still running.",
+                 "# TYPE admission_in_flight gauge",
+                 f"admission_in_flight {len(self._admitted)}",
+                 "# HELP admission_admitted_total Requests admitted.",
+                 "# TYPE admission_admitted_total counter",
+                 f"admission_admitted_total {self.admitted}",
+                 "# HELP admission_rejected_total Requests refused, by reason.",
+                 "# TYPE admission_rejected_total counter"]
+        for reason, value in self.rejected.items():
+            lines.append(f'admission_rejected_total{{reason="{reason}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+admission = AdmissionController(
+    enabled=os.environ.get('ADMISSION', 'on').lower() not in ('0', 'off', 'false', 'no'),
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', '256')),
+    max_lag_ms=float(os.environ.get('ADMISSION_MAX_LAG_MS', '100')),
+    priority=os.environ.get('ADMISSION_PRIORITY', 'writes').lower(),
+    client_rate=float(os.environ.get('ADMISSION_CLIENT_RATE', '0')),
+    client_burst=float(os.environ['ADMISSION_CLIENT_BURST']) if os.environ.get('ADMISSION_CLIENT_BURST') else None,
+    retry_after_s=int(os.environ.get('ADMISSION_RETRY_AFTER', '1')),
+)
+
+def get_admission() -> AdmissionController:
+    """Get the process-wide admission controller."""
+    return admission
@@ -0,0 +1,61 @@
+"""
+Shared helpers for the bulk create/update/delete endpoints.
+"""
+
+from json import loads
+from sanic.response import json, JSONResponse
+from typing import Any, Dict, List, Optional
+from typing_extensions import TypedDict
+from .validation import LazyTypeAdapter
+
+# Largest batch accepted by a single bulk request
+MAX_BULK_ITEMS = 1000
+
+class TooManyItems(ValueError):
+    """A bulk body holding more than MAX_BULK_ITEMS items."""
+
+    def __init__(self, count: int):
+        super().__init__(f"Too many items: {count}")
+        self.count = count
+
+class BulkDelete(TypedDict):
+    ids: List[int]
+
+bulk_delete = LazyTypeAdapter(BulkDelete)
+
+def validate_items(adapter: LazyTypeAdapter, body: bytes, key: Optional[str] = None) -> Any:
+    """
+    Validate a bulk body whose items are the top-level list, or the list
+    under key, raising TooManyItems before any item is validated when there
+    are more than MAX_BULK_ITEMS of them. Bodies that are not JSON go to the
+    validator as they are, so they fail with its usual error.
+    """
+    try:
+        data = loads(body)
+    except ValueError:
+        return adapter.validate_json(body)
+    items = data.get(key) if key is not None and isinstance(data, dict) else data
+    if isinstance(items, list) and len(items) > MAX_BULK_ITEMS:
+        raise TooManyItems(len(items))
+    return adapter.validate_python(data)
+
+def bulk_item(index: int, status: int, data: Any) -> Dict[str, Any]:
+    """Result entry for an item that succeeded."""
+    return {"index": index, "status": status, "data": data}
+
+def bulk_error(index: int, status: int, error: str) -> Dict[str, Any]:
+    """Result entry for an item that failed."""
+    return {"index": index, "status": status, "error": error}
+
+def too_many_items(count: int) -> JSONResponse:
+    """Response for a batch over MAX_BULK_ITEMS."""
+    return json({"error": f"Too many items: {count} (max {MAX_BULK_ITEMS})"}, status=400)
+
+def bulk_response(results: List[Dict[str, Any]]) -> JSONResponse:
+    """Build the response for a bulk request from its per-item results."""
+    failed = sum(1 for result in results if result["status"] >= 400)
+    return json({
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed
+    })
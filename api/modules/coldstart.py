@@ -0,0 +1,158 @@
+"""
+Cold-start profiling for the serverless entry points.
+
+A cold start of main.py pays for importing Sanic, pydantic and the blueprints
+and then for create_app(), which also seeds the database; index.py only
+imports the standard library and seeds its in-memory tables. profile() starts
+a fresh interpreter with -X importtime, imports the entry point and returns
+the per-module import times together with the init phases the entry point
+recorded with startup_phase().
+
+Budgets for the whole cold start (interpreter included) come from
+COLD_START_BUDGET_MAIN_MS and COLD_START_BUDGET_INDEX_MS.
+
+Run from the api/ directory:
+    python -m modules.coldstart [main|index] [top]
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import subprocess
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ('main', 'index')
+
+COLD_START_BUDGETS_MS = {
+    'main': float(os.environ.get('COLD_START_BUDGET_MAIN_MS', '400')),
+    'index': float(os.environ.get('COLD_START_BUDGET_INDEX_MS', '150')),
+}
+
+# Init phases run by this process so far, in milliseconds
+STARTUP_PHASES: Dict[str, float] = {}
+
+# Imports the entry point and prints its import time and init phases as JSON
+_CHILD = """
+import json, time
+from modules.coldstart import STARTUP_PHASES
+start = time.perf_counter()
+import {entry}
+total_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{"total_ms": total_ms, "phases": STARTUP_PHASES}}))
+"""
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_ms: float
+    cumulative_ms: float
+    depth: int
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """Record how long the block takes as an init phase of the cold start."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_PHASES[name] = STARTUP_PHASES.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+def parse_importtime(output: str, entry: Optional[str] = None) -> List[ImportTiming]:
+    """
+    Parse the 'import time: self | cumulative | name' lines written by -X importtime.
+
+    With entry, only the imports made while importing that top-level module are kept.
+    """
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # Column header
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        timings.append(ImportTiming(stripped, int(fields[0]) / 1000, int(fields[1]) / 1000,
+                                    (len(name) - len(stripped) - 1) // 2))
+        # A module is listed after everything it imported, so a top-level
+        # module closes the group of lines that belong to it
+        if timings[-1].depth == 0:
+            if timings[-1].module == entry:
+                return timings
+            if entry is not None:
+                timings = []
+    return timings
+
+def _run(entry: str, importtime: bool) -> "subprocess.CompletedProcess":
+    # Only the profiler needs subprocess, not the entry points recording phases
+    import subprocess
+    if entry not in ENTRY_POINTS:
+        raise ValueError(f"Unknown entry point: {entry}")
+    args = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', _CHILD.format(entry=entry)]
+    return subprocess.run(args, cwd=API_DIR, capture_output=True, text=True, check=True)
+
+def cold_start_ms(entry: str) -> float:
+    """Wall time of one cold start: a new interpreter importing the entry point."""
+    start = time.perf_counter()
+    _run(entry, importtime=False)
+    return (time.perf_counter() - start) * 1000
+
+def profile(entry: str, top: int = 15) -> Dict[str, Any]:
+    """
+    Import and init time breakdown of one cold start of the entry point.
+
+    Import times come from -X importtime, which adds some overhead of its own;
+    use cold_start_ms() for the wall time.
+    """
+    start = time.perf_counter()
+    result = _run(entry, importtime=True)
+    process_ms = (time.perf_counter() - start) * 1000
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    timings = parse_importtime(result.stderr, entry)
+
+    init_ms = sum(report['phases'].values())
+    packages: Dict[str, float] = {}
+    for timing in timings:
+        package = timing.module.split('.')[0]
+        packages[package] = packages.get(package, 0.0) + timing.self_ms
+    # The entry point's own self time includes the init phases run at import
+    if entry in packages:
+        packages[entry] = max(packages[entry] - init_ms, 0.0)
+
+    return {
+        "entry": entry,
+        "process_ms": round(process_ms, 2),
+        "import_ms": round(report['total_ms'] - init_ms, 2),
+        "init_ms": round(init_ms, 2),
+        "phases": {name: round(ms, 2) for name, ms in report['phases'].items()},
+        "modules": len(timings),
+        "packages": {name: round(ms, 2) for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]},
+        "slowest_modules": [
+            {"module": timing.module, "self_ms": round(timing.self_ms, 2), "cumulative_ms": round(timing.cumulative_ms, 2)}
+            for timing in sorted(timings, key=lambda timing: -timing.self_ms)[:top]
+        ],
+    }
+
+def main() -> None:
+    entry = sys.argv[1] if len(sys.argv) > 1 else 'main'
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    report = profile(entry, top)
+    print(f"Cold start of {entry}.py: {report['process_ms']:.1f}ms with -X importtime "
+          f"(budget {COLD_START_BUDGETS_MS[entry]:.0f}ms without)")
+    print(f"  imports {report['import_ms']:.1f}ms over {report['modules']} modules, init {report['init_ms']:.1f}ms")
+    for name, ms in report['phases'].items():
+        print(f"    init {name:<24} {ms:>8.2f}ms")
+    print("  import self time by package:")
+    for name, ms in report['packages'].items():
+        print(f"    {name:<29} {ms:>8.2f}ms")
+    print("  slowest modules (self / cumulative):")
+    for timing in report['slowest_modules']:
+        print(f"    {timing['module']:<29} {timing['self_ms']:>8.2f}ms {timing['cumulative_ms']:>9.2f}ms")
+
+if __name__ == "__main__":
+    main()
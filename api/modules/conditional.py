@@ -0,0 +1,89 @@
+"""
+Conditional requests: ETags, If-None-Match (304) and If-Match (412).
+
+List responses get an ETag built from the versions of the tables they read,
+so a matching If-None-Match is answered before the handler touches a single
+record. Single records get an ETag built from their id and last write time,
+which stays valid across writes to other records and is what If-Match on
+PUT/DELETE compares against.
+
+A compressed body is a different representation, so compression.py sends it
+with the encoding appended to the tag ("...-gzip"); comparisons drop that
+suffix, since every encoding carries the same content.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+from sanic.request import Request
+from sanic.response import HTTPResponse, JSONResponse
+
+# Clients must revalidate before reusing a response, which is a cheap 304
+CACHE_CONTROL = "no-cache"
+
+# Content codings compression.py may append to an ETag
+ETAG_ENCODINGS = ('gzip', 'deflate', 'zstd')
+
+def table_etag(versions: Iterable[int]) -> str:
+    """Strong ETag for a response built from tables at the given versions."""
+    return '"' + ".".join(f"{version:x}" for version in versions) + '"'
+
+def record_etag(record: Mapping[str, Any]) -> str:
+    """Strong ETag for a single record, from its id and last write time."""
+    stamp = record.get('updated_at') or record.get('created_at') or ""
+    return f'"{record["id"]}-{"".join(char for char in stamp if char.isdigit())}"'
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag for the body compressed with encoding."""
+    return f'{etag[:-1]}-{encoding}"'
+
+def _strip_encoding(tag: str) -> str:
+    if tag.endswith('"') and '-' in tag:
+        base, _, encoding = tag[:-1].rpartition('-')
+        if encoding in ETAG_ENCODINGS:
+            return base + '"'
+    return tag
+
+def _etags(header: str) -> List[str]:
+    return [_strip_encoding(tag.strip()) for tag in header.split(",") if tag.strip()]
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """True if If-None-Match matches etag, i.e. the client's copy is current."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(tag.removeprefix("W/") == etag for tag in _etags(header))
+
+def if_match(request: Request, etag: str) -> bool:
+    """True unless If-Match is present and does not match etag."""
+    header = request.headers.get("if-match")
+    if not header or header.strip() == "*":
+        return True
+    # If-Match uses the strong comparison, so weak tags never match
+    return etag in _etags(header)
+
+def not_modified(etag: str) -> HTTPResponse:
+    return HTTPResponse(status=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+class _PreconditionFailedResponse(JSONResponse):
+    """
+    JSON 412 response that keeps its Content-Length.
+
+    Sanic strips entity headers from 412 responses as if they had no body,
+    which leaves keep-alive clients waiting for the body to end.
+    """
+
+    @property
+    def processed_headers(self) -> Iterator[Tuple[bytes, bytes]]:
+        self.headers.setdefault("content-type", self.content_type)
+        return ((name.encode("ascii"), f"{value}".encode()) for name, value in self.headers.items())
+
+def precondition_failed(etag: str) -> JSONResponse:
+    """412 response for a failed If-Match, carrying the record's current ETag."""
+    return _PreconditionFailedResponse({"error": "Precondition failed: the resource has changed"},
+                                       status=412, headers={"ETag": etag})
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    """Headers to send with a response carrying etag."""
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
@@ -1,133 +1,1291 @@
 """
 Mock database implementation with in-memory storage.
 In production, this would be replaced with a real database like PostgreSQL or MongoDB.
+
+Storage engines implement StorageBackend. The in-memory MockDatabase is the
+default; set DB_ENGINE=sqlite to use the SQLite engine in sqlite_backend.py.
+Handlers reach the engine through AsyncDatabase so that blocking engines run
+on a thread pool instead of the event loop. With DB_SHARED_SOCKET set, the
+engine lives in a separate owner process shared by all workers and handlers
+reach it through shared_db.RemoteDatabase instead.
 """
 
-from typing import List, Dict, Optional, Any
+import asyncio
+import math
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, List, Dict, Iterable, Iterator, Optional, Set, Tuple, Union, Any
 from datetime import datetime
+from .storage import FrozenRecord, TABLE_STORAGE
+from .metrics import metrics, row_count
+from .profiler import record_db_time
+from .query import RANGE_OPERATORS, Condition, QueryError, describe_plan, parse_order_by, parse_where, range_bounds, sort_records
+from .search import DEFAULT_SEARCH_LIMIT, TextIndex
+
+class DuplicateKeyError(Exception):
+    """Raised when a write would violate a unique index."""
+    
+    def __init__(self, table: str, field: str, value: Any):
+        super().__init__(f"Duplicate value for {table}.{field}: {value!r}")
+        self.table = table
+        self.field = field
+        self.value = value
+    
+    def __reduce__(self) -> Any:
+        return (DuplicateKeyError, (self.table, self.field, self.value))
+
+class TextIndexBuilding(Exception):
+    """Raised when a search needs a text index that is still being built."""
+    
+    def __init__(self, table: str):
+        super().__init__(f"The search index on {table} is still being built")
+        self.table = table
+    
+    def __reduce__(self) -> Any:
+        return (TextIndexBuilding, (self.table,))
+
+class SecondaryIndex:
+    """Hash index from a field value to the ids of the records holding it."""
+    
+    kind = 'hash'
+    
+    def __init__(self, field: str, unique: bool = False):
+        self.field = field
+        self.unique = unique
+        # value -> ids, kept as a dict so it behaves like an ordered set
+        self._entries: Dict[Any, Dict[int, None]] = {}
+    
+    def lookup(self, value: Any) -> List[int]:
+        """Get the ids of all records with the given value, in id order."""
+        ids = self._entries.get(value)
+        if not ids:
+            return []
+        return sorted(ids)
+    
+    def estimate(self, value: Any) -> int:
+        """Get the number of records with the given value."""
+        return len(self._entries.get(value, ()))
+    
+    def conflicts(self, value: Any, record_id: int) -> bool:
+        """Check whether storing value on record_id would break uniqueness."""
+        if not self.unique or value is None:
+            return False
+        ids = self._entries.get(value)
+        return bool(ids) and record_id not in ids
+    
+    def add(self, value: Any, record_id: int) -> None:
+        """Add a record id under the given value."""
+        ids = self._entries.get(value)
+        if ids is None:
+            self._entries[value] = {record_id: None}
+        else:
+            ids[record_id] = None
+    
+    def remove(self, value: Any, record_id: int) -> None:
+        """Remove a record id from under the given value."""
+        ids = self._entries.get(value)
+        if ids is not None:
+            ids.pop(record_id, None)
+            if not ids:
+                del self._entries[value]
+    
+    def clear(self) -> None:
+        """Remove all entries, keeping the index definition."""
+        self._entries = {}
+
+class BitmapIndex:
+    """
+    Index for low-cardinality fields (e.g. booleans): one byte per record id
+    for each distinct value, set when the record holds that value.
+    
+    Matching ids come out in id order straight from the bitmap, so a query
+    can resume after a given id and stop as soon as it has enough rows.
+    """
+    
+    kind = 'bitmap'
+    unique = False
+    
+    def __init__(self, field: str):
+        self.field = field
+        self._bitmaps: Dict[Any, bytearray] = {}
+        self._counts: Dict[Any, int] = {}
+    
+    def iter_ids(self, value: Any, after_id: int = 0) -> Iterator[int]:
+        """Yield the ids of records with the given value above after_id, in id order."""
+        bitmap = self._bitmaps.get(value)
+        if bitmap is None:
+            return
+        find = bitmap.find
+        record_id = find(1, max(after_id, 0) + 1)
+        while record_id >= 0:
+            yield record_id
+            record_id = find(1, record_id + 1)
+    
+    def lookup(self, value: Any) -> List[int]:
+        """Get the ids of all records with the given value, in id order."""
+        return list(self.iter_ids(value))
+    
+    def estimate(self, value: Any) -> int:
+        """Get the number of records with the given value."""
+        return self._counts.get(value, 0)
+    
+    def conflicts(self, value: Any, record_id: int) -> bool:
+        return False
+    
+    def add(self, value: Any, record_id: int) -> None:
+        """Mark a record id as holding the given value."""
+        bitmap = self._bitmaps.get(value)
+        if bitmap is None:
+            bitmap = self._bitmaps[value] = bytearray()
+        if len(bitmap) <= record_id:
+            bitmap.extend(bytes(record_id + 1 - len(bitmap)))
+        if not bitmap[record_id]:
+            bitmap[record_id] = 1
+            self._counts[value] = self._counts.get(value, 0) + 1
+    
+    def remove(self, value: Any, record_id: int) -> None:
+        """Clear a record id from the given value."""
+        bitmap = self._bitmaps.get(value)
+        if bitmap is not None and record_id < len(bitmap) and bitmap[record_id]:
+            bitmap[record_id] = 0
+            self._counts[value] -= 1
+    
+    def clear(self) -> None:
+        """Remove all entries, keeping the index definition."""
+        self._bitmaps = {}
+        self._counts = {}
+
+# Entries per bucket of a sorted index when it is built; a bucket is split
+# in two once writes have doubled it, so a write moves at most twice this
+# many entries however large the index grows
+SORTED_BUCKET_SIZE = 1000
 
-class MockDatabase:
+class SortedIndex:
+    """
+    Ordered index for range and prefix lookups (e.g. timestamps, titles).
+    
+    Keeps values and ids sorted by (value, id) in a list of small buckets,
+    each a pair of parallel lists, next to the last (value, id) of every
+    bucket. A lookup bisects the bucket ends and then one bucket, and a
+    write only shifts the entries of the bucket it lands in. Only str, int
+    and float values are indexed, and a field should hold one of these
+    types throughout; records without a value are left out, as range
+    conditions never match them anyway.
+    """
+    
+    kind = 'sorted'
+    unique = False
+    
+    def __init__(self, field: str):
+        self.field = field
+        self._keys: List[List[Any]] = []
+        self._ids: List[List[int]] = []
+        # (value, id) of the last entry of each bucket
+        self._ends: List[Tuple[Any, int]] = []
+    
+    @staticmethod
+    def _indexable(value: Any) -> bool:
+        return type(value) in (str, int, float)
+    
+    def build(self, entries: Iterable[Tuple[Any, int]]) -> None:
+        """Replace the contents with (value, id) pairs, sorting them once."""
+        pairs = sorted(entry for entry in entries if self._indexable(entry[0]))
+        self.clear()
+        for start in range(0, len(pairs), SORTED_BUCKET_SIZE):
+            bucket = pairs[start:start + SORTED_BUCKET_SIZE]
+            self._keys.append([value for value, _ in bucket])
+            self._ids.append([record_id for _, record_id in bucket])
+            self._ends.append(bucket[-1])
+    
+    def _locate(self, value: Any, after: bool) -> Tuple[int, int]:
+        """(bucket, offset) of the first entry whose value is >= value, or > value when after."""
+        if after:
+            bucket = bisect_right(self._ends, (value, math.inf))
+        else:
+            bucket = bisect_left(self._ends, (value, -math.inf))
+        if bucket == len(self._ends):
+            return bucket, 0
+        return bucket, (bisect_right if after else bisect_left)(self._keys[bucket], value)
+    
+    def _span(self, low: Any, low_inclusive: bool, high: Any,
+              high_inclusive: bool) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        start = (0, 0) if low is None else self._locate(low, not low_inclusive)
+        end = (len(self._ends), 0) if high is None else self._locate(high, high_inclusive)
+        return start, max(start, end)
+    
+    def range_ids(self, low: Any, low_inclusive: bool, high: Any, high_inclusive: bool) -> List[int]:
+        """Get the ids of records whose value is inside the interval (None = unbounded), in id order."""
+        (first, offset), (last, end) = self._span(low, low_inclusive, high, high_inclusive)
+        if first == last:
+            return sorted(self._ids[first][offset:end]) if first < len(self._ids) else []
+        ids = self._ids[first][offset:]
+        for bucket in self._ids[first + 1:last]:
+            ids.extend(bucket)
+        if last < len(self._ids):
+            ids.extend(self._ids[last][:end])
+        ids.sort()
+        return ids
+    
+    def estimate_range(self, low: Any, low_inclusive: bool, high: Any, high_inclusive: bool) -> int:
+        """Get the number of records whose value is inside the interval."""
+        (first, offset), (last, end) = self._span(low, low_inclusive, high, high_inclusive)
+        if first == last:
+            return end - offset
+        return sum(map(len, self._ids[first:last])) - offset + end
+    
+    def lookup(self, value: Any) -> List[int]:
+        """Get the ids of all records with the given value, in id order."""
+        if not self._indexable(value):
+            return []
+        return self.range_ids(value, True, value, True)
+    
+    def estimate(self, value: Any) -> int:
+        """Get the number of records with the given value."""
+        if not self._indexable(value):
+            return 0
+        return self.estimate_range(value, True, value, True)
+    
+    def conflicts(self, value: Any, record_id: int) -> bool:
+        return False
+    
+    def _position(self, value: Any, record_id: int) -> Tuple[int, int]:
+        # The first bucket ending at or after (value, id) is where it belongs;
+        # within a run of equal values ids are kept ascending
+        bucket = min(bisect_left(self._ends, (value, record_id)), len(self._ends) - 1)
+        keys = self._keys[bucket]
+        start = bisect_left(keys, value)
+        end = bisect_right(keys, value, start)
+        return bucket, bisect_left(self._ids[bucket], record_id, start, end)
+    
+    def add(self, value: Any, record_id: int) -> None:
+        """Add a record id under the given value."""
+        if not self._indexable(value):
+            return
+        if not self._ends:
+            self._keys.append([value])
+            self._ids.append([record_id])
+            self._ends.append((value, record_id))
+            return
+        bucket, pos = self._position(value, record_id)
+        keys = self._keys[bucket]
+        ids = self._ids[bucket]
+        keys.insert(pos, value)
+        ids.insert(pos, record_id)
+        if pos == len(keys) - 1:
+            self._ends[bucket] = (value, record_id)
+        if len(keys) > 2 * SORTED_BUCKET_SIZE:
+            half = len(keys) // 2
+            self._keys[bucket:bucket + 1] = [keys[:half], keys[half:]]
+            self._ids[bucket:bucket + 1] = [ids[:half], ids[half:]]
+            self._ends.insert(bucket, (keys[half - 1], ids[half - 1]))
+    
+    def remove(self, value: Any, record_id: int) -> None:
+        """Remove a record id from under the given value."""
+        if not self._indexable(value) or not self._ends:
+            return
+        bucket, pos = self._position(value, record_id)
+        keys = self._keys[bucket]
+        ids = self._ids[bucket]
+        if pos < len(ids) and ids[pos] == record_id and keys[pos] == value:
+            del keys[pos]
+            del ids[pos]
+            if not keys:
+                del self._keys[bucket]
+                del self._ids[bucket]
+                del self._ends[bucket]
+            elif pos == len(keys):
+                self._ends[bucket] = (keys[-1], ids[-1])
+    
+    def clear(self) -> None:
+        """Remove all entries, keeping the index definition."""
+        self._keys = []
+        self._ids = []
+        self._ends = []
+
+Index = Union[SecondaryIndex, BitmapIndex, SortedIndex]
+
+def _ids_after(lookup: Callable[[Any], List[int]], value: Any, after_id: int) -> List[int]:
+    """Call an index lookup and drop ids up to after_id (lookups return ids in order)."""
+    ids = lookup(value)
+    return ids[bisect_right(ids, after_id):] if after_id else ids
+
+def _activity(record: FrozenRecord) -> Optional[str]:
+    """When a record was last written, from its own timestamps."""
+    return record.get('updated_at') or record.get('created_at')
+
+class TableStats:
+    """
+    Counters kept per value of a grouping field (e.g. todos per user_id) and
+    for the whole table: how many records, how many with a flag field set
+    (e.g. completed) and when one was last inserted, updated or deleted.
+    
+    Every write adjusts them by its delta, so reading them costs the same
+    at any table size.
+    """
+    
+    def __init__(self, group_field: str, flag_field: str):
+        self.group_field = group_field
+        self.flag_field = flag_field
+        # group value -> [count, flagged, last activity]
+        self._groups: Dict[Any, List[Any]] = {}
+        self._overall: List[Any] = [0, 0, None]
+    
+    @staticmethod
+    def _bump(entry: List[Any], count: int, flagged: int, timestamp: Optional[str]) -> None:
+        entry[0] += count
+        entry[1] += flagged
+        if timestamp is not None and (entry[2] is None or timestamp > entry[2]):
+            entry[2] = timestamp
+    
+    def _group(self, value: Any) -> List[Any]:
+        entry = self._groups.get(value)
+        if entry is None:
+            entry = self._groups[value] = [0, 0, None]
+        return entry
+    
+    def add(self, record: FrozenRecord, timestamp: Optional[str]) -> None:
+        """Count a new record."""
+        flagged = 1 if record.get(self.flag_field) else 0
+        self._bump(self._group(record.get(self.group_field)), 1, flagged, timestamp)
+        self._bump(self._overall, 1, flagged, timestamp)
+    
+    def remove(self, record: FrozenRecord, timestamp: Optional[str]) -> None:
+        """Uncount a deleted record."""
+        flagged = 1 if record.get(self.flag_field) else 0
+        self._bump(self._group(record.get(self.group_field)), -1, -flagged, timestamp)
+        self._bump(self._overall, -1, -flagged, timestamp)
+    
+    def update(self, old: FrozenRecord, new: FrozenRecord, timestamp: Optional[str]) -> None:
+        """Move a changed record between groups and flag states as needed."""
+        old_flagged = 1 if old.get(self.flag_field) else 0
+        new_flagged = 1 if new.get(self.flag_field) else 0
+        old_group, new_group = old.get(self.group_field), new.get(self.group_field)
+        if old_group == new_group:
+            self._bump(self._group(new_group), 0, new_flagged - old_flagged, timestamp)
+        else:
+            self._bump(self._group(old_group), -1, -old_flagged, timestamp)
+            self._bump(self._group(new_group), 1, new_flagged, timestamp)
+        self._bump(self._overall, 0, new_flagged - old_flagged, timestamp)
+    
+    def set(self, group: Any, count: int, flagged: int, last_activity: Optional[str], overall: bool = False) -> None:
+        """Set the counters of one group (or of the whole table), e.g. as read back from elsewhere."""
+        entry = self._overall if overall else self._group(group)
+        entry[:] = [count, flagged, last_activity]
+    
+    def clear(self) -> None:
+        """Reset every counter, keeping the definition."""
+        self._groups = {}
+        self._overall = [0, 0, None]
+    
+    def _describe(self, entry: List[Any]) -> Dict[str, Any]:
+        return {"count": entry[0], self.flag_field: entry[1], "last_activity": entry[2]}
+    
+    def get(self, group: Any = None, overall: bool = False) -> Dict[str, Any]:
+        """Counters of one group, or of the whole table."""
+        if overall:
+            return self._describe(self._overall)
+        return self._describe(self._groups.get(group, [0, 0, None]))
+    
+    def verify(self, records: Iterable[FrozenRecord]) -> List[str]:
+        """
+        Recount records in full and describe every counter that disagrees.
+        
+        Counts must match exactly. Deleted records leave no timestamp
+        behind, so a last activity only has to be no earlier than the
+        latest write to the records still there.
+        """
+        scan = TableStats(self.group_field, self.flag_field)
+        for record in records:
+            scan.add(record, _activity(record))
+        problems = []
+        expected = [("all", scan._overall, self._overall)]
+        for group in scan._groups.keys() | self._groups.keys():
+            expected.append((f"{self.group_field}={group!r}", scan._groups.get(group, [0, 0, None]),
+                             self._groups.get(group, [0, 0, None])))
+        for name, want, have in expected:
+            if want[0] != have[0] or want[1] != have[1]:
+                problems.append(f"{name}: counted {have[0]} records, {have[1]} {self.flag_field}; "
+                                f"scan found {want[0]}, {want[1]}")
+            elif want[2] is not None and (have[2] is None or have[2] < want[2]):
+                problems.append(f"{name}: last activity {have[2]} is before the latest write {want[2]}")
+        return problems
+
+# Text indexes over more records than this are built on a thread (see MockDatabase.create_text_index)
+TEXT_INDEX_THREAD_MIN_RECORDS = 1000
+
+class _TextIndexBuild:
+    """A TextIndex being built on a thread from a table's records as they were at one instant."""
+    
+    def __init__(self, fields: Dict[str, int], records: List[FrozenRecord]):
+        self.fields = fields
+        self.index = TextIndex(fields)
+        # Records written since the instant, with their state before the first such write
+        self.touched: Dict[int, Optional[FrozenRecord]] = {}
+        self._thread = threading.Thread(target=self._build, args=(records,), name="text-index", daemon=True)
+        self._thread.start()
+    
+    def _build(self, records: List[FrozenRecord]) -> None:
+        index = self.index
+        for record in records:
+            index.add(record['id'], record)
+    
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+    
+    def wait(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+class StorageBackend(ABC):
+    """
+    Interface shared by all storage engines.
+    
+    Records are dicts with an integer 'id', a 'created_at' timestamp and an
+    'updated_at' timestamp once updated. find_* return mutable copies, view_*
+    return read-only FrozenRecord objects.
+    """
+    
+    # True if calls do I/O and must be kept off the event loop
+    blocking = False
+    # True if data survives a restart, so init_db must not reseed it
+    persistent = False
+    
+    @abstractmethod
+    def create_index(self, table: str, field: str, unique: bool = False, kind: str = 'hash') -> None: ...
+    
+    @abstractmethod
+    def create_text_index(self, table: str, fields: Dict[str, int]) -> None: ...
+    
+    @abstractmethod
+    def create_stats(self, table: str, group_field: str, flag_field: str) -> None: ...
+    
+    @abstractmethod
+    def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]: ...
+    
+    @abstractmethod
+    def insert_many(self, table: str, rows: Iterable[Dict[str, Any]]) -> List[Union[Dict[str, Any], DuplicateKeyError]]: ...
+    
+    @abstractmethod
+    def find_all(self, table: str) -> List[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    def find_by_id(self, table: str, record_id: int) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    def find_by_field(self, table: str, field: str, value: Any) -> List[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    def view_all(self, table: str) -> List[FrozenRecord]: ...
+    
+    @abstractmethod
+    def view_by_id(self, table: str, record_id: int) -> Optional[FrozenRecord]: ...
+    
+    @abstractmethod
+    def view_by_field(self, table: str, field: str, value: Any) -> List[FrozenRecord]: ...
+    
+    @abstractmethod
+    def range_scan(self, table: str, after_id: int = 0, limit: int = 100) -> List[FrozenRecord]: ...
+    
+    @abstractmethod
+    def iter_batches(self, table: str, batch_size: int = 500,
+                     field: Optional[str] = None, value: Any = None) -> Iterator[List[FrozenRecord]]: ...
+    
+    @abstractmethod
+    def query(self, table: str, where: Optional[Dict[str, Any]] = None, order_by: str = 'id',
+              limit: Optional[int] = None, after_id: int = 0) -> List[FrozenRecord]: ...
+    
+    @abstractmethod
+    def explain(self, table: str, where: Optional[Dict[str, Any]] = None, order_by: str = 'id',
+                limit: Optional[int] = None, after_id: int = 0) -> Dict[str, Any]: ...
+    
+    @abstractmethod
+    def search(self, table: str, text: str, where: Optional[Dict[str, Any]] = None,
+               limit: int = DEFAULT_SEARCH_LIMIT) -> List[FrozenRecord]: ...
+    
+    @abstractmethod
+    def stats(self, table: str, group: Any = None, overall: bool = False) -> Dict[str, Any]: ...
+    
+    @abstractmethod
+    def verify_stats(self, table: str) -> List[str]: ...
+    
+    @abstractmethod
+    def existing_ids(self, table: str, record_ids: Iterable[int]) -> Set[int]: ...
+    
+    @abstractmethod
+    def count(self, table: str) -> int: ...
+    
+    @abstractmethod
+    def version(self, table: str) -> int: ...
+    
+    @abstractmethod
+    def update_by_id(self, table: str, record_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
+    
+    @abstractmethod
+    def update_many(self, table: str, updates: Iterable[Tuple[int, Dict[str, Any]]]) -> List[Union[Dict[str, Any], DuplicateKeyError, None]]: ...
+    
+    @abstractmethod
+    def delete_by_id(self, table: str, record_id: int) -> bool: ...
+    
+    @abstractmethod
+    def delete_many(self, table: str, record_ids: Iterable[int]) -> List[bool]: ...
+    
+    @abstractmethod
+    def clear_table(self, table: str) -> None: ...
+
+# listener(op, table, old_record, new_record)
+WriteListener = Callable[[str, str, Optional[FrozenRecord], Optional[FrozenRecord]], None]
+
+class MockDatabase(StorageBackend):
     """Simple in-memory database for demonstration purposes."""
     
-    def __init__(self):
-        self._data: Dict[str, List[Dict[str, Any]]] = {
-            'users': [],
-            'todos': []
+    def __init__(self, storage: str = 'dict'):
+        # Each table is an id -> record mapping. Python dicts keep insertion
+        # order and ids are handed out monotonically, so iterating a table
+        # still yields records in id order. 'compact' storage keeps the same
+        # mapping interface over columnar arrays (see storage.CompactTable).
+        if storage not in TABLE_STORAGE:
+            raise ValueError(f"Unknown storage layout: {storage}")
+        self._table_factory = TABLE_STORAGE[storage]
+        self._data: Dict[str, Dict[int, FrozenRecord]] = {
+            'users': self._table_factory(),
+            'todos': self._table_factory()
         }
         self._counters: Dict[str, int] = {
             'users': 0,
             'todos': 0
         }
+        # Bumped on every write, so cached reads can tell whether a table changed.
+        # Versions start at a random offset so they never repeat across restarts
+        # and can be used in ETags.
+        self._versions: Dict[str, int] = {
+            'users': secrets.randbits(48),
+            'todos': secrets.randbits(48)
+        }
+        self._indexes: Dict[str, Dict[str, Index]] = {
+            'users': {},
+            'todos': {}
+        }
+        # At most one full-text index per table (see search.py)
+        self._text_indexes: Dict[str, TextIndex] = {}
+        # Text indexes still being built on a thread, in place of their entry above
+        self._text_builds: Dict[str, _TextIndexBuild] = {}
+        # At most one set of counters per table (see TableStats)
+        self._stats: Dict[str, TableStats] = {}
+        self._listeners: List[WriteListener] = []
+        # Set when a persistence layer is attached (see persistence.Persistence)
+        self.persistence = None
+    
+    def add_listener(self, listener: WriteListener) -> None:
+        """
+        Register a callback run after every committed write.
+        
+        It is called as listener(op, table, old, new) where op is 'insert',
+        'update', 'delete' or 'clear' and old/new are the record before and
+        after the write (None where not applicable).
+        """
+        self._listeners.append(listener)
+    
+    def _notify(self, op: str, table: str, old: Optional[FrozenRecord], new: Optional[FrozenRecord]) -> None:
+        self._versions[table] += 1
+        for listener in self._listeners:
+            listener(op, table, old, new)
     
     def _get_next_id(self, table: str) -> int:
         """Get the next ID for a table."""
         self._counters[table] += 1
         return self._counters[table]
     
-    def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Insert a new record into the specified table."""
-        record = {
+    def _check_unique(self, table: str, record_id: int, values: Dict[str, Any]) -> None:
+        """Raise DuplicateKeyError if any value would violate a unique index."""
+        for field, index in self._indexes[table].items():
+            if field in values and index.conflicts(values[field], record_id):
+                raise DuplicateKeyError(table, field, values[field])
+    
+    def create_index(self, table: str, field: str, unique: bool = False, kind: str = 'hash') -> None:
+        """
+        Create (or rebuild) a secondary index on a table field.
+        
+        kind is 'hash' (equality, may be unique), 'bitmap' (equality on
+        low-cardinality fields) or 'sorted' (equality, ranges and prefixes).
+        """
+        if kind == 'hash':
+            index: Index = SecondaryIndex(field, unique)
+        elif unique:
+            raise ValueError("Only hash indexes can be unique")
+        elif kind == 'bitmap':
+            index = BitmapIndex(field)
+        elif kind == 'sorted':
+            index = SortedIndex(field)
+        else:
+            raise ValueError(f"Unknown index kind: {kind}")
+        if isinstance(index, SortedIndex):
+            # Adding one record at a time would cost a bisect and a shift each
+            index.build((record.get(field), record_id) for record_id, record in self._data[table].items())
+        else:
+            for record_id, record in self._data[table].items():
+                value = record.get(field)
+                if index.conflicts(value, record_id):
+                    raise DuplicateKeyError(table, field, value)
+                index.add(value, record_id)
+        self._indexes[table][field] = index
+    
+    def create_text_index(self, table: str, fields: Dict[str, int]) -> None:
+        """
+        Create (or rebuild) the table's full-text index over the given fields.
+        
+        fields maps each field to the weight of a word found in it, so a
+        match in a heavier field ranks higher. Over more than
+        TEXT_INDEX_THREAD_MIN_RECORDS records, e.g. a table restored from
+        disk, the index is built on a thread from the records as they are
+        now (they are immutable), so neither startup nor the event loop
+        waits for it. Writes meanwhile are noted and replayed onto it once
+        it is done; searches until then raise TextIndexBuilding.
+        """
+        self._text_indexes.pop(table, None)
+        self._text_builds.pop(table, None)
+        fields = dict(fields)
+        if len(self._data[table]) > TEXT_INDEX_THREAD_MIN_RECORDS:
+            self._text_builds[table] = _TextIndexBuild(fields, list(self._data[table].values()))
+        else:
+            index = TextIndex(fields)
+            for record_id, record in self._data[table].items():
+                index.add(record_id, record)
+            self._text_indexes[table] = index
+    
+    def _finish_text_build(self, table: str) -> None:
+        """Put a finished text index in place, replaying the writes made while it was built."""
+        build = self._text_builds.get(table)
+        if build is None or not build.done():
+            return
+        del self._text_builds[table]
+        index = build.index
+        records = self._data[table]
+        for record_id, before in build.touched.items():
+            after = records.get(record_id)
+            if before is not None and after is not None:
+                index.update(record_id, before, after)
+            elif before is not None:
+                index.remove(record_id, before)
+            elif after is not None:
+                index.add(record_id, after)
+        self._text_indexes[table] = index
+    
+    def _text_write(self, table: str, record_id: int, old_record: Optional[FrozenRecord]) -> Optional[TextIndex]:
+        """The text index a write to record_id must keep current; None if there is none yet."""
+        self._finish_text_build(table)
+        build = self._text_builds.get(table)
+        if build is not None:
+            build.touched.setdefault(record_id, old_record)
+            return None
+        return self._text_indexes.get(table)
+    
+    def wait_for_text_index(self, table: str, timeout: Optional[float] = None) -> bool:
+        """Block until a text index being built for table is in place; False if timeout ran out first."""
+        build = self._text_builds.get(table)
+        if build is not None:
+            build.wait(timeout)
+            self._finish_text_build(table)
+        return table not in self._text_builds
+    
+    def create_stats(self, table: str, group_field: str, flag_field: str) -> None:
+        """Start (or rebuild) the table's counters, grouped by group_field and counting flag_field."""
+        stats = TableStats(group_field, flag_field)
+        for record in self._data[table].values():
+            stats.add(record, _activity(record))
+        self._stats[table] = stats
+    
+    def _insert(self, table: str, data: Dict[str, Any], timestamp: str) -> FrozenRecord:
+        """Insert a record stamped with the given creation time."""
+        # Check unique indexes before taking an id so a rejected insert leaves no trace
+        self._check_unique(table, 0, data)
+        record = FrozenRecord({
             'id': self._get_next_id(table),
             **data,
-            'created_at': datetime.utcnow().isoformat()
-        }
-        self._data[table].append(record)
-        return record.copy()
+            'created_at': timestamp
+        })
+        self._data[table][record['id']] = record
+        for field, index in self._indexes[table].items():
+            index.add(record.get(field), record['id'])
+        text_index = self._text_write(table, record['id'], None)
+        if text_index is not None:
+            text_index.add(record['id'], record)
+        if table in self._stats:
+            self._stats[table].add(record, timestamp)
+        self._notify('insert', table, None, record)
+        return record
+    
+    def _update(self, table: str, record_id: int, updates: Dict[str, Any], timestamp: str) -> Optional[FrozenRecord]:
+        """Update a record, stamping it with the given update time."""
+        record = self._data[table].get(record_id)
+        if record is None:
+            return None
+        updates = {key: value for key, value in updates.items() if key != 'id'}  # Don't allow ID updates
+        self._check_unique(table, record_id, updates)
+        
+        # Move index entries for any indexed field that changes
+        for field, index in self._indexes[table].items():
+            if field in updates and updates[field] != record.get(field):
+                index.remove(record.get(field), record_id)
+                index.add(updates[field], record_id)
+        
+        # Update the record (copy-on-write so outstanding views stay consistent)
+        old_record = record
+        record = FrozenRecord({**record, **updates, 'updated_at': timestamp})
+        self._data[table][record_id] = record
+        text_index = self._text_write(table, record_id, old_record)
+        if text_index is not None and any(field in updates for field in text_index.fields):
+            text_index.update(record_id, old_record, record)
+        if table in self._stats:
+            self._stats[table].update(old_record, record, timestamp)
+        self._notify('update', table, old_record, record)
+        return record
+    
+    def _delete(self, table: str, record_id: int) -> bool:
+        """Delete a record and its index entries."""
+        record = self._data[table].pop(record_id, None)
+        if record is None:
+            return False
+        for field, index in self._indexes[table].items():
+            index.remove(record.get(field), record_id)
+        text_index = self._text_write(table, record_id, record)
+        if text_index is not None:
+            text_index.remove(record_id, record)
+        if table in self._stats:
+            self._stats[table].remove(record, datetime.utcnow().isoformat())
+        self._notify('delete', table, record, None)
+        return True
+    
+    def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new record into the specified table."""
+        return self._insert(table, data, datetime.utcnow().isoformat()).copy()
+    
+    def insert_many(self, table: str, rows: Iterable[Dict[str, Any]]) -> List[Union[Dict[str, Any], DuplicateKeyError]]:
+        """
+        Insert several records in one call.
+        
+        Each row is inserted on its own: a row rejected by a unique index does
+        not stop the rest. The result has one entry per row, either the new
+        record or the DuplicateKeyError that rejected it.
+        """
+        timestamp = datetime.utcnow().isoformat()
+        results: List[Union[Dict[str, Any], DuplicateKeyError]] = []
+        for data in rows:
+            try:
+                results.append(self._insert(table, data, timestamp).copy())
+            except DuplicateKeyError as e:
+                results.append(e)
+        return results
     
     def find_all(self, table: str) -> List[Dict[str, Any]]:
         """Get all records from the specified table."""
-        return [record.copy() for record in self._data[table]]
+        return [record.copy() for record in self._data[table].values()]
     
     def find_by_id(self, table: str, record_id: int) -> Optional[Dict[str, Any]]:
         """Find a record by ID."""
-        for record in self._data[table]:
-            if record['id'] == record_id:
-                return record.copy()
-        return None
+        record = self._data[table].get(record_id)
+        if record is None:
+            return None
+        return record.copy()
     
     def find_by_field(self, table: str, field: str, value: Any) -> List[Dict[str, Any]]:
         """Find records by a specific field value."""
+        index = self._indexes[table].get(field)
+        if index is not None:
+            records = self._data[table]
+            return [records[record_id].copy() for record_id in index.lookup(value)]
+        
         results = []
-        for record in self._data[table]:
+        for record in self._data[table].values():
             if record.get(field) == value:
                 results.append(record.copy())
         return results
     
+    def view_all(self, table: str) -> List[FrozenRecord]:
+        """Get read-only views of all records, without copying them."""
+        return list(self._data[table].values())
+    
+    def view_by_id(self, table: str, record_id: int) -> Optional[FrozenRecord]:
+        """Get a read-only view of a record by ID, without copying it."""
+        return self._data[table].get(record_id)
+    
+    def view_by_field(self, table: str, field: str, value: Any) -> List[FrozenRecord]:
+        """Get read-only views of records matching a field value, without copying them."""
+        index = self._indexes[table].get(field)
+        if index is not None:
+            records = self._data[table]
+            return [records[record_id] for record_id in index.lookup(value)]
+        return [record for record in self._data[table].values() if record.get(field) == value]
+    
+    def range_scan(self, table: str, after_id: int = 0, limit: int = 100) -> List[FrozenRecord]:
+        """
+        Get read-only views of up to limit records with an id above after_id, in id order.
+        
+        Ids are handed out sequentially, so this probes the id index from
+        after_id upwards instead of walking the table; the cost is the page
+        size plus any ids deleted inside the range.
+        """
+        records = self._data[table]
+        last_id = self._counters[table]
+        page = []
+        record_id = max(after_id, 0) + 1
+        while len(page) < limit and record_id <= last_id:
+            record = records.get(record_id)
+            if record is not None:
+                page.append(record)
+            record_id += 1
+        return page
+    
+    def iter_batches(self, table: str, batch_size: int = 500,
+                     field: Optional[str] = None, value: Any = None) -> Iterator[List[FrozenRecord]]:
+        """
+        Yield read-only views of a table in id-ordered batches.
+        
+        When field is given only records with that value are yielded, using a
+        secondary index if one exists. Batches continue from the last id seen,
+        so memory stays bounded by batch_size and writes made between batches
+        do not invalidate the iteration.
+        """
+        index = self._indexes[table].get(field) if field is not None else None
+        if index is not None:
+            ids = index.lookup(value)
+            for start in range(0, len(ids), batch_size):
+                records = self._data[table]
+                batch = [records.get(record_id) for record_id in ids[start:start + batch_size]]
+                batch = [record for record in batch if record is not None and record.get(field) == value]
+                if batch:
+                    yield batch
+            return
+        
+        after_id = 0
+        while True:
+            page = self.range_scan(table, after_id, batch_size)
+            if not page:
+                return
+            after_id = page[-1]['id']
+            if field is not None:
+                page = [record for record in page if record.get(field) == value]
+            if page:
+                yield page
+    
+    def _plan(self, table: str, conditions: List[Condition],
+              after_id: int) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Callable[[], Iterable[int]], List[Condition]]:
+        """
+        Pick the access path expected to touch the fewest records.
+        
+        Every index that can answer a condition gives an exact count of the
+        ids it would produce; the smallest wins, and the conditions it does
+        not cover are checked on each record. Returns (access, candidates,
+        ids, residual) where ids() yields candidate ids in id order.
+        """
+        records = self._data[table]
+        last_id = self._counters[table]
+        after_id = max(after_id, 0)
+        scan_ids = lambda: range(after_id + 1, last_id + 1)
+        access = {
+            "type": "id_range" if after_id else "scan",
+            "estimated_rows": min(len(records), max(last_id - after_id, 0)),
+        }
+        best: Tuple[Dict[str, Any], Callable[[], Iterable[int]], List[Condition]] = (access, scan_ids, [])
+        candidates = [access]
+        
+        by_field: Dict[str, List[Condition]] = {}
+        for condition in conditions:
+            by_field.setdefault(condition.field, []).append(condition)
+        
+        for field, field_conditions in by_field.items():
+            index = self._indexes[table].get(field)
+            if index is None:
+                continue
+            for condition in field_conditions:
+                if condition.op != 'eq':
+                    continue
+                if index.kind == 'bitmap':
+                    ids = partial(index.iter_ids, condition.value, after_id)
+                else:
+                    ids = partial(_ids_after, index.lookup, condition.value, after_id)
+                path = {"type": "index", "index": field, "kind": index.kind,
+                        "condition": condition.describe(), "estimated_rows": index.estimate(condition.value)}
+                candidates.append(path)
+                if path["estimated_rows"] < best[0]["estimated_rows"]:
+                    best = (path, ids, [condition])
+            ranges = [condition for condition in field_conditions if condition.op in RANGE_OPERATORS]
+            if ranges and index.kind == 'sorted':
+                bounds = range_bounds(ranges)
+                ids = partial(_ids_after, lambda bounds, index=index: index.range_ids(*bounds), bounds, after_id)
+                path = {"type": "index_range", "index": field, "kind": index.kind,
+                        "condition": " and ".join(condition.describe() for condition in ranges),
+                        "estimated_rows": index.estimate_range(*bounds)}
+                candidates.append(path)
+                if path["estimated_rows"] < best[0]["estimated_rows"]:
+                    best = (path, ids, ranges)
+        
+        access, ids, covered = best
+        residual = [condition for condition in conditions if condition not in covered]
+        return access, candidates, ids, residual
+    
+    def _run_query(self, table: str, where: Optional[Dict[str, Any]], order_by: str,
+                   limit: Optional[int], after_id: int) -> Tuple[List[FrozenRecord], Dict[str, Any]]:
+        conditions = parse_where(where)
+        order_field, descending = parse_order_by(order_by)
+        if limit is not None and limit < 0:
+            raise QueryError("limit must not be negative")
+        access, candidates, ids, residual = self._plan(table, conditions, after_id)
+        
+        # Candidates come in id order, so an ascending id query can stop at limit
+        stop_at = limit if order_field == 'id' and not descending else None
+        records = self._data[table]
+        results = []
+        examined = 0
+        if stop_at != 0:
+            for record_id in ids():
+                record = records.get(record_id)
+                if record is None:
+                    continue
+                examined += 1
+                if all(condition.matches(record) for condition in residual):
+                    results.append(record)
+                    if len(results) == stop_at:
+                        break
+        
+        if stop_at is None:
+            if order_field != 'id':
+                results = sort_records(results, order_field, descending)
+            elif descending:
+                results.reverse()
+            if limit is not None:
+                results = results[:limit]
+        
+        plan = describe_plan(table, access, candidates, residual, order_by, limit, after_id)
+        plan["rows_examined"] = examined
+        plan["rows_returned"] = len(results)
+        return results, plan
+    
+    def query(self, table: str, where: Optional[Dict[str, Any]] = None, order_by: str = 'id',
+              limit: Optional[int] = None, after_id: int = 0) -> List[FrozenRecord]:
+        """
+        Get read-only views of the records matching every condition in where.
+        
+        See query.py for the where syntax. Records come back ordered by
+        order_by ("field" or "-field"), only those with an id above after_id,
+        at most limit of them. Only the returned records are materialized.
+        """
+        return self._run_query(table, where, order_by, limit, after_id)[0]
+    
+    def explain(self, table: str, where: Optional[Dict[str, Any]] = None, order_by: str = 'id',
+                limit: Optional[int] = None, after_id: int = 0) -> Dict[str, Any]:
+        """Run a query and describe the plan chosen for it, with row counts."""
+        return self._run_query(table, where, order_by, limit, after_id)[1]
+    
+    def search(self, table: str, text: str, where: Optional[Dict[str, Any]] = None,
+               limit: int = DEFAULT_SEARCH_LIMIT) -> List[FrozenRecord]:
+        """
+        Get read-only views of the best limit records matching a full-text query, best first.
+        
+        See search.py for matching and ranking. The where conditions are
+        checked on matching records only, except that when an index answers
+        one of them with fewer ids than the query's rarest word has postings
+        (e.g. one user's todos), the search starts from those ids instead.
+        Either way the cost follows the number of matches, not the size of
+        the table.
+        """
+        self._finish_text_build(table)
+        if table in self._text_builds:
+            raise TextIndexBuilding(table)
+        index = self._text_indexes.get(table)
+        if index is None:
+            raise QueryError(f"No text index on {table}")
+        if limit < 0:
+            raise QueryError("limit must not be negative")
+        conditions = parse_where(where)
+        records = self._data[table]
+        accept = within = None
+        if conditions:
+            accept = lambda record_id: all(condition.matches(records[record_id]) for condition in conditions)
+            access, _, ids, _ = self._plan(table, conditions, 0)
+            if access["type"] != "scan":
+                within = (access["estimated_rows"], ids)
+        return [records[record_id] for record_id, _ in index.search(text, limit, accept, within)]
+    
+    def stats(self, table: str, group: Any = None, overall: bool = False) -> Dict[str, Any]:
+        """
+        Get the counters of one group (or of the whole table): records,
+        records with the flag set and last activity, without touching a record.
+        """
+        stats = self._stats.get(table)
+        if stats is None:
+            raise QueryError(f"No stats on {table}")
+        return stats.get(group, overall)
+    
+    def verify_stats(self, table: str) -> List[str]:
+        """Check the table's counters against a full scan; returns the mismatches found."""
+        stats = self._stats.get(table)
+        if stats is None:
+            raise QueryError(f"No stats on {table}")
+        return stats.verify(self._data[table].values())
+    
+    def existing_ids(self, table: str, record_ids: Iterable[int]) -> Set[int]:
+        """Get the subset of the given ids that exist in the table."""
+        records = self._data[table]
+        return {record_id for record_id in set(record_ids) if record_id in records}
+    
+    def count(self, table: str) -> int:
+        """Get the number of records in a table."""
+        return len(self._data[table])
+    
+    def version(self, table: str) -> int:
+        """Get a number that changes whenever the table is written to."""
+        return self._versions[table]
+    
     def update_by_id(self, table: str, record_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Update a record by ID."""
-        for i, record in enumerate(self._data[table]):
-            if record['id'] == record_id:
-                # Update the record
-                for key, value in updates.items():
-                    if key != 'id':  # Don't allow ID updates
-                        record[key] = value
-                record['updated_at'] = datetime.utcnow().isoformat()
-                return record.copy()
-        return None
+        record = self._update(table, record_id, updates, datetime.utcnow().isoformat())
+        return record.copy() if record is not None else None
+    
+    def update_many(self, table: str, updates: Iterable[Tuple[int, Dict[str, Any]]]) -> List[Union[Dict[str, Any], DuplicateKeyError, None]]:
+        """
+        Apply several (record_id, updates) pairs in one call.
+        
+        The result has one entry per pair: the updated record, None if the
+        record does not exist, or the DuplicateKeyError that rejected it.
+        """
+        timestamp = datetime.utcnow().isoformat()
+        results: List[Union[Dict[str, Any], DuplicateKeyError, None]] = []
+        for record_id, changes in updates:
+            try:
+                record = self._update(table, record_id, changes, timestamp)
+                results.append(record.copy() if record is not None else None)
+            except DuplicateKeyError as e:
+                results.append(e)
+        return results
     
     def delete_by_id(self, table: str, record_id: int) -> bool:
         """Delete a record by ID."""
-        for i, record in enumerate(self._data[table]):
-            if record['id'] == record_id:
-                del self._data[table][i]
-                return True
-        return False
+        return self._delete(table, record_id)
+    
+    def delete_many(self, table: str, record_ids: Iterable[int]) -> List[bool]:
+        """Delete several records by ID, returning whether each one existed."""
+        return [self._delete(table, record_id) for record_id in record_ids]
     
     def clear_table(self, table: str) -> None:
-        """Clear all records from a table."""
-        self._data[table] = []
+        """Clear all records from a table, keeping its index definitions."""
+        self._data[table] = self._table_factory()
         self._counters[table] = 0
+        for index in self._indexes[table].values():
+            index.clear()
+        if table in self._text_indexes:
+            self._text_indexes[table].clear()
+        if table in self._text_builds:
+            # Nothing is left to build it from; the thread's result is dropped
+            self._text_indexes[table] = TextIndex(self._text_builds.pop(table).fields)
+        if table in self._stats:
+            self._stats[table].clear()
+        self._notify('clear', table, None, None)
+    
+    def export_state(self) -> Tuple[Dict[str, List[FrozenRecord]], Dict[str, int]]:
+        """
+        Capture every table and id counter at this instant.
+        
+        Records are immutable, so the captured lists stay consistent while
+        they are serialized elsewhere, even as new writes come in.
+        """
+        return {table: list(records.values()) for table, records in self._data.items()}, dict(self._counters)
+    
+    def load_records(self, table: str, records: Iterable[Dict[str, Any]]) -> None:
+        """Store records exactly as given (ids and timestamps included), e.g. when restoring from disk."""
+        rows = self._data[table]
+        indexes = list(self._indexes[table].items())
+        self._finish_text_build(table)
+        text_index = self._text_indexes.get(table)
+        build = self._text_builds.get(table)
+        stats = self._stats.get(table)
+        counter = self._counters[table]
+        for data in records:
+            record = FrozenRecord(data)
+            record_id = record['id']
+            if indexes or text_index is not None or build is not None or stats is not None:
+                old_record = rows.get(record_id)
+                if build is not None:
+                    build.touched.setdefault(record_id, old_record)
+                for field, index in indexes:
+                    if old_record is not None:
+                        index.remove(old_record.get(field), record_id)
+                    index.add(record.get(field), record_id)
+                if text_index is not None:
+                    if old_record is not None:
+                        text_index.update(record_id, old_record, record)
+                    else:
+                        text_index.add(record_id, record)
+                if stats is not None:
+                    if old_record is not None:
+                        stats.update(old_record, record, _activity(record))
+                    else:
+                        stats.add(record, _activity(record))
+            rows[record_id] = record
+            if record_id > counter:
+                counter = record_id
+        self._counters[table] = counter
+        self._versions[table] += 1
+    
+    def set_counter(self, table: str, value: int) -> None:
+        """Set the last id handed out for a table."""
+        self._counters[table] = value
+
+class AsyncDatabase:
+    """
+    Awaitable facade over a storage engine.
+    
+    Every engine method is exposed as a coroutine. Calls into a blocking
+    engine run on a bounded thread pool so handlers never stall the event
+    loop; the in-memory engine never blocks, so its calls run inline.
+    Every call is timed for the db_* metrics (see metrics.py) and for the
+    breakdown of slow requests (see profiler.py).
+    """
+    
+    def __init__(self, engine: StorageBackend, max_workers: int = 4):
+        self.engine = engine
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db") if engine.blocking else None
+    
+    async def _call(self, fn: Any, *args: Any, **kwargs: Any) -> Any:
+        if self._executor is None:
+            return fn(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(fn, *args, **kwargs))
+    
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.engine, name)
+        
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            start_ns = time.perf_counter_ns()
+            result = await self._call(method, *args, **kwargs)
+            duration_ns = time.perf_counter_ns() - start_ns
+            if args and isinstance(args[0], str):
+                metrics.db_operation(name, args[0], duration_ns, row_count(result))
+            record_db_time(duration_ns)
+            return result
+        
+        call.__name__ = name
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, call)
+        return call
+    
+    async def iter_batches(self, *args: Any, **kwargs: Any) -> AsyncIterator[List[FrozenRecord]]:
+        """Async version of StorageBackend.iter_batches; each batch is fetched off the loop if needed."""
+        batches = self.engine.iter_batches(*args, **kwargs)
+        while True:
+            start_ns = time.perf_counter_ns()
+            batch = await self._call(next, batches, None)
+            if batch is None:
+                return
+            duration_ns = time.perf_counter_ns() - start_ns
+            metrics.db_operation('iter_batches', args[0] if args else kwargs['table'], duration_ns, len(batch))
+            record_db_time(duration_ns)
+            yield batch
+
+def create_engine(name: str) -> StorageBackend:
+    """Create the storage engine selected by name ('memory' or 'sqlite')."""
+    if name == 'memory':
+        engine = MockDatabase(storage=os.environ.get('DB_STORAGE', 'dict'))
+        data_dir = os.environ.get('DB_DATA_DIR')
+        if data_dir:
+            # Restore from snapshot + write-ahead log and keep logging writes
+            from .persistence import Persistence
+            engine.persistence = Persistence(engine, data_dir, float(os.environ.get('DB_WAL_FLUSH_MS', '10')) / 1000)
+            engine.persistence.open()
+            engine.persistent = True
+        return engine
+    if name == 'sqlite':
+        # Imported lazily so the default engine does not pay for sqlite3
+        from .sqlite_backend import SQLiteDatabase
+        return SQLiteDatabase(os.environ.get('SQLITE_PATH', 'app.db'))
+    raise ValueError(f"Unknown database engine: {name}")
 
 # Global database instance
-db = MockDatabase()
+if os.environ.get('DB_SHARED_SOCKET'):
+    # The engine lives in the owner process (see shared_db.py)
+    from .shared_db import RemoteDatabase
+    db: Optional[StorageBackend] = None
+    async_db: Union[AsyncDatabase, 'RemoteDatabase'] = RemoteDatabase(os.environ['DB_SHARED_SOCKET'])
+else:
+    db = create_engine(os.environ.get('DB_ENGINE', 'memory'))
+    async_db = AsyncDatabase(db, max_workers=int(os.environ.get('DB_POOL_SIZE', '4')))
+
+# Fields of a todo covered by full-text search, with the weight of a match in each
+TODO_TEXT_FIELDS = {'title': 3, 'description': 1}
+
+# Sample data seeded into an empty database, built once at import
+SAMPLE_USERS = (
+    {"name": "John Doe", "email": "john@example.com"},
+    {"name": "Jane Smith", "email": "jane@example.com"},
+    {"name": "Bob Johnson", "email": "bob@example.com"}
+)
 
-def init_db():
+SAMPLE_TODOS = (
+    {
+        "title": "Setup project structure",
+        "description": "Create the initial project structure with Next.js and Sanic",
+        "completed": True,
+        "user_id": 1
+    },
+    {
+        "title": "Implement user authentication",
+        "description": "Add user login and registration functionality",
+        "completed": False,
+        "user_id": 1
+    },
+    {
+        "title": "Design database schema",
+        "description": "Plan the database structure for the application",
+        "completed": False,
+        "user_id": 2
+    },
+    {
+        "title": "Write API documentation",
+        "description": "Document all API endpoints and their usage",
+        "completed": False,
+        "user_id": 3
+    }
+)
+
+def create_schema(db: StorageBackend) -> None:
+    """Declare the indexes, text index and counters the handlers rely on."""
+    # Secondary indexes used by the hot lookup paths
+    db.create_index('users', 'email', unique=True)
+    db.create_index('todos', 'user_id')
+    db.create_index('todos', 'completed', kind='bitmap')
+    db.create_index('todos', 'created_at', kind='sorted')
+    db.create_index('todos', 'title', kind='sorted')
+    db.create_text_index('todos', TODO_TEXT_FIELDS)
+    db.create_stats('todos', 'user_id', 'completed')
+
+def init_db(engine: Optional[StorageBackend] = None):
     """Initialize the database with sample data."""
+    db = engine if engine is not None else globals()['db']
+    if db is None:
+        # Shared mode: the owner process initializes its own engine
+        return
+    
+    create_schema(db)
+    
+    # A persistent engine keeps its data across restarts, even with some tables emptied
+    if db.persistent and any(db.count(table) for table in ('users', 'todos')):
+        return
+    
     # Clear existing data
     db.clear_table('users')
     db.clear_table('todos')
     
-    # Add sample users
-    sample_users = [
-        {"name": "John Doe", "email": "john@example.com"},
-        {"name": "Jane Smith", "email": "jane@example.com"},
-        {"name": "Bob Johnson", "email": "bob@example.com"}
-    ]
-    
-    for user_data in sample_users:
-        db.insert('users', user_data)
-    
-    # Add sample todos
-    sample_todos = [
-        {
-            "title": "Setup project structure",
-            "description": "Create the initial project structure with Next.js and Sanic",
-            "completed": True,
-            "user_id": 1
-        },
-        {
-            "title": "Implement user authentication",
-            "description": "Add user login and registration functionality",
-            "completed": False,
-            "user_id": 1
-        },
-        {
-            "title": "Design database schema",
-            "description": "Plan the database structure for the application",
-            "completed": False,
-            "user_id": 2
-        },
-        {
-            "title": "Write API documentation",
-            "description": "Document all API endpoints and their usage",
-            "completed": False,
-            "user_id": 3
-        }
-    ]
-    
-    for todo_data in sample_todos:
-        db.insert('todos', todo_data)
+    # Add the sample rows in one batch per table
+    db.insert_many('users', SAMPLE_USERS)
+    db.insert_many('todos', SAMPLE_TODOS)
 
-def get_db() -> MockDatabase:
-    """Get the database instance."""
+def get_engine() -> Optional[StorageBackend]:
+    """Get the storage engine for synchronous use (startup, scripts); None in shared mode."""
     return db
+
+def get_db() -> Union[AsyncDatabase, 'RemoteDatabase']:
+    """Get the database instance."""
+    return async_db
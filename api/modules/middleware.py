@@ -7,36 +7,101 @@ from sanic.request import Request
 from sanic.response import HTTPResponse, json
 import time
 import logging
+from .access_log import access_log
+from .admission import admission
+from .compression import compressor
+from .metrics import metrics
+from .profiler import profiler
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def route_label(request: Request) -> str:
+    """The route pattern a request matched, so metrics have one series per route rather than per URL."""
+    route = request.route
+    return "/" + route.path if route is not None else "unmatched"
+
 def setup_middleware(app: Sanic) -> None:
     """Setup all middleware for the application."""
     
+    # Registered first so refused requests skip the other middleware; they are
+    # still counted in the metrics, but not timed or written to the access log
+    @app.middleware("request")
+    async def admit_request(request: Request):
+        """Refuse the request with a 503 or 429 when overloaded; see admission.py."""
+        return admission.admit(request)
+    
+    # Started once the server is up, so startup work is not measured as lag
+    @app.after_server_start
+    async def start_lag_monitor(app: Sanic, loop):
+        """Sample event loop lag for admission control."""
+        app.ctx.lag_monitor = loop.create_task(admission.monitor_loop_lag())
+    
+    @app.before_server_stop
+    async def stop_lag_monitor(app: Sanic, loop):
+        monitor = getattr(app.ctx, 'lag_monitor', None)
+        if monitor is not None:
+            monitor.cancel()
+    
     @app.middleware("request")
-    async def log_request(request: Request):
-        """Log incoming requests."""
-        request.ctx.start_time = time.time()
-        logger.info(f"[{request.method}] {request.path} - {request.ip}")
+    async def start_timer(request: Request):
+        """Note when the request started, for the access log, metrics and profiler."""
+        request.ctx.start_ns = start_ns = time.perf_counter_ns()
+        metrics.request_started(request.method, route_label(request))
+        if profiler.enabled:
+            profiler.request_started(request, start_ns)
     
     @app.middleware("response")
     async def log_response(request: Request, response: HTTPResponse):
-        """Log outgoing responses with timing."""
-        if hasattr(request.ctx, 'start_time'):
-            duration = (time.time() - request.ctx.start_time) * 1000
-            logger.info(f"[{request.method}] {request.path} - {response.status} - {duration:.2f}ms")
+        """Record the request in the metrics and queue an access log record; it is written off the event loop."""
+        start_ns = getattr(request.ctx, 'start_ns', None)
+        duration_ns = time.perf_counter_ns() - start_ns if start_ns is not None else None
+        admission.release(request)
+        route = route_label(request)
+        if profiler.enabled:
+            profiler.request_finished(request, response.status, route)
+        metrics.request_finished(request.method, route, response.status, duration_ns)
+        if duration_ns is not None:
+            access_log.record(request.method, request.path, response.status, duration_ns, request.ip)
+    
+    # Response middleware run in reverse order of registration, so this runs
+    # before log_response and the logged duration includes compression
+    @app.middleware("response")
+    async def compress_response(request: Request, response: HTTPResponse):
+        """Compress the body for clients that accept it; see compression.py."""
+        await compressor.compress_response(request, response)
+    
+    @app.after_server_stop
+    async def flush_access_log(app: Sanic, loop):
+        """Write out queued access log records before the worker exits."""
+        access_log.stop()
     
     @app.middleware("response")
     async def add_cors_headers(request: Request, response: HTTPResponse):
         """Add CORS headers to responses."""
         response.headers["Access-Control-Allow-Origin"] = "*"
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, If-Match, If-None-Match"
+        response.headers["Access-Control-Expose-Headers"] = "ETag, Retry-After"
         response.headers["Access-Control-Max-Age"] = "86400"
     
-    @app.options("/<path:path>")
+    if profiler.enabled:
+        # Registered after the other response middleware, so it runs first and
+        # marks the end of the handler for the slow request breakdown
+        @app.middleware("response")
+        async def mark_handler_end(request: Request, response: HTTPResponse):
+            profiler.handler_finished(request)
+        
+        @app.after_server_start
+        async def start_profiler(app: Sanic, loop):
+            profiler.start()
+        
+        @app.before_server_stop
+        async def stop_profiler(app: Sanic, loop):
+            profiler.stop()
+    
+    @app.options("/<path:path>", error_format="json")
     async def options_handler(request: Request, path: str):
         """Handle preflight CORS requests."""
         return json({}, status=200)
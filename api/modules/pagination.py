@@ -0,0 +1,68 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+Pages are addressed by the id of the last record already seen rather than by
+an offset, so fetching page N costs the same as fetching the first page.
+Cursors are opaque to clients.
+"""
+
+import base64
+import binascii
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from sanic.request import Request
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class PaginationError(ValueError):
+    """Raised for malformed limit or cursor query parameters."""
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the id of the last returned record as an opaque cursor."""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a cursor back into the id to resume after."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError("Invalid cursor parameter")
+
+def get_page_args(request: Request) -> Optional[Tuple[int, int]]:
+    """
+    Read paging parameters from the query string.
+
+    Returns (after_id, limit), or None when the client asked for neither a
+    limit nor a cursor, in which case the endpoint returns the full list.
+    """
+    limit_arg = request.args.get('limit')
+    cursor_arg = request.args.get('cursor')
+    if limit_arg is None and cursor_arg is None:
+        return None
+
+    limit = DEFAULT_PAGE_SIZE
+    if limit_arg is not None:
+        try:
+            limit = int(limit_arg)
+        except ValueError:
+            raise PaginationError("Invalid limit parameter")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise PaginationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    after_id = decode_cursor(cursor_arg) if cursor_arg else 0
+    return after_id, limit
+
+def paginate(records: List[Mapping[str, Any]], limit: int) -> Dict[str, Any]:
+    """
+    Build a page response from up to limit + 1 records.
+
+    Callers fetch one record more than the page size; its presence is how we
+    know there is a next page without counting the rest of the table.
+    """
+    page = records[:limit]
+    next_cursor = encode_cursor(page[-1]['id']) if len(records) > limit else None
+    return {"data": page, "next_cursor": next_cursor}
@@ -0,0 +1,238 @@
+"""
+Durable storage for the in-memory database: an append-only write-ahead log
+plus periodic snapshots.
+
+Every committed write is queued to a background thread, which appends it to
+the current JSONL log segment and fsyncs once per group of writes (group
+commit), so requests never wait on the disk. A snapshot captures all tables
+(records are immutable, so this is just a list of references), switches the
+log to a new segment, and is written by a background thread; older segments
+are then deleted. On startup the latest snapshot is read through mmap and
+only the log segments written after it are replayed.
+"""
+
+import asyncio
+import gc
+import glob
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from .storage import FrozenRecord
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.jsonl"
+SEGMENT_PATTERN = "wal.{:08d}.jsonl"
+
+class WriteAheadLog:
+    """Append-only JSONL log written by a background thread with group commit."""
+
+    def __init__(self, directory: str, segment: int, flush_interval: float = 0.01, fsync: bool = True):
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._fsync = fsync
+        self._pending: Deque[Tuple[str, Any]] = deque()
+        self._wakeup = threading.Event()
+        self._flushed = threading.Condition()
+        self._enqueued = 0
+        self._written = 0
+        self._closed = False
+        self.segment = segment
+        self._file = open(self._segment_path(segment), "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="wal-writer", daemon=True)
+        self._thread.start()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._directory, SEGMENT_PATTERN.format(segment))
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Queue a log entry; it is serialized and written by the writer thread."""
+        self._pending.append(("entry", entry))
+        self._enqueued += 1
+
+    def rotate(self) -> int:
+        """Start a new segment; entries queued before this call stay in the old one."""
+        self.segment += 1
+        self._pending.append(("rotate", self.segment))
+        self._enqueued += 1
+        self._wakeup.set()
+        return self.segment
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until everything queued so far is on disk."""
+        target = self._enqueued
+        self._wakeup.set()
+        with self._flushed:
+            self._flushed.wait_for(lambda: self._written >= target or self._closed, timeout)
+
+    def close(self) -> None:
+        """Flush outstanding entries and stop the writer thread."""
+        self.flush()
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self._file.close()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        count = len(self._pending)
+        if not count:
+            return
+        lines: List[str] = []
+        for _ in range(count):
+            kind, value = self._pending.popleft()
+            if kind == "rotate":
+                self._commit(lines)
+                lines = []
+                self._file.close()
+                self._file = open(self._segment_path(value), "a", encoding="utf-8")
+            else:
+                lines.append(json.dumps(value, separators=(",", ":")))
+        self._commit(lines)
+        with self._flushed:
+            self._written += count
+            self._flushed.notify_all()
+
+    def _commit(self, lines: List[str]) -> None:
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
+class Persistence:
+    """Snapshot + write-ahead log persistence for a MockDatabase."""
+
+    def __init__(self, db: Any, directory: str, flush_interval: float = 0.01):
+        self._db = db
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._snapshot_lock = threading.Lock()
+        self.wal: Optional[WriteAheadLog] = None
+
+    def open(self) -> None:
+        """Restore the database from disk, then start logging new writes."""
+        os.makedirs(self._directory, exist_ok=True)
+        start = time.perf_counter()
+        # Restoring allocates millions of long-lived objects; collecting while
+        # doing so only rescans them. Freezing them is left to the process
+        # (see main.create_app), as gc.freeze() affects every module.
+        gc.disable()
+        try:
+            first_segment = self._load_snapshot()
+            segments = self._segments()
+            for segment in segments:
+                if segment >= first_segment:
+                    self._replay(segment)
+        finally:
+            gc.enable()
+        logger.info(f"Restored database from {self._directory} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        # Start a fresh segment so new entries never follow a torn line
+        self.wal = WriteAheadLog(self._directory, max([first_segment, *segments]) + 1, self._flush_interval)
+        self._db.add_listener(self._log_write)
+
+    def flush(self) -> None:
+        """Block until every logged write is on disk."""
+        if self.wal is not None:
+            self.wal.flush()
+
+    def close(self) -> None:
+        """Flush and close the log."""
+        if self.wal is not None:
+            self.wal.close()
+            self.wal = None
+
+    def _log_write(self, op: str, table: str, old: Optional[FrozenRecord], new: Optional[FrozenRecord]) -> None:
+        if op == 'delete':
+            self.wal.append({"op": op, "table": table, "id": old['id']})
+        elif op == 'clear':
+            self.wal.append({"op": op, "table": table})
+        else:
+            # Full records make replay idempotent
+            self.wal.append({"op": op, "table": table, "record": new})
+
+    def _segments(self) -> List[int]:
+        paths = glob.glob(os.path.join(self._directory, "wal.*.jsonl"))
+        return sorted(int(os.path.basename(path).split(".")[1]) for path in paths)
+
+    def _load_snapshot(self) -> int:
+        """Load the snapshot if there is one; return the first log segment to replay."""
+        path = os.path.join(self._directory, SNAPSHOT_FILE)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+            header = json.loads(snapshot.readline())
+            # One line per table holding a JSON array of its records
+            for line in iter(snapshot.readline, b""):
+                section = json.loads(line)
+                self._db.load_records(section["table"], section["records"])
+        for table, counter in header["counters"].items():
+            self._db.set_counter(table, counter)
+        return header["wal_segment"]
+
+    def _replay(self, segment: int) -> None:
+        path = os.path.join(self._directory, SEGMENT_PATTERN.format(segment))
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write; everything before it is intact
+                    logger.warning(f"Skipping unreadable log entry in {path}")
+                    continue
+                op, table = entry["op"], entry["table"]
+                if op == "delete":
+                    self._db.delete_by_id(table, entry["id"])
+                elif op == "clear":
+                    self._db.clear_table(table)
+                else:
+                    self._db.load_records(table, [entry["record"]])
+
+    def snapshot(self) -> threading.Thread:
+        """
+        Capture the database and write it out on a background thread.
+
+        Must be called from the thread that owns the database (the event
+        loop); the capture is O(rows) reference copies, the serialization
+        happens off the loop. Returns the writer thread.
+        """
+        tables, counters = self._db.export_state()
+        segment = self.wal.rotate()
+        thread = threading.Thread(target=self._write_snapshot, args=(tables, counters, segment),
+                                  name="snapshot-writer", daemon=True)
+        thread.start()
+        return thread
+
+    def _write_snapshot(self, tables: Dict[str, List[FrozenRecord]], counters: Dict[str, int], segment: int) -> None:
+        with self._snapshot_lock:
+            path = os.path.join(self._directory, SNAPSHOT_FILE)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"format": 1, "wal_segment": segment, "counters": counters}) + "\n")
+                for table, records in tables.items():
+                    f.write(json.dumps({"table": table, "records": records}, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            # The snapshot covers everything before its segment
+            for old_segment in self._segments():
+                if old_segment < segment:
+                    os.remove(os.path.join(self._directory, SEGMENT_PATTERN.format(old_segment)))
+
+    async def snapshot_periodically(self, interval: float) -> None:
+        """Take a snapshot every interval seconds, e.g. as a Sanic background task."""
+        while True:
+            await asyncio.sleep(interval)
+            thread = self.snapshot()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
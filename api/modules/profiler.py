@@ -0,0 +1,227 @@
+"""
+Sampling profiler and slow-request capture for the event loop thread.
+
+Both are off unless PROFILER=on. Then:
+
+- GET /api/debug/profile?seconds=N samples the event loop thread's stack
+  every PROFILER_INTERVAL_MS (default 10) for N seconds (default 10, at most
+  PROFILER_MAX_SECONDS, default 60) and returns the stacks in the collapsed
+  format flamegraph.pl, speedscope and inferno read: one line per distinct
+  stack, frames root first separated by ';', then the sample count. The
+  sampler is a thread that reads sys._current_frames(), so nothing is traced
+  and requests run at full speed between samples.
+
+- GET /api/debug/slow-requests lists the slowest of the last
+  SLOW_REQUEST_KEEP (default 50) requests that took SLOW_REQUEST_MS (default
+  500) or longer: route, status, a timing breakdown (in the handler, of
+  which in storage engine calls, and after it, compression included) and
+  the event loop's stack at the moment the request crossed the
+  threshold, as taken by a watchdog thread. When the loop is blocked, that
+  stack shows what blocked it.
+
+Set PROFILER_TOKEN to require "Authorization: Bearer <token>" on both.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import lru_cache
+from types import CodeType, FrameType
+from typing import Any, Deque, Dict, List, Optional
+from sanic import Blueprint
+from sanic.request import Request
+from sanic.response import json, text
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Deepest stack kept, counted from the innermost frame
+MAX_STACK_DEPTH = 128
+DEBUG_ROUTE_PREFIX = "/api/debug/"
+# Watched requests not finished after this long are assumed cancelled
+STALE_REQUEST_NS = 600 * 1_000_000_000
+
+@lru_cache(maxsize=4096)
+def _frame_label(code: CodeType) -> str:
+    """'qualname (path:line)' for a code object, with the path shortened to something readable."""
+    filename = code.co_filename
+    if filename.startswith(API_DIR):
+        filename = filename[len(API_DIR) + 1:]
+    else:
+        _, marker, rest = filename.rpartition("site-packages" + os.sep)
+        filename = rest if marker else os.path.basename(filename)
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+def stack_of(frame: Optional[FrameType]) -> List[str]:
+    """Frame labels from the outermost frame to frame."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+def thread_stack(thread_id: int) -> List[str]:
+    """Current stack of another thread (empty if it has exited)."""
+    return stack_of(sys._current_frames().get(thread_id))
+
+def collapse(samples: Counter) -> str:
+    """Samples keyed by tuples of code objects, innermost first, as collapsed stack lines, most frequent first."""
+    return "".join(f"{';'.join(_frame_label(code) for code in reversed(codes))} {n}\n"
+                   for codes, n in samples.most_common())
+
+# Slow request entry of the request being handled in the current task (see AsyncDatabase)
+_current_entry: ContextVar[Optional[List[Any]]] = ContextVar('profiler_entry', default=None)
+
+def record_db_time(duration_ns: int) -> None:
+    """Add a storage engine call to the current request's breakdown, if it is being watched."""
+    entry = _current_entry.get()
+    if entry is not None:
+        entry[2] += duration_ns
+        entry[3] += 1
+
+class Profiler:
+    """On-demand stack sampling and capture of slow requests."""
+
+    def __init__(self, enabled: bool = False, interval_ms: float = 10, max_seconds: float = 60,
+                 slow_ms: float = 500, keep: int = 50, token: Optional[str] = None):
+        self.enabled = enabled
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.slow_ns = int(slow_ms * 1_000_000)
+        self.token = token
+        self.loop_thread_id: Optional[int] = None
+        self.profiling = False
+        # Requests being handled, by id(request):
+        # [start_ns, stack when it crossed the threshold, engine ns, engine calls]
+        self._active: Dict[int, List[Any]] = {}
+        self.slow_requests: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start watching for slow requests from the event loop thread."""
+        self.loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="slow-request-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _watch(self) -> None:
+        # Checks often enough to catch a request within a quarter of the threshold
+        interval = min(max(self.slow_ns / 4e9, 0.001), 0.05)
+        while not self._stop.wait(interval):
+            now_ns = time.perf_counter_ns()
+            crossed_before = now_ns - self.slow_ns
+            # list() copies the items without letting the loop thread run in between
+            for key, entry in list(self._active.items()):
+                if entry[1] is None and entry[0] <= crossed_before:
+                    entry[1] = thread_stack(self.loop_thread_id)
+                elif entry[0] <= now_ns - STALE_REQUEST_NS:
+                    # Its handler was cancelled, so request_finished never came
+                    self._active.pop(key, None)
+
+    def request_started(self, request: Request, start_ns: int) -> None:
+        entry = [start_ns, None, 0, 0]
+        self._active[id(request)] = entry
+        _current_entry.set(entry)
+
+    def handler_finished(self, request: Request) -> None:
+        request.ctx.handler_end_ns = time.perf_counter_ns()
+
+    def request_finished(self, request: Request, status: int, route: str) -> None:
+        """Keep the request's breakdown when it was slow."""
+        entry = self._active.pop(id(request), None)
+        if entry is None:
+            return
+        end_ns = time.perf_counter_ns()
+        start_ns, stack, db_ns, db_calls = entry
+        # A profile is as slow as it was asked to be
+        if end_ns - start_ns < self.slow_ns or route.startswith(DEBUG_ROUTE_PREFIX):
+            return
+        handler_end_ns = getattr(request.ctx, 'handler_end_ns', end_ns)
+        self.slow_requests.append({
+            "method": request.method,
+            "path": request.path,
+            "route": route,
+            "status": status,
+            "finished_at": time.time(),
+            "total_ms": (end_ns - start_ns) / 1e6,
+            "breakdown_ms": {
+                "handler": (handler_end_ns - start_ns) / 1e6,
+                "storage_engine": db_ns / 1e6,
+                "after_handler": (end_ns - handler_end_ns) / 1e6,
+            },
+            "storage_engine_calls": db_calls,
+            "stack": stack,
+        })
+
+    def sample(self, seconds: float) -> Counter:
+        """Sample the event loop thread's stack for seconds; run this on another thread."""
+        samples: Counter = Counter()
+        thread_id = self.loop_thread_id
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            # Only the code objects are collected here; labels are made once per stack by collapse()
+            codes = []
+            while frame is not None and len(codes) < MAX_STACK_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if codes:
+                samples[tuple(codes)] += 1
+            time.sleep(self.interval)
+        return samples
+
+    def authorized(self, request: Request) -> bool:
+        return self.token is None or request.headers.get("authorization") == f"Bearer {self.token}"
+
+profiler = Profiler(
+    enabled=os.environ.get('PROFILER', 'off').lower() in ('1', 'on', 'true', 'yes'),
+    interval_ms=float(os.environ.get('PROFILER_INTERVAL_MS', '10')),
+    max_seconds=float(os.environ.get('PROFILER_MAX_SECONDS', '60')),
+    slow_ms=float(os.environ.get('SLOW_REQUEST_MS', '500')),
+    keep=int(os.environ.get('SLOW_REQUEST_KEEP', '50')),
+    token=os.environ.get('PROFILER_TOKEN') or None,
+)
+
+def get_profiler() -> Profiler:
+    """Get the process-wide profiler."""
+    return profiler
+
+# Registered by main.py only when PROFILER=on
+debug_bp = Blueprint("debug")
+
+@debug_bp.get("/debug/profile", error_format="json")
+async def profile(request: Request):
+    """Sample the event loop for ?seconds=N and return collapsed stacks."""
+    if not profiler.authorized(request):
+        return json({"error": "Unauthorized"}, status=401)
+    try:
+        seconds = float(request.args.get("seconds", "10"))
+    except ValueError:
+        return json({"error": "seconds must be a number"}, status=400)
+    if not 0 < seconds <= profiler.max_seconds:
+        return json({"error": f"seconds must be more than 0 and at most {profiler.max_seconds:g}"}, status=400)
+    if profiler.profiling:
+        return json({"error": "A profile is already being taken"}, status=409)
+    profiler.profiling = True
+    try:
+        samples = await asyncio.get_running_loop().run_in_executor(None, profiler.sample, seconds)
+    finally:
+        profiler.profiling = False
+    return text(collapse(samples))
+
+@debug_bp.get("/debug/slow-requests", error_format="json")
+async def slow_requests(request: Request):
+    """The slowest recent requests, slowest first."""
+    if not profiler.authorized(request):
+        return json({"error": "Unauthorized"}, status=401)
+    return json(sorted(profiler.slow_requests, key=lambda entry: entry["total_ms"], reverse=True))
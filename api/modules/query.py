@@ -0,0 +1,112 @@
+"""
+Filter conditions for StorageBackend.query.
+
+A where clause maps "field" (equality) or "field__op" to a value, e.g.
+{"user_id": 3, "title__prefix": "Write", "created_at__gte": "2024-01-01"}.
+Range operators compare values of the same type; records missing the field,
+or holding a value of another type, never match them.
+"""
+
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+OPERATORS = ('eq', 'gt', 'gte', 'lt', 'lte', 'prefix')
+RANGE_OPERATORS = ('gt', 'gte', 'lt', 'lte', 'prefix')
+
+class QueryError(ValueError):
+    """Raised for a where clause or ordering the query API does not understand."""
+
+class Condition(NamedTuple):
+    field: str
+    op: str
+    value: Any
+
+    def matches(self, record: Mapping[str, Any]) -> bool:
+        value = record.get(self.field)
+        if self.op == 'eq':
+            return value == self.value
+        if value is None:
+            return False
+        try:
+            if self.op == 'prefix':
+                return isinstance(value, str) and value.startswith(self.value)
+            if self.op == 'gt':
+                return value > self.value
+            if self.op == 'gte':
+                return value >= self.value
+            if self.op == 'lt':
+                return value < self.value
+            return value <= self.value
+        except TypeError:
+            return False
+
+    def describe(self) -> str:
+        return f"{self.field} {self.op} {self.value!r}"
+
+def parse_where(where: Optional[Mapping[str, Any]]) -> List[Condition]:
+    """Turn a where clause into conditions."""
+    conditions = []
+    for key, value in (where or {}).items():
+        field, _, op = key.partition('__')
+        op = op or 'eq'
+        if not field.isidentifier() or op not in OPERATORS:
+            raise QueryError(f"Unsupported filter: {key}")
+        if op == 'prefix' and not isinstance(value, str):
+            raise QueryError(f"Prefix filter needs a string: {key}")
+        conditions.append(Condition(field, op, value))
+    return conditions
+
+def parse_order_by(order_by: str) -> Tuple[str, bool]:
+    """Split "field" / "-field" into (field, descending)."""
+    descending = order_by.startswith('-')
+    field = order_by.lstrip('-')
+    if not field.isidentifier():
+        raise QueryError(f"Unsupported ordering: {order_by}")
+    return field, descending
+
+def sort_records(records: List[Any], field: str, descending: bool) -> List[Any]:
+    """
+    Sort records (given in id order) by a field, then id, both in the same
+    direction; records missing the field come last.
+    """
+    present = [record for record in records if record.get(field) is not None]
+    missing = [record for record in records if record.get(field) is None]
+    try:
+        present.sort(key=lambda record: (record[field], record['id']), reverse=descending)
+    except TypeError:
+        raise QueryError(f"Cannot order by {field}: mixed value types")
+    if descending:
+        missing.reverse()
+    return present + missing
+
+def range_bounds(conditions: List[Condition]) -> Tuple[Any, bool, Any, bool]:
+    """
+    Combine range conditions on one field into a single interval.
+
+    Returns (low, low_inclusive, high, high_inclusive); None means unbounded.
+    """
+    low, low_inclusive, high, high_inclusive = None, True, None, True
+    for condition in conditions:
+        if condition.op == 'prefix':
+            bounds = [(condition.value, True, True), (condition.value + '\U0010ffff', False, False)]
+        else:
+            bounds = [(condition.value, condition.op in ('gte', 'lte'), condition.op in ('gt', 'gte'))]
+        for value, inclusive, is_low in bounds:
+            if is_low:
+                if low is None or value > low or (value == low and not inclusive):
+                    low, low_inclusive = value, inclusive
+            elif high is None or value < high or (value == high and not inclusive):
+                high, high_inclusive = value, inclusive
+    return low, low_inclusive, high, high_inclusive
+
+def describe_plan(table: str, access: Dict[str, Any], candidates: List[Dict[str, Any]],
+                  residual: List[Condition], order_by: str, limit: Optional[int], after_id: int) -> Dict[str, Any]:
+    """Build the explain output shared by the storage engines."""
+    return {
+        "table": table,
+        "access": access,
+        "candidates": candidates,
+        "filters": [condition.describe() for condition in residual],
+        "order_by": order_by,
+        "after_id": after_id,
+        "limit": limit,
+    }
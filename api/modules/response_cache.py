@@ -0,0 +1,214 @@
+"""
+Cache of encoded GET responses, keyed by table versions.
+
+Every storage engine exposes a per-table version that changes on each write.
+A cached body is stored under (path, query string, versions of the tables it
+was built from), so a write simply makes new requests miss; stale entries are
+never served and age out of the LRU. A hit skips the database read and the
+JSON encoding entirely and sends the stored bytes.
+
+The same versions give list responses their ETag (see conditional.py), so a
+matching If-None-Match is answered with a 304 before the handler runs.
+
+Compressed forms of a cached body (see compression.py) are kept with the
+entry, so an unchanged response is compressed once per encoding and leaves
+the cache together with its body.
+
+Concurrent misses for the same key share one handler call (see
+single_flight.py): the first request builds the body, the others wait for it
+and send the same bytes.
+"""
+
+import os
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from sanic.request import Request
+from sanic.response import HTTPResponse
+from .conditional import etag_headers, if_none_match, not_modified, table_etag
+from .database import get_db
+from .single_flight import SingleFlight
+from .streaming import wants_stream
+
+JSON_CONTENT_TYPE = "application/json"
+
+# A cached response: body, ETag and compressed bodies by content coding
+_Entry = Tuple[bytes, Optional[str], Dict[str, bytes]]
+
+def _entry_size(entry: _Entry) -> int:
+    return len(entry[0]) + sum(len(data) for data in entry[2].values())
+
+class ResponseCache:
+    """LRU cache of response bodies (with their ETag) with a cap on their total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # A single body may use at most this much, so one huge list cannot flush everything else
+        self.max_entry_bytes = max_bytes // 4
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.encoded_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Optional[str]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, key: Hashable, body: bytes, etag: Optional[str] = None) -> None:
+        if len(body) > self.max_entry_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= _entry_size(old)
+        self._entries[key] = (body, etag, {})
+        self._size += len(body)
+        self._evict()
+
+    def get_encoded(self, key: Hashable, encoding: str) -> Optional[bytes]:
+        """The body of a cached entry compressed with encoding, if it was stored."""
+        entry = self._entries.get(key)
+        data = entry[2].get(encoding) if entry is not None else None
+        if data is not None:
+            self.encoded_hits += 1
+        return data
+
+    def put_encoded(self, key: Hashable, encoding: str, data: bytes) -> None:
+        """Store the compressed body of a cached entry; ignored once the entry has left the cache."""
+        entry = self._entries.get(key)
+        if entry is None or encoding in entry[2]:
+            return
+        entry[2][encoding] = data
+        self._size += len(data)
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= _entry_size(evicted)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "encoded_hits": self.encoded_hits,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+# Per-process cache; RESPONSE_CACHE_MB=0 turns it off
+response_cache = ResponseCache(int(float(os.environ.get('RESPONSE_CACHE_MB', '64')) * 1024 * 1024))
+
+# Per-process coalescing of concurrent identical GETs
+single_flight = SingleFlight()
+
+def get_response_cache() -> ResponseCache:
+    """Get the response cache instance."""
+    return response_cache
+
+def get_single_flight() -> SingleFlight:
+    """Get the single-flight group shared by the cached GET handlers."""
+    return single_flight
+
+def normalize_query(query_string: str) -> str:
+    """Query string with its parameters sorted, so their order does not change the key."""
+    if "&" not in query_string:
+        return query_string
+    return "&".join(sorted(part for part in query_string.split("&") if part))
+
+def _shared_response(request: Request, body: bytes, etag: Optional[str]) -> HTTPResponse:
+    """Response for a body built earlier, by the cache or by a concurrent request."""
+    if etag is None:
+        return HTTPResponse(body, content_type=JSON_CONTENT_TYPE)
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    return HTTPResponse(body, content_type=JSON_CONTENT_TYPE, headers=etag_headers(etag))
+
+async def table_versions(tables: Tuple[str, ...]) -> Tuple[int, ...]:
+    """Get the current version of each table."""
+    db = get_db()
+    return tuple([await db.version(table) for table in tables])
+
+def cached_response(*tables: str, record_etag: bool = False) -> Callable:
+    """
+    Cache a GET handler's 200 responses until one of the tables changes.
+
+    The versions are read before the handler runs, so a write that lands
+    while the body is being built only makes the entry newer than its key,
+    never staler. Streamed (NDJSON) responses are not cached.
+
+    List handlers get an ETag from the table versions and a matching
+    If-None-Match is answered with a 304 without calling the handler. With
+    record_etag=True the handler sets a per-record ETag and answers
+    If-None-Match itself; the ETag is cached with the body, so hits can
+    still be answered with a 304.
+
+    Requests that miss while the same key is being built wait for that
+    handler call and send its body, unless it has nothing to share (an
+    error or a 304), in which case they call the handler themselves.
+    """
+    def decorator(handler: Callable[..., Awaitable[Optional[HTTPResponse]]]) -> Callable:
+        @wraps(handler)
+        async def wrapper(request: Request, *args: Any, **kwargs: Any) -> Optional[HTTPResponse]:
+            if wants_stream(request):
+                return await handler(request, *args, **kwargs)
+
+            versions = await table_versions(tables)
+            etag = None
+            if not record_etag:
+                etag = table_etag(versions)
+                if if_none_match(request, etag):
+                    return not_modified(etag)
+
+            cache = response_cache
+            key = (request.path, normalize_query(request.query_string), versions)
+            entry = cache.get(key) if cache.enabled else None
+            if entry is not None:
+                # Lets the compression middleware reuse compressed copies of the body
+                request.ctx.response_cache_key = key
+                return _shared_response(request, *entry)
+
+            async def build() -> Tuple[Optional[HTTPResponse], Optional[Tuple[bytes, Optional[str]]]]:
+                """The handler's response, and the body and ETag concurrent requests can share."""
+                response = await handler(request, *args, **kwargs)
+                if response is None or response.status != 200 or response.body is None:
+                    return response, None
+                response_etag = etag
+                if response_etag is None:
+                    response_etag = response.headers.get("etag")
+                else:
+                    response.headers.update(etag_headers(response_etag))
+                if cache.enabled:
+                    cache.put(key, response.body, response_etag)
+                return response, (response.body, response_etag)
+
+            result, coalesced = await single_flight.run(key, build)
+            if cache.enabled:
+                request.ctx.response_cache_key = key
+            if not coalesced:
+                return result[0]
+            if result is None or result[1] is None:
+                # Nothing to share (an error, a 304 or a failed run): answer this one on its own
+                return await handler(request, *args, **kwargs)
+            return _shared_response(request, *result[1])
+        return wrapper
+    return decorator
@@ -0,0 +1,279 @@
+"""
+Full-text search for StorageBackend.search.
+
+Text is split into lowercase word tokens. A query matches a record when
+every query token is a prefix of some word in the record's indexed fields,
+so "deplo doc" finds "Deploy the documentation". Matches are ranked by the
+sum, over query tokens, of the best matching word's weight in the record
+(occurrences times the weight of the field it is in) times that word's
+inverse document frequency; a word that only extends a query token counts
+PREFIX_MATCH_WEIGHT as much as an exact one.
+
+TextIndex is the in-memory engine's inverted index. Each word keeps the ids
+of the records holding it in id order, next to their weights, so a query
+only ever reads the postings of the words it matches. Removing a record
+zeroes its weights instead of shifting every later posting of a common
+word; a word's postings are compacted once half of them are such gaps.
+"""
+
+import heapq
+import math
+import re
+from operator import itemgetter
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Later tokens of a longer query are ignored
+MAX_QUERY_TOKENS = 8
+PREFIX_MATCH_WEIGHT = 0.5
+# Weights are stored in a byte per posting
+MAX_WEIGHT = 255
+# Probing a posting list costs a binary search, so it pays to probe the
+# candidates left so far instead of reading the whole list only when there
+# are this many times fewer of them
+PROBE_RATIO = 4
+# The vocabulary is kept sorted in buckets of up to twice this many words,
+# so adding or dropping a word only shifts the words of one bucket
+VOCABULARY_BUCKET_SIZE = 1000
+
+_WORD = re.compile(r"\w+")
+
+def tokenize(text: Any) -> List[str]:
+    """Lowercase word tokens of a string, in order (nothing for other values)."""
+    if not isinstance(text, str):
+        return []
+    return _WORD.findall(text.casefold())
+
+def query_tokens(text: str) -> List[str]:
+    """The distinct tokens of a search query that are searched for."""
+    return list(dict.fromkeys(tokenize(text)))[:MAX_QUERY_TOKENS]
+
+class _Postings:
+    """Ids of the records holding a word, ascending, and the word's weight in each (0 once removed)."""
+
+    __slots__ = ('ids', 'weights', 'removed')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.weights = bytearray()
+        self.removed = 0
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.removed
+
+    def compact(self) -> None:
+        """Drop the postings of removed records."""
+        self.ids = array('q', compress(self.ids, self.weights))
+        self.weights = self.weights.replace(b'\0', b'')
+        self.removed = 0
+
+class _Vocabulary:
+    """Sorted set of words, split into buckets next to the last word of each."""
+
+    __slots__ = ('_buckets', '_ends')
+
+    def __init__(self):
+        self._buckets: List[List[str]] = []
+        self._ends: List[str] = []
+
+    def add(self, word: str) -> None:
+        """Add a word that is not in the set yet."""
+        if not self._ends:
+            self._buckets.append([word])
+            self._ends.append(word)
+            return
+        bucket = min(bisect_left(self._ends, word), len(self._ends) - 1)
+        words = self._buckets[bucket]
+        pos = bisect_left(words, word)
+        words.insert(pos, word)
+        if pos == len(words) - 1:
+            self._ends[bucket] = word
+        if len(words) > 2 * VOCABULARY_BUCKET_SIZE:
+            half = len(words) // 2
+            self._buckets[bucket:bucket + 1] = [words[:half], words[half:]]
+            self._ends.insert(bucket, words[half - 1])
+
+    def remove(self, word: str) -> None:
+        """Drop a word that is in the set."""
+        bucket = bisect_left(self._ends, word)
+        words = self._buckets[bucket]
+        del words[bisect_left(words, word)]
+        if not words:
+            del self._buckets[bucket]
+            del self._ends[bucket]
+        else:
+            self._ends[bucket] = words[-1]
+
+    def starting_with(self, prefix: str) -> Iterator[str]:
+        """Yield the words that start with prefix, in order."""
+        for bucket in range(bisect_left(self._ends, prefix), len(self._ends)):
+            words = self._buckets[bucket]
+            for pos in range(bisect_left(words, prefix), len(words)):
+                if not words[pos].startswith(prefix):
+                    return
+                yield words[pos]
+
+class TextIndex:
+    """Inverted index over the words of some fields of a table's records."""
+
+    def __init__(self, fields: Mapping[str, int]):
+        # Field -> weight of one occurrence of a word in it
+        self.fields = dict(fields)
+        self._postings: Dict[str, _Postings] = {}
+        # Every indexed word, for prefix lookups
+        self._words = _Vocabulary()
+        self.documents = 0
+
+    def _weights(self, record: Mapping[str, Any]) -> Dict[str, int]:
+        weights: Dict[str, int] = {}
+        for field, field_weight in self.fields.items():
+            for word in tokenize(record.get(field)):
+                weights[word] = weights.get(word, 0) + field_weight
+        return weights
+
+    def _add_word(self, word: str, record_id: int, weight: int) -> None:
+        postings = self._postings.get(word)
+        if postings is None:
+            postings = self._postings[word] = _Postings()
+            self._words.add(word)
+        ids = postings.ids
+        weight = min(weight, MAX_WEIGHT)
+        # New records have the highest id, so inserts append
+        if not ids or ids[-1] < record_id:
+            ids.append(record_id)
+            postings.weights.append(weight)
+            return
+        pos = bisect_left(ids, record_id)
+        if pos < len(ids) and ids[pos] == record_id:
+            if not postings.weights[pos]:
+                postings.removed -= 1
+            postings.weights[pos] = weight
+        else:
+            ids.insert(pos, record_id)
+            postings.weights.insert(pos, weight)
+
+    def _remove_word(self, word: str, record_id: int) -> None:
+        postings = self._postings.get(word)
+        if postings is None:
+            return
+        ids = postings.ids
+        pos = bisect_left(ids, record_id)
+        if pos < len(ids) and ids[pos] == record_id and postings.weights[pos]:
+            postings.weights[pos] = 0
+            postings.removed += 1
+            if not len(postings):
+                del self._postings[word]
+                self._words.remove(word)
+            elif postings.removed * 2 > len(ids):
+                postings.compact()
+
+    def add(self, record_id: int, record: Mapping[str, Any]) -> None:
+        """Index a new record."""
+        for word, weight in self._weights(record).items():
+            self._add_word(word, record_id, weight)
+        self.documents += 1
+
+    def remove(self, record_id: int, record: Mapping[str, Any]) -> None:
+        """Drop a record, given as it was indexed."""
+        for word in self._weights(record):
+            self._remove_word(word, record_id)
+        self.documents -= 1
+
+    def update(self, record_id: int, old: Mapping[str, Any], new: Mapping[str, Any]) -> None:
+        """Reindex a changed record, touching only the words whose weight changed."""
+        old_weights = self._weights(old)
+        new_weights = self._weights(new)
+        for word in old_weights:
+            if word not in new_weights:
+                self._remove_word(word, record_id)
+        for word, weight in new_weights.items():
+            if old_weights.get(word) != weight:
+                self._add_word(word, record_id, weight)
+
+    def clear(self) -> None:
+        """Remove all entries, keeping the index definition."""
+        self._postings = {}
+        self._words = _Vocabulary()
+        self.documents = 0
+
+    def _matches(self, token: str) -> List[Tuple[_Postings, float]]:
+        """Postings of every word the token is a prefix of, with the factor a match is scored by."""
+        matches = []
+        for word in self._words.starting_with(token):
+            postings = self._postings[word]
+            idf = math.log(1 + self.documents / len(postings))
+            matches.append((postings, idf if word == token else idf * PREFIX_MATCH_WEIGHT))
+        return matches
+
+    @staticmethod
+    def _read(matches: List[Tuple[_Postings, float]]) -> Dict[int, float]:
+        """Score of every record holding one of the matched words."""
+        postings, factor = matches[0]
+        scores = {record_id: weight * factor for record_id, weight in zip(postings.ids, postings.weights) if weight}
+        get = scores.get
+        for postings, factor in matches[1:]:
+            for record_id, weight in zip(postings.ids, postings.weights):
+                score = weight * factor
+                if score > get(record_id, 0.0):
+                    scores[record_id] = score
+        return scores
+
+    @staticmethod
+    def _probe(matches: List[Tuple[_Postings, float]], scores: Dict[int, float]) -> Dict[int, float]:
+        """Add the token's score to each candidate that holds a matched word, dropping the rest."""
+        result = {}
+        for record_id, score in scores.items():
+            best = 0.0
+            for postings, factor in matches:
+                ids = postings.ids
+                pos = bisect_left(ids, record_id)
+                if pos < len(ids) and ids[pos] == record_id and postings.weights[pos] * factor > best:
+                    best = postings.weights[pos] * factor
+            if best:
+                result[record_id] = score + best
+        return result
+
+    def search(self, text: str, limit: int, accept: Optional[Callable[[int], bool]] = None,
+               within: Optional[Tuple[int, Callable[[], Iterable[int]]]] = None) -> List[Tuple[int, float]]:
+        """
+        (record id, score) of the best limit matches, best first.
+
+        accept, when given, filters the matches before they are ranked.
+        within, when given, is (count, ids): a superset of the wanted ids
+        from another index, e.g. one user's todos, read in place of the
+        rarest token's postings when it is smaller. Tokens are intersected
+        from the one with the fewest postings up, probing the candidates
+        left in the longer lists, so the cost follows the number of records
+        the query matches rather than the size of the table.
+        """
+        tokens = []
+        for token in query_tokens(text):
+            matches = self._matches(token)
+            if not matches:
+                return []
+            tokens.append((sum(len(postings.ids) for postings, _ in matches), matches))
+        if not tokens or limit <= 0:
+            return []
+        tokens.sort(key=lambda item: item[0])
+
+        scores = None
+        if within is not None and within[0] < tokens[0][0]:
+            scores = dict.fromkeys(within[1](), 0.0)
+        for size, matches in tokens:
+            if scores is None:
+                scores = self._read(matches)
+            elif not scores:
+                return []
+            elif len(scores) * len(matches) * PROBE_RATIO < size:
+                scores = self._probe(matches, scores)
+            else:
+                other = self._read(matches)
+                scores = {record_id: score + other[record_id]
+                          for record_id, score in scores.items() if record_id in other}
+        if accept is not None:
+            scores = {record_id: score for record_id, score in scores.items() if accept(record_id)}
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
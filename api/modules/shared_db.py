@@ -0,0 +1,340 @@
+"""
+Shared database for running the app with several worker processes.
+
+Each Sanic worker is its own process, so a per-process MockDatabase would
+give every worker a private copy of the data. In shared mode a single owner
+process holds the storage engine and serves the workers over a Unix socket;
+workers talk to it through RemoteDatabase, which has the same awaitable
+interface as AsyncDatabase.
+
+The protocol is length-prefixed pickle frames. A request is
+(request_id, method, args, kwargs) and a response is (request_id, ok, value),
+where value is the exception when ok is False. Clients pipeline requests and
+write everything queued during one event loop iteration in a single write;
+the owner executes every complete frame it reads in order and answers them
+in a single write. Because the owner applies writes one at a time and only
+replies once a write is applied, any request sent after a response arrives,
+from any worker, sees that write (read-your-writes across workers).
+
+Pickle is only safe between trusted processes: the socket is created with
+owner-only permissions and must live in a directory other users cannot write.
+"""
+
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import struct
+import time
+from collections.abc import Iterator as IteratorABC
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from .metrics import metrics, row_count
+from .profiler import record_db_time
+from .storage import FrozenRecord
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!I")
+_PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+# Pseudo-methods driving iter_batches streams held by the owner
+_ITER_OPEN = "__iter_open__"
+_ITER_NEXT = "__iter_next__"
+_ITER_CLOSE = "__iter_close__"
+
+def _frame(message: Any) -> bytes:
+    payload = pickle.dumps(message, protocol=_PROTOCOL)
+    return _HEADER.pack(len(payload)) + payload
+
+def _read_frames(buffer: bytearray) -> List[Any]:
+    """Pop every complete frame off the front of buffer."""
+    messages = []
+    offset = 0
+    size = len(buffer)
+    while size - offset >= _HEADER.size:
+        (length,) = _HEADER.unpack_from(buffer, offset)
+        end = offset + _HEADER.size + length
+        if end > size:
+            break
+        messages.append(pickle.loads(memoryview(buffer)[offset + _HEADER.size:end]))
+        offset = end
+    if offset:
+        del buffer[:offset]
+    return messages
+
+def _plain(value: Any) -> Any:
+    """
+    Turn FrozenRecords into plain dicts before pickling.
+
+    The worker gets its own copy anyway, so it has no use for a read-only
+    view, and plain dicts pickle and unpickle several times faster.
+    """
+    if type(value) is FrozenRecord:
+        return dict(value)
+    if type(value) is list:
+        return [dict(item) if type(item) is FrozenRecord else item for item in value]
+    return value
+
+def _error_frame(request_id: int, error: BaseException) -> bytes:
+    try:
+        return _frame((request_id, False, error))
+    except Exception:
+        # Not every exception survives pickling; keep the message at least
+        return _frame((request_id, False, RuntimeError(repr(error))))
+
+class DatabaseServer:
+    """Owner side: executes requests from worker connections against one engine."""
+
+    def __init__(self, engine: Any):
+        self._engine = engine
+        # A blocking engine runs on a single thread so requests keep their order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db") if engine.blocking else None
+        self._stream_ids = count(1)
+
+    def _execute(self, requests: List[Tuple[int, str, tuple, dict]],
+                 streams: Dict[int, Iterator[Any]]) -> bytes:
+        """Run a batch of requests in order and return all response frames."""
+        responses = []
+        for request_id, method, args, kwargs in requests:
+            try:
+                if method == _ITER_OPEN:
+                    stream_id = next(self._stream_ids)
+                    streams[stream_id] = self._engine.iter_batches(*args, **kwargs)
+                    value = stream_id
+                elif method == _ITER_NEXT:
+                    value = next(streams[args[0]], None)
+                    if value is None:
+                        del streams[args[0]]
+                elif method == _ITER_CLOSE:
+                    streams.pop(args[0], None)
+                    value = None
+                elif method.startswith("_"):
+                    raise AttributeError(method)
+                else:
+                    value = getattr(self._engine, method)(*args, **kwargs)
+                responses.append(_frame((request_id, True, _plain(value))))
+            except Exception as e:
+                responses.append(_error_frame(request_id, e))
+        return b"".join(responses)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        buffer = bytearray()
+        streams: Dict[int, Iterator[Any]] = {}
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                chunk = await reader.read(1 << 18)
+                if not chunk:
+                    return
+                buffer += chunk
+                requests = _read_frames(buffer)
+                if not requests:
+                    continue
+                if self._executor is None:
+                    responses = self._execute(requests, streams)
+                else:
+                    responses = await loop.run_in_executor(self._executor, self._execute, requests, streams)
+                writer.write(responses)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Worker went away, or the owner is shutting down
+            pass
+        finally:
+            streams.clear()
+            writer.close()
+
+async def _serve(socket_path: str, ready: Any) -> None:
+    from .database import create_engine, init_db
+
+    engine = create_engine(os.environ.get('DB_ENGINE', 'memory'))
+    init_db(engine)
+    persistence = getattr(engine, 'persistence', None)
+    if persistence is not None:
+        # As in main.create_app: keep collections from walking the restored data
+        # (this freezes the owner process's whole heap)
+        gc.freeze()
+        asyncio.get_running_loop().create_task(
+            persistence.snapshot_periodically(float(os.environ.get('DB_SNAPSHOT_INTERVAL', '300')))
+        )
+
+    server = DatabaseServer(engine)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    old_umask = os.umask(0o177)
+    try:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=socket_path)
+    finally:
+        os.umask(old_umask)
+    # Shut down cleanly on terminate() so the write-ahead log gets flushed
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    logger.info(f"Database owner process serving {socket_path}")
+    ready.set()
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        if persistence is not None:
+            persistence.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def serve_database(socket_path: str, ready: Any = None) -> None:
+    """Entry point of the owner process: serve the storage engine on socket_path."""
+    if ready is None:
+        ready = multiprocessing.Event()
+    try:
+        asyncio.run(_serve(socket_path, ready))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+def start_database_server(socket_path: str, timeout: float = 60) -> multiprocessing.Process:
+    """Start the owner process and wait until it accepts connections."""
+    # spawn: the owner must not inherit the parent's event loop or threads
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    process = context.Process(target=serve_database, args=(socket_path, ready),
+                              name="db-owner", daemon=True)
+    process.start()
+    if not ready.wait(timeout):
+        process.terminate()
+        raise RuntimeError(f"Database owner process did not start within {timeout}s")
+    return process
+
+class _Connection(asyncio.Protocol):
+    """Client side of one socket: pipelines requests and matches responses by id."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._transport: Optional[asyncio.Transport] = None
+        self._buffer = bytearray()
+        self._outgoing: List[bytes] = []
+        self._flush_scheduled = False
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._ids = count(1)
+        self.closed = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+        for request_id, ok, value in _read_frames(self._buffer):
+            waiter = self._waiters.pop(request_id, None)
+            if waiter is None or waiter.done():
+                continue
+            if ok:
+                waiter.set_result(value)
+            else:
+                waiter.set_exception(value)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.closed = True
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.set_exception(ConnectionError("Lost connection to the database owner process"))
+        self._waiters.clear()
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        if self._outgoing and not self.closed:
+            # Everything requested during this loop iteration goes out in one write
+            self._transport.write(b"".join(self._outgoing))
+        self._outgoing.clear()
+
+    def request(self, method: str, args: tuple, kwargs: dict) -> asyncio.Future:
+        if self.closed:
+            raise ConnectionError("Lost connection to the database owner process")
+        request_id = next(self._ids)
+        waiter = self._loop.create_future()
+        self._waiters[request_id] = waiter
+        self._outgoing.append(_frame((request_id, method, args, kwargs)))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_soon(self._flush)
+        return waiter
+
+class RemoteDatabase:
+    """
+    Awaitable client for the owner process, with the AsyncDatabase interface.
+
+    Each event loop (one per worker process) gets a single pipelined
+    connection, opened on first use. Calls are timed like AsyncDatabase's,
+    round trip to the owner included, for the db_* metrics and the
+    breakdown of slow requests.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._connection: Optional[_Connection] = None
+        self._connecting: Optional[asyncio.Future] = None
+
+    async def _connect(self) -> _Connection:
+        loop = asyncio.get_running_loop()
+        connection = self._connection
+        if connection is not None and not connection.closed and connection._loop is loop:
+            return connection
+        if self._connecting is not None and self._connecting.get_loop() is loop:
+            return await asyncio.shield(self._connecting)
+        self._connecting = loop.create_future()
+        try:
+            _, connection = await loop.create_unix_connection(lambda: _Connection(loop), self.socket_path)
+        except BaseException as e:
+            self._connecting.set_exception(e)
+            self._connecting.exception()  # Mark retrieved; the caller sees the error
+            self._connecting = None
+            raise
+        self._connection = connection
+        self._connecting.set_result(connection)
+        self._connecting = None
+        return connection
+
+    async def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        # Generators (e.g. ids for existing_ids) cannot be pickled; send their items
+        args = tuple(list(arg) if isinstance(arg, IteratorABC) else arg for arg in args)
+        connection = await self._connect()
+        return await connection.request(method, args, kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            start_ns = time.perf_counter_ns()
+            result = await self._call(name, *args, **kwargs)
+            duration_ns = time.perf_counter_ns() - start_ns
+            if args and isinstance(args[0], str):
+                metrics.db_operation(name, args[0], duration_ns, row_count(result))
+            record_db_time(duration_ns)
+            return result
+
+        call.__name__ = name
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, call)
+        return call
+
+    async def iter_batches(self, *args: Any, **kwargs: Any) -> AsyncIterator[List[Any]]:
+        """Async version of StorageBackend.iter_batches; the owner keeps the iterator between batches."""
+        stream_id = await self._call(_ITER_OPEN, *args, **kwargs)
+        finished = False
+        try:
+            while True:
+                start_ns = time.perf_counter_ns()
+                batch = await self._call(_ITER_NEXT, stream_id)
+                if batch is None:
+                    finished = True
+                    return
+                duration_ns = time.perf_counter_ns() - start_ns
+                metrics.db_operation('iter_batches', args[0] if args else kwargs['table'], duration_ns, len(batch))
+                record_db_time(duration_ns)
+                yield batch
+        finally:
+            if not finished and self._connection is not None and not self._connection.closed:
+                # Abandoned early (e.g. client disconnected): release it without waiting
+                self._connection.request(_ITER_CLOSE, (stream_id,), {}).add_done_callback(
+                    lambda waiter: waiter.cancelled() or waiter.exception()
+                )
@@ -0,0 +1,52 @@
+"""
+Single-flight execution of identical concurrent computations.
+
+While a computation for a key is running, callers asking for the same key
+wait for it instead of starting their own, and all of them get its result.
+The key is forgotten as soon as the computation finishes, so nothing is
+cached past that point.
+
+cached_response (response_cache.py) uses this for GET handlers, keyed like
+the response cache by route, normalized query and table versions. A write
+commits a new table version, so requests that arrive after it start a new
+flight rather than joining one that read the old data.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Optional[Any], bool]:
+        """
+        Run compute, or wait for the run already in flight for key.
+
+        Returns (result, coalesced). Callers that joined another run get None
+        as the result if that run raised or was cancelled, and should then
+        compute for themselves.
+        """
+        future = self._flights.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # Shielded so a cancelled caller does not cancel the run for the others
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        self.flights += 1
+        result = None
+        try:
+            result = await compute()
+            return result, False
+        finally:
+            del self._flights[key]
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, int]:
+        return {"flights": self.flights, "coalesced": self.coalesced, "in_flight": len(self._flights)}
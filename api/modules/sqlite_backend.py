@@ -0,0 +1,500 @@
+"""
+SQLite storage engine.
+
+Each table stores records as JSON documents next to an INTEGER PRIMARY KEY,
+so the engine is as schemaless as MockDatabase and returns exactly the same
+record shape. Secondary indexes are SQLite expression indexes over
+json_extract(). Triggers bump a per-table version row on every write, so the
+version is shared by every connection and process using the file. Full-text
+search uses an FTS5 table per indexed table, and per-group counters a stats
+table, both kept current by triggers too.
+The database runs in WAL mode so readers never wait on the
+writer, and each thread gets its own connection (SQLite connections cannot
+be shared across threads); AsyncDatabase runs calls on a bounded pool.
+"""
+
+import json
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from .database import StorageBackend, DuplicateKeyError, TableStats
+from .query import Condition, QueryError, describe_plan, parse_order_by, parse_where
+from .search import DEFAULT_SEARCH_LIMIT, query_tokens
+from .storage import FrozenRecord
+
+TABLES = ('users', 'todos')
+
+class SQLiteDatabase(StorageBackend):
+    """SQLite-backed storage engine with the MockDatabase interface."""
+
+    blocking = True
+    persistent = True
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        # Index name -> (table, field), used to report unique violations
+        self._unique_indexes: Dict[str, Tuple[str, str]] = {}
+        # Table -> {field: weight} of its full-text index
+        self._text_fields: Dict[str, Dict[str, int]] = {}
+        # Table -> (group field, flag field) of its counters
+        self._stats_fields: Dict[str, Tuple[str, str]] = {}
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        for table in TABLES:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)"
+            )
+            # A random start keeps versions (and the ETags built on them) from
+            # repeating if the database file is ever recreated
+            conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, ?)",
+                         (table, secrets.randbits(48)))
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} "
+                    f"BEGIN UPDATE table_versions SET version = version + 1 WHERE name = '{table}'; END"
+                )
+
+    def _conn(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: autocommit, with explicit BEGIN for multi-statement writes.
+            # cached_statements keeps every statement we issue prepared.
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block of writes as one transaction, taking the write lock up front."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _check_table(table: str) -> str:
+        # Table names are interpolated into SQL, so only known tables are allowed
+        if table not in TABLES:
+            raise KeyError(table)
+        return table
+
+    @staticmethod
+    def _field_expr(field: str) -> str:
+        if not field.isidentifier():
+            raise ValueError(f"Invalid field name: {field}")
+        return f"json_extract(data, '$.{field}')"
+
+    @staticmethod
+    def _record(row: Tuple[int, str]) -> FrozenRecord:
+        return FrozenRecord({'id': row[0], **json.loads(row[1])})
+
+    def _duplicate_key(self, table: str, error: sqlite3.IntegrityError, data: Dict[str, Any]) -> DuplicateKeyError:
+        message = str(error)
+        for index_name, (index_table, field) in self._unique_indexes.items():
+            if index_table == table and index_name in message:
+                return DuplicateKeyError(table, field, data.get(field))
+        raise error
+
+    def create_index(self, table: str, field: str, unique: bool = False, kind: str = 'hash') -> None:
+        """
+        Create a secondary index on a table field if it does not exist.
+        
+        Every kind maps to the same B-tree expression index, which serves
+        equality, range and prefix lookups alike.
+        """
+        self._check_table(table)
+        if kind not in ('hash', 'bitmap', 'sorted'):
+            raise ValueError(f"Unknown index kind: {kind}")
+        if unique and kind != 'hash':
+            raise ValueError("Only hash indexes can be unique")
+        index_name = f"{'ux' if unique else 'ix'}_{table}_{field}"
+        try:
+            self._conn().execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index_name} "
+                f"ON {table}({self._field_expr(field)})"
+            )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(table, field, None) from e
+        if unique:
+            self._unique_indexes[index_name] = (table, field)
+
+    def create_text_index(self, table: str, fields: Dict[str, int]) -> None:
+        """
+        Create the table's full-text index if it does not exist.
+        
+        It is an FTS5 table with a column per field, filled from the
+        existing rows on creation and kept current by triggers. FTS5's
+        unicode61 tokenizer and bm25 ranking stand in for search.py's.
+        """
+        self._check_table(table)
+        expressions = [self._field_expr(field) for field in fields]
+        columns = ", ".join(fields)
+        values = ", ".join(f"json_extract(new.data, '$.{field}')" for field in fields)
+        changed = " OR ".join(f"json_extract(old.data, '$.{field}') IS NOT json_extract(new.data, '$.{field}')"
+                              for field in fields)
+        search_table = f"{table}_search"
+        with self._write_transaction() as conn:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (search_table,)).fetchone()
+            if not exists:
+                conn.execute(f"CREATE VIRTUAL TABLE {search_table} USING fts5({columns})")
+                conn.execute(
+                    f"INSERT INTO {search_table} (rowid, {columns}) "
+                    f"SELECT id, {', '.join(expressions)} FROM {table}"
+                )
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} "
+                f"BEGIN INSERT INTO {search_table} (rowid, {columns}) VALUES (new.id, {values}); END"
+            )
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE ON {table} WHEN {changed} "
+                f"BEGIN DELETE FROM {search_table} WHERE rowid = old.id; "
+                f"INSERT INTO {search_table} (rowid, {columns}) VALUES (new.id, {values}); END"
+            )
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} "
+                f"BEGIN DELETE FROM {search_table} WHERE rowid = old.id; END"
+            )
+        self._text_fields[table] = dict(fields)
+
+    def create_stats(self, table: str, group_field: str, flag_field: str) -> None:
+        """
+        Start the table's counters if they do not exist.
+        
+        They live in a {table}_stats table with one row per group, keyed by
+        the group value as JSON, and a '*' row for the whole table (never
+        valid JSON, so it cannot collide). Triggers adjust the rows on every
+        write; deletes take SQLite's clock, with millisecond precision.
+        """
+        self._check_table(table)
+        self._field_expr(group_field)
+        self._field_expr(flag_field)
+        stats_table = f"{table}_stats"
+
+        def key(row: str) -> str:
+            return f"json_quote(json_extract({row}.data, '$.{group_field}'))"
+
+        def flagged(row: str) -> str:
+            return f"(ifnull(json_extract({row}.data, '$.{flag_field}'), 0) != 0)"
+
+        def activity(row: str) -> str:
+            return f"ifnull(json_extract({row}.data, '$.updated_at'), json_extract({row}.data, '$.created_at'))"
+
+        bump = ("ON CONFLICT (key) DO UPDATE SET count = count + excluded.count, "
+                "flagged = flagged + excluded.flagged, "
+                "last_activity = max(ifnull(last_activity, ''), ifnull(excluded.last_activity, ''))")
+        now = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+        with self._write_transaction() as conn:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (stats_table,)).fetchone()
+            if not exists:
+                conn.execute(f"CREATE TABLE {stats_table} (key TEXT PRIMARY KEY, count INTEGER NOT NULL, "
+                             "flagged INTEGER NOT NULL, last_activity TEXT)")
+                for grouping in (key(table), "'*'"):
+                    conn.execute(
+                        f"INSERT INTO {stats_table} (key, count, flagged, last_activity) "
+                        f"SELECT {grouping}, count(*), sum({flagged(table)}), max({activity(table)}) "
+                        f"FROM {table} GROUP BY 1"
+                    )
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {stats_table}_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {stats_table} (key, count, flagged, last_activity) "
+                f"VALUES ({key('new')}, 1, {flagged('new')}, {activity('new')}), "
+                f"('*', 1, {flagged('new')}, {activity('new')}) {bump}; END"
+            )
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {stats_table}_update AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {stats_table} (key, count, flagged, last_activity) "
+                f"VALUES ({key('old')}, -1, -{flagged('old')}, {activity('new')}), "
+                f"({key('new')}, 1, {flagged('new')}, {activity('new')}), "
+                f"('*', 0, {flagged('new')} - {flagged('old')}, {activity('new')}) {bump}; END"
+            )
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {stats_table}_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {stats_table} (key, count, flagged, last_activity) "
+                f"VALUES ({key('old')}, -1, -{flagged('old')}, {now}), "
+                f"('*', -1, -{flagged('old')}, {now}) {bump}; END"
+            )
+        self._stats_fields[table] = (group_field, flag_field)
+
+    def _insert(self, conn: sqlite3.Connection, table: str, data: Dict[str, Any], timestamp: str) -> FrozenRecord:
+        document = {key: value for key, value in data.items() if key != 'id'}
+        document['created_at'] = timestamp
+        try:
+            cursor = conn.execute(f"INSERT INTO {table} (data) VALUES (?)", (json.dumps(document),))
+        except sqlite3.IntegrityError as e:
+            raise self._duplicate_key(table, e, document) from e
+        return FrozenRecord({'id': cursor.lastrowid, **document})
+
+    def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new record into the specified table."""
+        self._check_table(table)
+        return self._insert(self._conn(), table, data, datetime.utcnow().isoformat()).copy()
+
+    def insert_many(self, table: str, rows: Iterable[Dict[str, Any]]) -> List[Union[Dict[str, Any], DuplicateKeyError]]:
+        """Insert several records in one transaction; a rejected row does not stop the rest."""
+        self._check_table(table)
+        timestamp = datetime.utcnow().isoformat()
+        results: List[Union[Dict[str, Any], DuplicateKeyError]] = []
+        with self._write_transaction() as conn:
+            for data in rows:
+                # A constraint failure only rolls back its own statement
+                try:
+                    results.append(self._insert(conn, table, data, timestamp).copy())
+                except DuplicateKeyError as e:
+                    results.append(e)
+        return results
+
+    def find_all(self, table: str) -> List[Dict[str, Any]]:
+        """Get all records from the specified table."""
+        return [record.copy() for record in self.view_all(table)]
+
+    def find_by_id(self, table: str, record_id: int) -> Optional[Dict[str, Any]]:
+        """Find a record by ID."""
+        record = self.view_by_id(table, record_id)
+        return record.copy() if record is not None else None
+
+    def find_by_field(self, table: str, field: str, value: Any) -> List[Dict[str, Any]]:
+        """Find records by a specific field value."""
+        return [record.copy() for record in self.view_by_field(table, field, value)]
+
+    def view_all(self, table: str) -> List[FrozenRecord]:
+        """Get read-only views of all records."""
+        self._check_table(table)
+        rows = self._conn().execute(f"SELECT id, data FROM {table} ORDER BY id")
+        return [self._record(row) for row in rows]
+
+    def view_by_id(self, table: str, record_id: int) -> Optional[FrozenRecord]:
+        """Get a read-only view of a record by ID."""
+        self._check_table(table)
+        row = self._conn().execute(f"SELECT id, data FROM {table} WHERE id = ?", (record_id,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    def view_by_field(self, table: str, field: str, value: Any) -> List[FrozenRecord]:
+        """Get read-only views of records matching a field value."""
+        self._check_table(table)
+        rows = self._conn().execute(
+            f"SELECT id, data FROM {table} WHERE {self._field_expr(field)} = ? ORDER BY id", (value,)
+        )
+        return [self._record(row) for row in rows]
+
+    def range_scan(self, table: str, after_id: int = 0, limit: int = 100) -> List[FrozenRecord]:
+        """Get read-only views of up to limit records with an id above after_id, in id order."""
+        self._check_table(table)
+        rows = self._conn().execute(
+            f"SELECT id, data FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+        )
+        return [self._record(row) for row in rows]
+
+    def iter_batches(self, table: str, batch_size: int = 500,
+                     field: Optional[str] = None, value: Any = None) -> Iterator[List[FrozenRecord]]:
+        """Yield read-only views of a table in id-ordered batches, one keyset query per batch."""
+        self._check_table(table)
+        if field is None:
+            sql, params = f"SELECT id, data FROM {table} WHERE id > ? ORDER BY id LIMIT ?", ()
+        else:
+            sql = f"SELECT id, data FROM {table} WHERE {self._field_expr(field)} = ? AND id > ? ORDER BY id LIMIT ?"
+            params = (value,)
+        after_id = 0
+        while True:
+            # Look the connection up per batch: batches may be pulled from different pool threads
+            batch = [self._record(row) for row in self._conn().execute(sql, (*params, after_id, batch_size))]
+            if not batch:
+                return
+            after_id = batch[-1]['id']
+            yield batch
+
+    def _condition_sql(self, condition: Condition) -> Tuple[str, List[Any]]:
+        expr = 'id' if condition.field == 'id' else self._field_expr(condition.field)
+        if condition.op == 'eq':
+            if condition.value is None:
+                return f"{expr} IS NULL", []
+            return f"{expr} = ?", [condition.value]
+        # Match query.Condition: range conditions only compare values of the same type
+        if isinstance(condition.value, str):
+            type_check = f"typeof({expr}) = 'text'"
+        else:
+            type_check = f"typeof({expr}) IN ('integer', 'real')"
+        if condition.op == 'prefix':
+            return f"{expr} >= ? AND {expr} < ? AND {type_check}", [condition.value, condition.value + '\U0010ffff']
+        operator = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}[condition.op]
+        return f"{expr} {operator} ? AND {type_check}", [condition.value]
+
+    def _query_sql(self, table: str, where: Optional[Dict[str, Any]], order_by: str,
+                   limit: Optional[int], after_id: int) -> Tuple[str, List[Any]]:
+        self._check_table(table)
+        clauses, params = ["id > ?"], [max(after_id, 0)]
+        for condition in parse_where(where):
+            clause, clause_params = self._condition_sql(condition)
+            clauses.append(clause)
+            params.extend(clause_params)
+        field, descending = parse_order_by(order_by)
+        direction = "DESC" if descending else "ASC"
+        if field == 'id':
+            order = f"id {direction}"
+        else:
+            # Missing values last, as in query.sort_records
+            expr = self._field_expr(field)
+            order = f"{expr} IS NULL, {expr} {direction}, id {direction}"
+        if limit is not None and limit < 0:
+            raise QueryError("limit must not be negative")
+        params.append(-1 if limit is None else limit)
+        return f"SELECT id, data FROM {table} WHERE {' AND '.join(clauses)} ORDER BY {order} LIMIT ?", params
+
+    def query(self, table: str, where: Optional[Dict[str, Any]] = None, order_by: str = 'id',
+              limit: Optional[int] = None, after_id: int = 0) -> List[FrozenRecord]:
+        """Get read-only views of the records matching every condition in where (see query.py)."""
+        sql, params = self._query_sql(table, where, order_by, limit, after_id)
+        return [self._record(row) for row in self._conn().execute(sql, params)]
+
+    def explain(self, table: str, where: Optional[Dict[str, Any]] = None, order_by: str = 'id',
+                limit: Optional[int] = None, after_id: int = 0) -> Dict[str, Any]:
+        """Run a query and describe SQLite's plan for it."""
+        sql, params = self._query_sql(table, where, order_by, limit, after_id)
+        conn = self._conn()
+        steps = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        plan = describe_plan(table, {"type": "sqlite", "sql": sql, "plan": steps}, [], [], order_by, limit, after_id)
+        plan["rows_returned"] = len(conn.execute(sql, params).fetchall())
+        return plan
+
+    def search(self, table: str, text: str, where: Optional[Dict[str, Any]] = None,
+               limit: int = DEFAULT_SEARCH_LIMIT) -> List[FrozenRecord]:
+        """Get read-only views of the best limit records matching a full-text query, best first."""
+        self._check_table(table)
+        fields = self._text_fields.get(table)
+        if fields is None:
+            raise QueryError(f"No text index on {table}")
+        if limit < 0:
+            raise QueryError("limit must not be negative")
+        tokens = query_tokens(text)
+        if not tokens:
+            return []
+        # Every token as a quoted prefix query, so it is never read as FTS5 syntax
+        match = " AND ".join(f'"{token}"*' for token in tokens)
+        clauses, params = [f"{table}_search MATCH ?"], [match]
+        for condition in parse_where(where):
+            clause, clause_params = self._condition_sql(condition)
+            clauses.append(clause)
+            params.extend(clause_params)
+        params.append(limit)
+        weights = ", ".join(str(float(weight)) for weight in fields.values())
+        rows = self._conn().execute(
+            f"SELECT {table}.id, {table}.data FROM {table}_search JOIN {table} ON {table}.id = {table}_search.rowid "
+            f"WHERE {' AND '.join(clauses)} ORDER BY bm25({table}_search, {weights}), {table}.id LIMIT ?", params
+        )
+        return [self._record(row) for row in rows]
+
+    def _stats_row(self, table: str, key: str) -> Dict[str, Any]:
+        if table not in self._stats_fields:
+            raise QueryError(f"No stats on {table}")
+        row = self._conn().execute(
+            f"SELECT count, flagged, last_activity FROM {table}_stats WHERE key = ?", (key,)
+        ).fetchone() or (0, 0, None)
+        return {"count": row[0], self._stats_fields[table][1]: row[1], "last_activity": row[2] or None}
+
+    def stats(self, table: str, group: Any = None, overall: bool = False) -> Dict[str, Any]:
+        """Get the counters of one group (or of the whole table) from the stats table."""
+        self._check_table(table)
+        return self._stats_row(table, '*' if overall else json.dumps(group, separators=(',', ':')))
+
+    def verify_stats(self, table: str) -> List[str]:
+        """Check the table's counters against a full scan; returns the mismatches found."""
+        self._check_table(table)
+        if table not in self._stats_fields:
+            raise QueryError(f"No stats on {table}")
+        group_field, flag_field = self._stats_fields[table]
+        counters = TableStats(group_field, flag_field)
+        groups = self._conn().execute(f"SELECT key, count, flagged, last_activity FROM {table}_stats").fetchall()
+        for key, count, flagged, last_activity in groups:
+            counters.set(None if key == '*' else json.loads(key), count, flagged, last_activity or None,
+                         overall=key == '*')
+        return counters.verify(self.view_all(table))
+
+    def existing_ids(self, table: str, record_ids: Iterable[int]) -> Set[int]:
+        """Get the subset of the given ids that exist in the table."""
+        self._check_table(table)
+        ids = list(set(record_ids))
+        if not ids:
+            return set()
+        rows = self._conn().execute(
+            f"SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+        )
+        return {row[0] for row in rows}
+
+    def count(self, table: str) -> int:
+        """Get the number of records in a table."""
+        self._check_table(table)
+        return self._conn().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def version(self, table: str) -> int:
+        """Get a number that changes whenever the table is written to."""
+        self._check_table(table)
+        return self._conn().execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()[0]
+
+    def _update(self, conn: sqlite3.Connection, table: str, record_id: int,
+                updates: Dict[str, Any], timestamp: str) -> Optional[FrozenRecord]:
+        row = conn.execute(f"SELECT id, data FROM {table} WHERE id = ?", (record_id,)).fetchone()
+        if row is None:
+            return None
+        document = json.loads(row[1])
+        document.update({key: value for key, value in updates.items() if key != 'id'})  # Don't allow ID updates
+        document['updated_at'] = timestamp
+        try:
+            conn.execute(f"UPDATE {table} SET data = ? WHERE id = ?", (json.dumps(document), record_id))
+        except sqlite3.IntegrityError as e:
+            raise self._duplicate_key(table, e, document) from e
+        return FrozenRecord({'id': record_id, **document})
+
+    def update_by_id(self, table: str, record_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update a record by ID."""
+        result = self.update_many(table, [(record_id, updates)])[0]
+        if isinstance(result, DuplicateKeyError):
+            raise result
+        return result
+
+    def update_many(self, table: str, updates: Iterable[Tuple[int, Dict[str, Any]]]) -> List[Union[Dict[str, Any], DuplicateKeyError, None]]:
+        """Apply several (record_id, updates) pairs in one transaction."""
+        self._check_table(table)
+        timestamp = datetime.utcnow().isoformat()
+        results: List[Union[Dict[str, Any], DuplicateKeyError, None]] = []
+        # The write lock is held from the read, so read-modify-write is atomic
+        with self._write_transaction() as conn:
+            for record_id, changes in updates:
+                try:
+                    record = self._update(conn, table, record_id, changes, timestamp)
+                    results.append(record.copy() if record is not None else None)
+                except DuplicateKeyError as e:
+                    results.append(e)
+        return results
+
+    def delete_by_id(self, table: str, record_id: int) -> bool:
+        """Delete a record by ID."""
+        self._check_table(table)
+        return self._conn().execute(f"DELETE FROM {table} WHERE id = ?", (record_id,)).rowcount > 0
+
+    def delete_many(self, table: str, record_ids: Iterable[int]) -> List[bool]:
+        """Delete several records by ID in one transaction, returning whether each one existed."""
+        self._check_table(table)
+        with self._write_transaction() as conn:
+            return [conn.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,)).rowcount > 0
+                    for record_id in record_ids]
+
+    def clear_table(self, table: str) -> None:
+        """Clear all records from a table and restart its ids, keeping its indexes."""
+        self._check_table(table)
+        with self._write_transaction() as conn:
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+            if table in self._stats_fields:
+                conn.execute(f"DELETE FROM {table}_stats")
@@ -0,0 +1,285 @@
+"""
+Record and table storage used by the mock database.
+
+Tables are mappings from record id to record. The default layout is a plain
+dict of FrozenRecord objects; CompactTable stores the same data column by
+column in typed arrays to cut per-row memory and GC pressure.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+class FrozenRecord(dict):
+    """
+    Read-only dict used for stored records.
+
+    Records are never changed in place: updates build a new FrozenRecord and
+    swap it into the table (copy-on-write), so readers can be handed the stored
+    object itself instead of a defensive copy. Being a dict subclass, it is
+    serialized directly by the JSON encoder; call .copy() for a mutable dict.
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args: Any, **kwargs: Any) -> None:
+        raise TypeError("Records are read-only; use .copy() to get a mutable dict")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = __ior__ = _readonly
+
+    def __reduce__(self) -> Any:
+        # Pickle rebuilds dict subclasses through __setitem__, which is disabled
+        return (FrozenRecord, (dict(self),))
+
+# Marks a field that is absent from a row (as opposed to present with None)
+MISSING = object()
+
+_INT_MISSING = -2 ** 63
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+class _ObjectColumn:
+    """Column of arbitrary Python values; strings are interned."""
+
+    def __init__(self, values: Optional[List[Any]] = None):
+        self._values: List[Any] = values if values is not None else []
+
+    @staticmethod
+    def accepts(value: Any) -> bool:
+        return True
+
+    @staticmethod
+    def _encode(value: Any) -> Any:
+        return sys.intern(value) if type(value) is str else value
+
+    def get(self, pos: int) -> Any:
+        return self._values[pos]
+
+    def set(self, pos: int, value: Any) -> None:
+        self._values[pos] = self._encode(value)
+
+    def insert(self, pos: int, value: Any) -> None:
+        self._values.insert(pos, self._encode(value))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+class _IntColumn:
+    """Column of 64-bit integers stored in an array('q')."""
+
+    def __init__(self):
+        self._values = array('q')
+
+    @staticmethod
+    def accepts(value: Any) -> bool:
+        return value is MISSING or (type(value) is int and _INT_MISSING < value < 2 ** 63)
+
+    def get(self, pos: int) -> Any:
+        value = self._values[pos]
+        return MISSING if value == _INT_MISSING else value
+
+    def set(self, pos: int, value: Any) -> None:
+        self._values[pos] = _INT_MISSING if value is MISSING else value
+
+    def insert(self, pos: int, value: Any) -> None:
+        self._values.insert(pos, _INT_MISSING if value is MISSING else value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+class _BoolColumn:
+    """Column of booleans stored one byte per row."""
+
+    _DECODE = (False, True, MISSING)
+
+    def __init__(self):
+        self._values = bytearray()
+
+    @staticmethod
+    def accepts(value: Any) -> bool:
+        return value is MISSING or type(value) is bool
+
+    def get(self, pos: int) -> Any:
+        return self._DECODE[self._values[pos]]
+
+    def set(self, pos: int, value: Any) -> None:
+        self._values[pos] = 2 if value is MISSING else int(value)
+
+    def insert(self, pos: int, value: Any) -> None:
+        self._values.insert(pos, 2 if value is MISSING else int(value))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+class _TimestampColumn:
+    """Column of naive ISO timestamps stored as epoch microseconds."""
+
+    def __init__(self):
+        self._values = array('q')
+
+    @staticmethod
+    def accepts(value: Any) -> bool:
+        if value is MISSING:
+            return True
+        if type(value) is not str:
+            return False
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return False
+        # Only take values that round-trip to exactly the same string
+        return parsed.tzinfo is None and parsed.isoformat() == value
+
+    def _encode(self, value: Any) -> int:
+        if value is MISSING:
+            return _INT_MISSING
+        return (datetime.fromisoformat(value) - _EPOCH) // _MICROSECOND
+
+    def get(self, pos: int) -> Any:
+        value = self._values[pos]
+        if value == _INT_MISSING:
+            return MISSING
+        return (_EPOCH + value * _MICROSECOND).isoformat()
+
+    def set(self, pos: int, value: Any) -> None:
+        self._values[pos] = self._encode(value)
+
+    def insert(self, pos: int, value: Any) -> None:
+        self._values.insert(pos, self._encode(value))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+def _column_for(field: str, value: Any):
+    """Pick the most compact column type able to hold the first value seen."""
+    if type(value) is bool:
+        return _BoolColumn()
+    if _IntColumn.accepts(value) and value is not MISSING:
+        return _IntColumn()
+    if field.endswith('_at') and value is not MISSING and _TimestampColumn.accepts(value):
+        return _TimestampColumn()
+    return _ObjectColumn()
+
+class CompactTable(MutableMapping):
+    """
+    Columnar id -> record mapping.
+
+    Ids live in an array('q') kept in ascending order, with a byte per row
+    marking deleted rows. Because ids are handed out sequentially, a record's
+    row is normally found arithmetically from its id in O(1); a binary search
+    is the fallback. Every other field gets its own typed column, and a column
+    falls back to plain Python objects the first time it sees a value that
+    does not fit. Reads return FrozenRecord objects built on demand, so the
+    dict shape is identical to the default dict storage.
+    """
+
+    def __init__(self):
+        self._ids = array('q')
+        self._alive = bytearray()
+        self._columns: Dict[str, Any] = {}
+        self._count = 0
+
+    def _find(self, record_id: int) -> int:
+        """Get the row of a record id (live or deleted), or -1."""
+        ids = self._ids
+        count = len(ids)
+        if not count:
+            return -1
+        pos = record_id - ids[0]
+        if 0 <= pos < count and ids[pos] == record_id:
+            return pos
+        pos = bisect_left(ids, record_id)
+        if pos < count and ids[pos] == record_id:
+            return pos
+        return -1
+
+    def _row(self, pos: int) -> FrozenRecord:
+        record = {'id': self._ids[pos]}
+        for field, column in self._columns.items():
+            value = column.get(pos)
+            if value is not MISSING:
+                record[field] = value
+        return FrozenRecord(record)
+
+    def _write_value(self, field: str, pos: int, value: Any, insert: bool) -> None:
+        column = self._columns.get(field)
+        if column is None:
+            column = _column_for(field, value)
+            for _ in range(len(self._ids) - (1 if insert else 0)):
+                column.insert(len(column), MISSING)
+            self._columns[field] = column
+        elif not column.accepts(value):
+            # Widen to an object column, keeping existing values
+            column = _ObjectColumn([column.get(i) for i in range(len(column))])
+            self._columns[field] = column
+        if insert:
+            column.insert(pos, value)
+        else:
+            column.set(pos, value)
+
+    def __getitem__(self, record_id: int) -> FrozenRecord:
+        pos = self._find(record_id)
+        if pos < 0 or not self._alive[pos]:
+            raise KeyError(record_id)
+        return self._row(pos)
+
+    def get(self, record_id: int, default: Any = None) -> Any:
+        pos = self._find(record_id)
+        if pos < 0 or not self._alive[pos]:
+            return default
+        return self._row(pos)
+
+    def __setitem__(self, record_id: int, record: Dict[str, Any]) -> None:
+        pos = self._find(record_id)
+        insert = pos < 0
+        if insert:
+            pos = bisect_left(self._ids, record_id)
+            self._ids.insert(pos, record_id)
+            self._alive.insert(pos, 1)
+            self._count += 1
+        elif not self._alive[pos]:
+            self._alive[pos] = 1
+            self._count += 1
+        for field, value in record.items():
+            if field != 'id':
+                self._write_value(field, pos, value, insert)
+        for field in self._columns.keys() - record.keys():
+            if insert:
+                self._columns[field].insert(pos, MISSING)
+            else:
+                self._write_value(field, pos, MISSING, False)
+
+    def __delitem__(self, record_id: int) -> None:
+        pos = self._find(record_id)
+        if pos < 0 or not self._alive[pos]:
+            raise KeyError(record_id)
+        self._alive[pos] = 0
+        self._count -= 1
+        # Drop references held by the dead row; its id stays as a tombstone
+        for field in self._columns:
+            self._write_value(field, pos, MISSING, False)
+
+    def __iter__(self) -> Iterator[int]:
+        alive = self._alive
+        return (record_id for pos, record_id in enumerate(self._ids) if alive[pos])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, record_id: object) -> bool:
+        if type(record_id) is not int:
+            return False
+        pos = self._find(record_id)
+        return pos >= 0 and bool(self._alive[pos])
+
+    def clear(self) -> None:
+        self.__init__()
+
+TABLE_STORAGE = {
+    'dict': dict,
+    'compact': CompactTable,
+}
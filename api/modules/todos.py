@@ -5,27 +5,47 @@ Todo management API endpoints.
 from sanic import Blueprint
 from sanic.request import Request
 from sanic.response import json, JSONResponse
-from pydantic import BaseModel, ValidationError
-from typing import List, Optional
-from .database import get_db
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from typing_extensions import NotRequired, Required, TypedDict
+from .database import TextIndexBuilding, get_db
+from .query import QueryError
+from .search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from .bulk import bulk_delete, bulk_item, bulk_error, bulk_response, too_many_items, TooManyItems, validate_items
+from .pagination import get_page_args, paginate, PaginationError
+from .streaming import wants_stream, stream_ndjson, query_batches, STREAM_BATCH_SIZE
+from .response_cache import cached_response
+from .conditional import etag_headers, if_match, if_none_match, not_modified, precondition_failed, record_etag
+from .validation import BodyValidationError, LazyTypeAdapter, validation_error
 
-# Create blueprint
+# Create blueprint. Routes name their error_format, which Sanic would otherwise
+# work out by parsing each handler's source on every cold start
 todos_bp = Blueprint("todos")
 
-# Pydantic models for request validation
-class TodoCreate(BaseModel):
+# Request body schemas; validating them yields plain dicts ready for the database
+class TodoCreate(TypedDict):
     title: str
     description: str
     user_id: int
-    completed: Optional[bool] = False
+    # Defaults to False
+    completed: NotRequired[Optional[bool]]
 
-class TodoUpdate(BaseModel):
-    title: Optional[str] = None
-    description: Optional[str] = None
-    completed: Optional[bool] = None
-    user_id: Optional[int] = None
+class TodoUpdate(TypedDict, total=False):
+    title: Optional[str]
+    description: Optional[str]
+    completed: Optional[bool]
+    user_id: Optional[int]
 
-class TodoResponse(BaseModel):
+class TodoBulkUpdate(TodoUpdate):
+    id: Required[int]
+
+# Validators built on first use; single bodies are validated from the raw bytes in a single pass
+todo_create = LazyTypeAdapter(TodoCreate)
+todo_update = LazyTypeAdapter(TodoUpdate)
+todo_create_list = LazyTypeAdapter(List[TodoCreate])
+todo_bulk_update_list = LazyTypeAdapter(List[TodoBulkUpdate])
+
+class TodoResponse(TypedDict):
     id: int
     title: str
     description: str
@@ -33,114 +53,204 @@ class TodoResponse(BaseModel):
     user_id: int
     created_at: str
 
-@todos_bp.get("/todos")
+@todos_bp.get("/todos", error_format="json")
+@cached_response('todos')
 async def get_todos(request: Request) -> JSONResponse:
-    """Get all todos."""
+    """
+    Get all todos, optionally filtered, one keyset page at a time or as an NDJSON stream.
+    
+    Filters are pushed down to the storage engine's query planner; pass
+    explain=1 to get the chosen plan instead of the todos.
+    """
     try:
         db = get_db()
-        todos = db.find_all('todos')
+        try:
+            page = get_page_args(request)
+        except PaginationError as e:
+            return json({"error": str(e)}, status=400)
+        
+        where = {}
         
         # Optional filtering by user_id
         user_id = request.args.get('user_id')
         if user_id:
             try:
-                user_id = int(user_id)
-                todos = [todo for todo in todos if todo['user_id'] == user_id]
+                where['user_id'] = int(user_id)
             except ValueError:
                 return json({"error": "Invalid user_id parameter"}, status=400)
         
         # Optional filtering by completion status
         completed = request.args.get('completed')
         if completed is not None:
-            completed_bool = completed.lower() in ['true', '1', 'yes']
-            todos = [todo for todo in todos if todo['completed'] == completed_bool]
+            where['completed'] = completed.lower() in ['true', '1', 'yes']
         
-        return json(todos)
+        # Optional filtering by title prefix
+        title_prefix = request.args.get('title_prefix')
+        if title_prefix:
+            where['title__prefix'] = title_prefix
+        
+        # Optional creation time window: created_after <= created_at < created_before
+        for param, key in (('created_after', 'created_at__gte'), ('created_before', 'created_at__lt')):
+            value = request.args.get(param)
+            if value:
+                try:
+                    where[key] = datetime.fromisoformat(value).isoformat()
+                except ValueError:
+                    return json({"error": f"Invalid {param} parameter"}, status=400)
+        
+        after_id, limit = page or (0, None)
+        try:
+            if request.args.get('explain', '').lower() in ('1', 'true', 'yes'):
+                return json(await db.explain('todos', where, limit=limit and limit + 1, after_id=after_id))
+            
+            if wants_stream(request):
+                if not where:
+                    return await stream_ndjson(request, db.iter_batches('todos', STREAM_BATCH_SIZE))
+                return await stream_ndjson(request, query_batches(db, 'todos', where))
+            
+            if page:
+                return json(paginate(await db.query('todos', where, limit=limit + 1, after_id=after_id), limit))
+            
+            return json(await db.query('todos', where))
+        except QueryError as e:
+            return json({"error": str(e)}, status=400)
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@todos_bp.get("/todos/<todo_id:int>")
+@todos_bp.get("/todos/search", error_format="json")
+@cached_response('todos')
+async def search_todos(request: Request) -> JSONResponse:
+    """
+    Full-text search over todo titles and descriptions, best matches first.
+    
+    Every word of q must start a word of the todo. Optionally restricted to
+    one user's todos; returns at most limit todos.
+    """
+    try:
+        text = request.args.get('q', '').strip()
+        if not text:
+            return json({"error": "q parameter is required"}, status=400)
+        
+        where = {}
+        user_id = request.args.get('user_id')
+        if user_id:
+            try:
+                where['user_id'] = int(user_id)
+            except ValueError:
+                return json({"error": "Invalid user_id parameter"}, status=400)
+        
+        try:
+            limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            return json({"error": "Invalid limit parameter"}, status=400)
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            return json({"error": f"limit must be between 1 and {MAX_SEARCH_LIMIT}"}, status=400)
+        
+        db = get_db()
+        try:
+            return json(await db.search('todos', text, where, limit))
+        except QueryError as e:
+            return json({"error": str(e)}, status=400)
+        except TextIndexBuilding as e:
+            return json({"error": str(e)}, status=503, headers={"Retry-After": "1"})
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@todos_bp.get("/todos/<todo_id:int>", error_format="json")
+@cached_response('todos', record_etag=True)
 async def get_todo(request: Request, todo_id: int) -> JSONResponse:
     """Get a specific todo by ID."""
     try:
         db = get_db()
-        todo = db.find_by_id('todos', todo_id)
+        todo = await db.view_by_id('todos', todo_id)
         
         if not todo:
             return json({"error": "Todo not found"}, status=404)
         
-        return json(todo)
+        # Answer a revalidation before serializing anything
+        etag = record_etag(todo)
+        if if_none_match(request, etag):
+            return not_modified(etag)
+        
+        return json(todo, headers=etag_headers(etag))
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@todos_bp.post("/todos")
+@todos_bp.post("/todos", error_format="json")
 async def create_todo(request: Request) -> JSONResponse:
     """Create a new todo."""
     try:
         # Validate request data
         try:
-            todo_data = TodoCreate(**request.json)
-        except ValidationError as e:
-            return json({"error": "Validation error", "details": e.errors()}, status=400)
+            todo_data = todo_create.validate_json(request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
+        todo_data.setdefault('completed', False)
         
         db = get_db()
         
         # Check if user exists
-        user = db.find_by_id('users', todo_data.user_id)
+        user = await db.view_by_id('users', todo_data['user_id'])
         if not user:
             return json({"error": "User not found"}, status=400)
         
         # Create todo
-        new_todo = db.insert('todos', todo_data.model_dump())
+        new_todo = await db.insert('todos', todo_data)
         
         return json(new_todo, status=201)
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@todos_bp.put("/todos/<todo_id:int>")
+@todos_bp.put("/todos/<todo_id:int>", error_format="json")
 async def update_todo(request: Request, todo_id: int) -> JSONResponse:
     """Update a todo."""
     try:
         # Validate request data
         try:
-            todo_data = TodoUpdate(**request.json)
-        except ValidationError as e:
-            return json({"error": "Validation error", "details": e.errors()}, status=400)
+            todo_data = todo_update.validate_json(request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
         
         db = get_db()
         
         # Check if todo exists
-        existing_todo = db.find_by_id('todos', todo_id)
+        existing_todo = await db.view_by_id('todos', todo_id)
         if not existing_todo:
             return json({"error": "Todo not found"}, status=404)
+        etag = record_etag(existing_todo)
+        if not if_match(request, etag):
+            return precondition_failed(etag)
         
         # Check if user exists (if user_id is being updated)
-        if todo_data.user_id:
-            user = db.find_by_id('users', todo_data.user_id)
+        if todo_data.get('user_id') is not None:
+            user = await db.view_by_id('users', todo_data['user_id'])
             if not user:
                 return json({"error": "User not found"}, status=400)
         
         # Update todo
-        updates = {k: v for k, v in todo_data.model_dump().items() if v is not None}
-        updated_todo = db.update_by_id('todos', todo_id, updates)
+        updates = {k: v for k, v in todo_data.items() if v is not None}
+        updated_todo = await db.update_by_id('todos', todo_id, updates)
         
-        return json(updated_todo)
+        return json(updated_todo, headers=etag_headers(record_etag(updated_todo)))
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@todos_bp.delete("/todos/<todo_id:int>")
+@todos_bp.delete("/todos/<todo_id:int>", error_format="json")
 async def delete_todo(request: Request, todo_id: int) -> JSONResponse:
     """Delete a todo."""
     try:
         db = get_db()
         
         # Check if todo exists
-        existing_todo = db.find_by_id('todos', todo_id)
+        existing_todo = await db.view_by_id('todos', todo_id)
         if not existing_todo:
             return json({"error": "Todo not found"}, status=404)
+        etag = record_etag(existing_todo)
+        if not if_match(request, etag):
+            return precondition_failed(etag)
         
         # Delete todo
-        success = db.delete_by_id('todos', todo_id)
+        success = await db.delete_by_id('todos', todo_id)
         
         if success:
             return json({"message": "Todo deleted successfully"})
@@ -149,20 +259,163 @@ async def delete_todo(request: Request, todo_id: int) -> JSONResponse:
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@todos_bp.get("/users/<user_id:int>/todos")
+@todos_bp.post("/todos/bulk", error_format="json")
+async def create_todos_bulk(request: Request) -> JSONResponse:
+    """Create many todos in one request, reporting the outcome per item."""
+    try:
+        # Validate request data
+        try:
+            todos_data = validate_items(todo_create_list, request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
+        except TooManyItems as e:
+            return too_many_items(e.count)
+        
+        db = get_db()
+        
+        # Check every referenced user in one pass
+        known_users = await db.existing_ids('users', (todo['user_id'] for todo in todos_data))
+        
+        results = [None] * len(todos_data)
+        rows, positions = [], []
+        for i, todo in enumerate(todos_data):
+            if todo['user_id'] in known_users:
+                todo.setdefault('completed', False)
+                rows.append(todo)
+                positions.append(i)
+            else:
+                results[i] = bulk_error(i, 400, "User not found")
+        
+        # Create todos
+        for i, new_todo in zip(positions, await db.insert_many('todos', rows)):
+            results[i] = bulk_item(i, 201, new_todo)
+        
+        return bulk_response(results)
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@todos_bp.put("/todos/bulk", error_format="json")
+async def update_todos_bulk(request: Request) -> JSONResponse:
+    """Update many todos in one request, reporting the outcome per item."""
+    try:
+        # Validate request data
+        try:
+            todos_data = validate_items(todo_bulk_update_list, request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
+        except TooManyItems as e:
+            return too_many_items(e.count)
+        
+        db = get_db()
+        
+        # Check every referenced user in one pass
+        known_users = await db.existing_ids('users', (todo['user_id'] for todo in todos_data if todo.get('user_id') is not None))
+        
+        results = [None] * len(todos_data)
+        updates, positions = [], []
+        for i, todo in enumerate(todos_data):
+            if todo.get('user_id') is not None and todo['user_id'] not in known_users:
+                results[i] = bulk_error(i, 400, "User not found")
+                continue
+            changes = {k: v for k, v in todo.items() if k != 'id' and v is not None}
+            updates.append((todo['id'], changes))
+            positions.append(i)
+        
+        # Update todos
+        for i, updated_todo in zip(positions, await db.update_many('todos', updates)):
+            if updated_todo is None:
+                results[i] = bulk_error(i, 404, "Todo not found")
+            else:
+                results[i] = bulk_item(i, 200, updated_todo)
+        
+        return bulk_response(results)
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@todos_bp.delete("/todos/bulk", ignore_body=False, error_format="json")
+async def delete_todos_bulk(request: Request) -> JSONResponse:
+    """Delete many todos in one request, reporting the outcome per item."""
+    try:
+        # Validate request data
+        try:
+            delete_data = validate_items(bulk_delete, request.body, 'ids')
+        except BodyValidationError as e:
+            return validation_error(e)
+        except TooManyItems as e:
+            return too_many_items(e.count)
+        
+        db = get_db()
+        deleted = await db.delete_many('todos', delete_data['ids'])
+        
+        return bulk_response([
+            bulk_item(i, 200, {"id": todo_id}) if success else bulk_error(i, 404, "Todo not found")
+            for i, (todo_id, success) in enumerate(zip(delete_data['ids'], deleted))
+        ])
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@todos_bp.get("/users/<user_id:int>/todos", error_format="json")
+@cached_response('users', 'todos')
 async def get_user_todos(request: Request, user_id: int) -> JSONResponse:
-    """Get all todos for a specific user."""
+    """Get all todos for a specific user, optionally as an NDJSON stream."""
     try:
         db = get_db()
         
         # Check if user exists
-        user = db.find_by_id('users', user_id)
+        user = await db.view_by_id('users', user_id)
         if not user:
             return json({"error": "User not found"}, status=404)
         
+        if wants_stream(request):
+            return await stream_ndjson(request, db.iter_batches('todos', STREAM_BATCH_SIZE, 'user_id', user_id))
+        
         # Get user's todos
-        todos = db.find_by_field('todos', 'user_id', user_id)
+        todos = await db.view_by_field('todos', 'user_id', user_id)
         
         return json(todos)
     except Exception as e:
         return json({"error": str(e)}, status=500)
+
+def todo_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape engine counters (see StorageBackend.stats) for a response."""
+    return {
+        "todos": stats["count"],
+        "completed": stats["completed"],
+        "open": stats["count"] - stats["completed"],
+        "last_activity": stats["last_activity"]
+    }
+
+@todos_bp.get("/users/<user_id:int>/stats", error_format="json")
+@cached_response('users', 'todos')
+async def get_user_stats(request: Request, user_id: int) -> JSONResponse:
+    """Todo counts and last todo activity of a user, read from counters kept current on every write."""
+    try:
+        db = get_db()
+        
+        # Check if user exists
+        user = await db.view_by_id('users', user_id)
+        if not user:
+            return json({"error": "User not found"}, status=404)
+        
+        return json({"user_id": user_id, **todo_stats(await db.stats('todos', user_id))})
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@todos_bp.get("/stats", error_format="json")
+@cached_response('users', 'todos')
+async def get_stats(request: Request) -> JSONResponse:
+    """
+    Todo counts and last todo activity across all users.
+    
+    Pass verify=1 to also check the counters against a full scan of the
+    todos, which costs time in proportion to their number.
+    """
+    try:
+        db = get_db()
+        result = {"users": await db.count('users'), **todo_stats(await db.stats('todos', overall=True))}
+        if request.args.get('verify', '').lower() in ('1', 'true', 'yes'):
+            problems = await db.verify_stats('todos')
+            result["verification"] = {"consistent": not problems, "problems": problems}
+        return json(result)
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
@@ -5,138 +5,156 @@ User management API endpoints.
 from sanic import Blueprint
 from sanic.request import Request
 from sanic.response import json, JSONResponse
-from pydantic import BaseModel, ValidationError, field_validator
 from typing import List, Optional
-import re
-from .database import get_db
+from typing_extensions import Required, TypedDict
+from .database import get_db, DuplicateKeyError
+from .bulk import bulk_delete, bulk_item, bulk_error, bulk_response, too_many_items, TooManyItems, validate_items
+from .pagination import get_page_args, paginate, PaginationError
+from .streaming import wants_stream, stream_ndjson, STREAM_BATCH_SIZE
+from .response_cache import cached_response
+from .conditional import etag_headers, if_match, if_none_match, not_modified, precondition_failed, record_etag
+from .validation import BodyValidationError, Email, LazyTypeAdapter, validation_error
 
-# Create blueprint
+# Create blueprint. Routes name their error_format, which Sanic would otherwise
+# work out by parsing each handler's source on every cold start
 users_bp = Blueprint("users")
 
-# Pydantic models for request validation
-class UserCreate(BaseModel):
+# Request body schemas; validating them yields plain dicts ready for the database
+class UserCreate(TypedDict):
     name: str
-    email: str
-    
-    @field_validator('email')
-    @classmethod
-    def validate_email(cls, v):
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(pattern, v):
-            raise ValueError('Invalid email format')
-        return v
+    email: Email
+
+class UserUpdate(TypedDict, total=False):
+    name: Optional[str]
+    email: Optional[Email]
+
+class UserBulkUpdate(UserUpdate):
+    id: Required[int]
 
-class UserUpdate(BaseModel):
-    name: Optional[str] = None
-    email: Optional[str] = None
-    
-    @field_validator('email')
-    @classmethod
-    def validate_email(cls, v):
-        if v is not None:
-            pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if not re.match(pattern, v):
-                raise ValueError('Invalid email format')
-        return v
+# Validators built on first use; single bodies are validated from the raw bytes in a single pass
+user_create = LazyTypeAdapter(UserCreate)
+user_update = LazyTypeAdapter(UserUpdate)
+user_create_list = LazyTypeAdapter(List[UserCreate])
+user_bulk_update_list = LazyTypeAdapter(List[UserBulkUpdate])
 
-class UserResponse(BaseModel):
+class UserResponse(TypedDict):
     id: int
     name: str
     email: str
     created_at: str
 
-@users_bp.get("/users")
+@users_bp.get("/users", error_format="json")
+@cached_response('users')
 async def get_users(request: Request) -> JSONResponse:
-    """Get all users."""
+    """Get all users, optionally one keyset page at a time or as an NDJSON stream."""
     try:
         db = get_db()
-        users = db.find_all('users')
+        if wants_stream(request):
+            return await stream_ndjson(request, db.iter_batches('users', STREAM_BATCH_SIZE))
+        
+        try:
+            page = get_page_args(request)
+        except PaginationError as e:
+            return json({"error": str(e)}, status=400)
+        
+        if page:
+            after_id, limit = page
+            return json(paginate(await db.range_scan('users', after_id, limit + 1), limit))
+        
+        users = await db.view_all('users')
         return json(users)
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@users_bp.get("/users/<user_id:int>")
+@users_bp.get("/users/<user_id:int>", error_format="json")
+@cached_response('users', record_etag=True)
 async def get_user(request: Request, user_id: int) -> JSONResponse:
     """Get a specific user by ID."""
     try:
         db = get_db()
-        user = db.find_by_id('users', user_id)
+        user = await db.view_by_id('users', user_id)
         
         if not user:
             return json({"error": "User not found"}, status=404)
         
-        return json(user)
+        # Answer a revalidation before serializing anything
+        etag = record_etag(user)
+        if if_none_match(request, etag):
+            return not_modified(etag)
+        
+        return json(user, headers=etag_headers(etag))
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@users_bp.post("/users")
+@users_bp.post("/users", error_format="json")
 async def create_user(request: Request) -> JSONResponse:
     """Create a new user."""
     try:
         # Validate request data
         try:
-            user_data = UserCreate(**request.json)
-        except ValidationError as e:
-            return json({"error": "Validation error", "details": e.errors()}, status=400)
+            user_data = user_create.validate_json(request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
         
         db = get_db()
         
-        # Check if email already exists
-        existing_users = db.find_by_field('users', 'email', user_data.email)
-        if existing_users:
+        # Create user (the unique email index rejects duplicates)
+        try:
+            new_user = await db.insert('users', user_data)
+        except DuplicateKeyError:
             return json({"error": "Email already exists"}, status=400)
         
-        # Create user
-        new_user = db.insert('users', user_data.model_dump())
-        
         return json(new_user, status=201)
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@users_bp.put("/users/<user_id:int>")
+@users_bp.put("/users/<user_id:int>", error_format="json")
 async def update_user(request: Request, user_id: int) -> JSONResponse:
     """Update a user."""
     try:
         # Validate request data
         try:
-            user_data = UserUpdate(**request.json)
-        except ValidationError as e:
-            return json({"error": "Validation error", "details": e.errors()}, status=400)
+            user_data = user_update.validate_json(request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
         
         db = get_db()
         
         # Check if user exists
-        existing_user = db.find_by_id('users', user_id)
+        existing_user = await db.view_by_id('users', user_id)
         if not existing_user:
             return json({"error": "User not found"}, status=404)
+        etag = record_etag(existing_user)
+        if not if_match(request, etag):
+            return precondition_failed(etag)
         
-        # Check if email already exists (if email is being updated)
-        if user_data.email:
-            existing_email_users = db.find_by_field('users', 'email', user_data.email)
-            if existing_email_users and existing_email_users[0]['id'] != user_id:
-                return json({"error": "Email already exists"}, status=400)
-        
-        # Update user
-        updates = {k: v for k, v in user_data.model_dump().items() if v is not None}
-        updated_user = db.update_by_id('users', user_id, updates)
+        # Update user (the unique email index rejects duplicates)
+        updates = {k: v for k, v in user_data.items() if v is not None}
+        try:
+            updated_user = await db.update_by_id('users', user_id, updates)
+        except DuplicateKeyError:
+            return json({"error": "Email already exists"}, status=400)
         
-        return json(updated_user)
+        return json(updated_user, headers=etag_headers(record_etag(updated_user)))
     except Exception as e:
         return json({"error": str(e)}, status=500)
 
-@users_bp.delete("/users/<user_id:int>")
+@users_bp.delete("/users/<user_id:int>", error_format="json")
 async def delete_user(request: Request, user_id: int) -> JSONResponse:
     """Delete a user."""
     try:
         db = get_db()
         
         # Check if user exists
-        existing_user = db.find_by_id('users', user_id)
+        existing_user = await db.view_by_id('users', user_id)
         if not existing_user:
             return json({"error": "User not found"}, status=404)
+        etag = record_etag(existing_user)
+        if not if_match(request, etag):
+            return precondition_failed(etag)
         
         # Delete user
-        success = db.delete_by_id('users', user_id)
+        success = await db.delete_by_id('users', user_id)
         
         if success:
             return json({"message": "User deleted successfully"})
@@ -144,3 +162,83 @@ async def delete_user(request: Request, user_id: int) -> JSONResponse:
             return json({"error": "Failed to delete user"}, status=500)
     except Exception as e:
         return json({"error": str(e)}, status=500)
+
+@users_bp.post("/users/bulk", error_format="json")
+async def create_users_bulk(request: Request) -> JSONResponse:
+    """Create many users in one request, reporting the outcome per item."""
+    try:
+        # Validate request data
+        try:
+            users_data = validate_items(user_create_list, request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
+        except TooManyItems as e:
+            return too_many_items(e.count)
+        
+        db = get_db()
+        
+        # Create users (the unique email index rejects duplicates per item)
+        created = await db.insert_many('users', users_data)
+        
+        return bulk_response([
+            bulk_error(i, 400, "Email already exists") if isinstance(new_user, DuplicateKeyError)
+            else bulk_item(i, 201, new_user)
+            for i, new_user in enumerate(created)
+        ])
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@users_bp.put("/users/bulk", error_format="json")
+async def update_users_bulk(request: Request) -> JSONResponse:
+    """Update many users in one request, reporting the outcome per item."""
+    try:
+        # Validate request data
+        try:
+            users_data = validate_items(user_bulk_update_list, request.body)
+        except BodyValidationError as e:
+            return validation_error(e)
+        except TooManyItems as e:
+            return too_many_items(e.count)
+        
+        db = get_db()
+        
+        # Update users
+        updated = await db.update_many('users', [
+            (user['id'], {k: v for k, v in user.items() if k != 'id' and v is not None})
+            for user in users_data
+        ])
+        
+        results = []
+        for i, updated_user in enumerate(updated):
+            if updated_user is None:
+                results.append(bulk_error(i, 404, "User not found"))
+            elif isinstance(updated_user, DuplicateKeyError):
+                results.append(bulk_error(i, 400, "Email already exists"))
+            else:
+                results.append(bulk_item(i, 200, updated_user))
+        
+        return bulk_response(results)
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@users_bp.delete("/users/bulk", ignore_body=False, error_format="json")
+async def delete_users_bulk(request: Request) -> JSONResponse:
+    """Delete many users in one request, reporting the outcome per item."""
+    try:
+        # Validate request data
+        try:
+            delete_data = validate_items(bulk_delete, request.body, 'ids')
+        except BodyValidationError as e:
+            return validation_error(e)
+        except TooManyItems as e:
+            return too_many_items(e.count)
+        
+        db = get_db()
+        deleted = await db.delete_many('users', delete_data['ids'])
+        
+        return bulk_response([
+            bulk_item(i, 200, {"id": user_id}) if success else bulk_error(i, 404, "User not found")
+            for i, (user_id, success) in enumerate(zip(delete_data['ids'], deleted))
+        ])
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
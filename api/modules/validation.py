@@ -0,0 +1,100 @@
+"""
+Request body validation helpers.
+
+Bodies are validated straight from the raw request bytes with pydantic
+TypeAdapters, so JSON parsing and validation happen in a single pass inside
+pydantic-core. Bulk bodies are the exception: bulk.validate_items parses
+them first so an oversized batch is rejected before any item is validated.
+The schemas are TypedDicts, so validation yields plain dicts that go into
+the database as they are.
+
+Importing pydantic and building the adapters takes over 100 milliseconds, so
+nothing here touches pydantic at import time: cold starts do not pay for it.
+The server calls build_validators in a thread before it starts taking
+requests (see main.create_app), so the first write does not stall the event
+loop either; adapters still build on first use when nothing did that.
+"""
+
+import re
+from typing import Annotated, Any, List
+from sanic.response import HTTPResponse
+
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+class BodyValidationError(ValueError):
+    """A request body that failed validation; wraps pydantic's ValidationError."""
+
+    def __init__(self, error: ValueError):
+        super().__init__(str(error))
+        self.error = error
+
+def check_email(value: str) -> str:
+    if not EMAIL_PATTERN.fullmatch(value):
+        raise ValueError('Invalid email format')
+    return value
+
+class _EmailFormat:
+    """Annotated metadata running check_email after the str check, like AfterValidator."""
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> Any:
+        from pydantic_core import core_schema
+        return core_schema.no_info_after_validator_function(check_email, handler(source))
+
+# A string that must look like an email address
+Email = Annotated[str, _EmailFormat]
+
+class LazyTypeAdapter:
+    """TypeAdapter for a schema, built by build_validators or the first time something is validated."""
+
+    __slots__ = ('schema', '_adapter', '_error_type')
+
+    def __init__(self, schema: Any):
+        self.schema = schema
+        self._adapter = None
+        self._error_type = None
+        _adapters.append(self)
+
+    def _get_adapter(self) -> Any:
+        adapter = self._adapter
+        if adapter is None:
+            from pydantic import TypeAdapter, ValidationError
+            # Set before the adapter, which is what other threads check
+            self._error_type = ValidationError
+            adapter = self._adapter = TypeAdapter(self.schema)
+        return adapter
+
+    def validate_json(self, data: Any) -> Any:
+        """Parse and validate JSON bytes, raising BodyValidationError when they do not fit the schema."""
+        adapter = self._get_adapter()
+        try:
+            return adapter.validate_json(data)
+        except self._error_type as e:
+            raise BodyValidationError(e) from None
+
+    def validate_python(self, data: Any) -> Any:
+        """Validate an already parsed body, raising BodyValidationError when it does not fit the schema."""
+        adapter = self._get_adapter()
+        try:
+            return adapter.validate_python(data)
+        except self._error_type as e:
+            raise BodyValidationError(e) from None
+
+# Every adapter created so far, for build_validators
+_adapters: List[LazyTypeAdapter] = []
+
+def build_validators() -> None:
+    """Import pydantic and build every adapter now; blocking, so run it off the event loop."""
+    for adapter in list(_adapters):
+        adapter._get_adapter()
+
+def validation_error(error: BodyValidationError) -> HTTPResponse:
+    """400 response listing the validation errors."""
+    # error.json() stringifies what errors() leaves as objects (exceptions, raw bytes)
+    try:
+        details = error.error.json()
+    except ValueError:
+        # The input is a body that is not UTF-8, which cannot be echoed back
+        details = error.error.json(include_input=False)
+    return HTTPResponse(f'{{"error":"Validation error","details":{details}}}', status=400,
+                        content_type="application/json")